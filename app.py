@@ -1,9 +1,97 @@
 import streamlit as st
 import streamlit.components.v1 as components
+import html
+import os
+import secrets
 import time
+import uuid
 from datetime import datetime
-import random
-import math
+
+from wms_core import (
+    ALARM_PANEL_MAX,
+    ASSETS,
+    CHECKPOINT_DIR,
+    COMM_QUEUE_DIR,
+    COMM_QUEUE_FILE,
+    DSS_PLAN_DIR,
+    GATE_SPEED_M_PER_MIN,
+    HISTORY_DIR,
+    KACT_FILTER_CHAIN,
+    K_PATTERNS,
+    K_TOL_PCT,
+    PROGRAM_MODES,
+    PROT_FLAGS,
+    SENSOR_FAULT_MODES,
+    WEEKDAYS,
+    Checkpointer,
+    DischargeStats,
+    DssIngest,
+    HistoryStore,
+    KactConditioner,
+    SqliteBackend,
+    StateSync,
+    all_gates_in_gatehouse,
+    audit,
+    auto_target_q,
+    bar_html,
+    card_header_html,
+    cctv_html,
+    cctv_stream_html,
+    compute_k_act,
+    current_gate_key,
+    current_gh_key,
+    current_program,
+    describe_entry,
+    dev_badge,
+    diverging_bar_html,
+    do_logout,
+    evaluate_patterns,
+    filtered_k_act,
+    format_eta,
+    gate_open_pct,
+    gate_svg,
+    get_gate,
+    get_gatehouse_type,
+    get_gh,
+    init_state,
+    interlock_reasons,
+    is_idle_timeout,
+    log_login,
+    manual_set_cmd,
+    now,
+    overview_building_svg,
+    pct_delta,
+    pill_html,
+    power_budget_kw,
+    protection_active,
+    row_html,
+    run_ticks,
+    send_cmd_to_gatehouse,
+    set_auto_alarm,
+    set_protection,
+    svg_document_html,
+    touch_activity,
+    update_console_alarms,
+)
+from wms_core.cctv import CCTV_VIEWER_FPS, CCTV_VIEWS, CctvProxy, camera_slug, file_sources
+from wms_core.downsample import TREND_CHART_LARGE_PX, TREND_CHART_PX, TREND_WINDOWS, history_trend, minmax_downsample
+from wms_core.export import EXPORT_DOWNLOAD_MAX_MB, EXPORT_FORMATS, ExportJob
+from wms_core.replay import Recorder
+from wms_core.viewer import VIEWER_REFRESH_SEC, ViewerSnapshots, build_viewer_snapshot
+
+AUTO_REFRESH_SEC = 1.0
+SIM_SEED = int(os.environ["WMS_SIM_SEED"]) if os.environ.get("WMS_SIM_SEED") else None  # reproducible plant
+RECORD_DIR = os.environ.get("WMS_RECORD_DIR", "")  # record inputs/telemetry for golden-run replay
+DAY_START_HOUR = int(os.environ.get("WMS_DAY_START_HOUR", "0"))  # operational day boundary for delivery accounting
+CHECKPOINT_ROOT = os.environ.get("WMS_CHECKPOINT_DIR", CHECKPOINT_DIR)  # "" disables crash-safe restart
+HISTORY_ROOT = os.environ.get("WMS_HISTORY_DIR", HISTORY_DIR)  # plant trend / log history for export; "" disables
+COMM_QUEUE_ROOT = os.environ.get("WMS_COMM_QUEUE_DIR", COMM_QUEUE_DIR)  # store-and-forward buffer on disk; "" = memory only
+STATE_DB = os.environ.get("WMS_STATE_DB", "")  # shared SQLite state for several server processes; "" = this process only
+KACT_FILTER = os.environ.get("WMS_KACT_FILTER", ",".join(KACT_FILTER_CHAIN))  # Kact conditioning (HOLD, MEDIAN, EWMA); "" = raw
+DSS_DIR = os.environ.get("WMS_DSS_DIR", DSS_PLAN_DIR)  # DSS Qplan / Ktarget plan files; "" disables
+CCTV_DIR = os.environ.get("WMS_CCTV_DIR", "")  # MJPEG files per camera view (local stand-in for field cameras)
+CCTV_STREAM_URL = os.environ.get("WMS_CCTV_STREAM_URL", "")  # python -m wms_core.cctv serve; "" = snapshots only
+EXPORT_KINDS = {"Trends (Q, H, gate opening, Kact)": "trend", "Audit log": "audit", "Login log": "login"}
 
 # =========================================================
 # Page
@@ -69,6 +157,9 @@ small { color: #94a3b8; }
 .hmi-row .k{ color:#94a3b8; font-size:12px; font-weight:800; }
 .hmi-row .v{ font-size:16px; font-weight:900; }
 
+/* Log tail */
+.hmi-log{ color:#94a3b8; font-size:12px; line-height:1.8; white-space:pre-wrap; }
+
 /* Simple bar */
 .bar-wrap{ height: 10px; border-radius: 999px; background:#0a1020; border:1px solid #223049; overflow:hidden; }
 .bar-fill{ height: 100%; border-radius: 999px; background: linear-gradient(90deg, #0ea5e9, #2563eb); }
@@ -120,799 +211,138 @@ small { color: #94a3b8; }
 # =========================================================
 # Helpers (UI)
 # =========================================================
+# Card markup is collected and sent as one markdown element per stretch of
+# a card between widgets: flush_html() before any widget / container that
+# follows rows, pills or bars. card_end() flushes.
+_html: list[str] = []
+
+
+def flush_html():
+    if _html:
+        st.markdown("\n".join(_html), unsafe_allow_html=True)
+        _html.clear()
+
+
 def card_start(title: str, subtitle: str | None = None, icon: str = "◼"):
-    st.markdown(
-        f"""
-<div class="hmi-card">
-  <div class="hmi-title">{icon} {title}</div>
-  {("<div class='hmi-sub'>" + subtitle + "</div>") if subtitle else ""}
-""",
-        unsafe_allow_html=True,
-    )
+    flush_html()
+    _html.append(card_header_html(title, subtitle, icon))
 
 
 def card_end():
-    st.markdown("</div>", unsafe_allow_html=True)
+    flush_html()
 
 
 def pill(label: str, klass="hmi-pill"):
-    st.markdown(f"<span class='{klass}'>{label}</span>", unsafe_allow_html=True)
+    _html.append(pill_html(label, klass))
 
 
 def row(key: str, val: str, badge_text: str | None = None, badge_class="hmi-ok"):
-    b = (
-        f"<span class='hmi-pill {badge_class}' style='margin-left:10px;'>{badge_text}</span>"
-        if badge_text
-        else ""
-    )
-    st.markdown(
-        f"""
-<div class="hmi-row">
-  <div class="k">{key}</div>
-  <div class="v">{val}{b}</div>
-</div>
-""",
-        unsafe_allow_html=True,
-    )
-
+    _html.append(row_html(key, val, badge_text, badge_class))
 
-def cctv_box(title="CCTV"):
-    st.markdown(
-        f"""
-<div style="height:220px;border-radius:14px;border:1px solid #223049;background:#050a14;
-display:flex;align-items:center;justify-content:center;">
-  <div style="text-align:center;color:#94a3b8;">
-    <div style="font-weight:900;margin-bottom:6px;">{title}</div>
-    <div style="font-size:12px;">(Video placeholder)</div>
-  </div>
-</div>
-""",
-        unsafe_allow_html=True,
-    )
 
-
-def bar(percent: int):
-    p = max(0, min(100, int(percent)))
-    st.markdown(
-        f"<div class='bar-wrap'><div class='bar-fill' style='width:{p}%;'></div></div>",
-        unsafe_allow_html=True,
-    )
+@st.cache_resource
+def cctv_proxy() -> CctvProxy | None:
+    # One proxy per server process: every console shares its upstream camera connections
+    return CctvProxy(file_sources(CCTV_DIR)) if CCTV_DIR else None
 
 
-def diverging_bar(dev_pct: float, scale_pct: float = 10.0):
-    d = max(-scale_pct, min(scale_pct, dev_pct))
-    half = abs(d) / scale_pct * 50.0
-    if d >= 0:
-        st.markdown(
-            f"""
-<div class="div-wrap">
-  <div class="div-center"></div>
-  <div class="div-fill-pos" style='width:{half}%;'></div>
-</div>
-""",
-            unsafe_allow_html=True,
-        )
+def cctv_box(title="CCTV"):
+    proxy = cctv_proxy()
+    if CCTV_STREAM_URL:
+        _html.append(cctv_stream_html(title, f"{CCTV_STREAM_URL.rstrip('/')}/stream/{camera_slug(title)}?fps={CCTV_VIEWER_FPS:g}"))
+    elif proxy is not None and title in proxy.sources:
+        snap = proxy.snapshot(title)
+        if snap is None:
+            _html.append(cctv_html(title))
+            return
+        flush_html()
+        st.image(snap[1], caption=f"{title} @ {datetime.fromtimestamp(snap[0]).strftime('%H:%M:%S')}", width="stretch")
     else:
-        st.markdown(
-            f"""
-<div class="div-wrap">
-  <div class="div-center"></div>
-  <div class="div-fill-neg" style='width:{half}%;'></div>
-</div>
-""",
-            unsafe_allow_html=True,
-        )
+        _html.append(cctv_html(title))
 
-    st.markdown(
-        f"""
-<div class="div-scale">
-  <div>-{scale_pct:.0f}%</div>
-  <div>0%</div>
-  <div>+{scale_pct:.0f}%</div>
-</div>
-""",
-        unsafe_allow_html=True,
-    )
-
-
-def pct_delta(base: float, value: float) -> float:
-    if base == 0:
-        return 0.0
-    return (value - base) / base * 100.0
-
-
-def dev_badge(abs_pct: float) -> str:
-    if abs_pct <= 2.0:
-        return "hmi-ok"
-    if abs_pct <= 5.0:
-        return "hmi-warn"
-    return "hmi-bad"
-
-
-# =========================================================
-# Domain helpers (Gate Control)
-# =========================================================
-GATE_SPEED_M_PER_MIN = 0.3          # spec
-K_TOL_PCT = 5.0                     # spec
-AUTO_FAIL_TIMEOUT_SEC = 60 * 60     # spec: stop after 1 hour if cannot achieve Ktarget
-
-
-def clamp(v, lo, hi):
-    return max(lo, min(hi, v))
-
-
-def opening_m_from_pct(open_pct: int, max_open_m: float) -> float:
-    return round(max_open_m * (open_pct / 100.0), 2)
-
-
-def opening_pct_from_m(open_m: float, max_open_m: float) -> int:
-    if max_open_m <= 0:
-        return 0
-    return int(max(0, min(100, round(open_m / max_open_m * 100))))
 
+def bar(percent: int):
+    _html.append(bar_html(percent))
 
-def compute_h_plan_from_qplan(q_plan: float) -> float:
-    # Dummy mapping (real system uses HQ/coeff tables)
-    return round(1.10 + 0.06 * (q_plan - 10.0), 2)
 
+def diverging_bar(dev_pct: float, scale_pct: float = 10.0):
+    _html.append(diverging_bar_html(dev_pct, scale_pct))
 
-# =========================================================
-# Remote Program: K patterns (A..I) (for PROGRAM mode only)
-# =========================================================
-K_PATTERNS = {
-    "A (100%)": 1.00,
-    "B (90%)": 0.90,
-    "C (80%)": 0.80,
-    "D (70%)": 0.70,
-    "E (60%)": 0.60,
-    "F (50%)": 0.50,
-    "G (40%)": 0.40,
-    "H (30%)": 0.30,
-    "I (0%) Full Close": 0.00,
-}
 
+def spacer(px: int = 10):
+    _html.append(f"<div style='height:{px}px;'></div>")
 
-# =========================================================
-# Demo assets
-# =========================================================
-def build_demo_assets():
-    return {
-        "BBT15": {
-            "BaratMainGateHouse": ["Gate1", "Gate2", "Gate3", "Gate4"],
-            "WastewayGateHouse": ["Gate1", "Gate2", "Gate3"],
-            "CiberangMainGateHouse": ["Gate1", "Gate2"],
-        },
-        "BUT10": {
-            "UtaraMainGateHouse": ["Gate1", "Gate2", "Gate3", "Gate4"],
-            "WaruGateHouse": ["Gate1", "Gate2"],
-        },
-    }
 
+@st.cache_resource
+def viewer_snapshots() -> ViewerSnapshots:
+    # One cache per server process: every Viewer console reads the same snapshots
+    return ViewerSnapshots()
 
-ASSETS = build_demo_assets()
 
+def log_lines(lines: list[str], empty: str = "(No records yet)"):
+    # Caption-style log tail as one element instead of one st.caption per line
+    body = "<br>".join(html.escape(x) for x in lines) if lines else html.escape(empty)
+    _html.append(f"<div class='hmi-log'>{body}</div>")
 
-# =========================================================
-# State init
-# =========================================================
-def init_state():
-    ss = st.session_state
-
-    # --- Auth (demo)
-    if "auth" not in ss:
-        ss.auth = {
-            "logged_in": False,
-            "user": "operator",
-            "role": "Operator",  # Administrator / Operator / Viewer
-            "last_activity_ts": time.time(),
-            "idle_timeout_sec": 5 * 60,
-        }
-    if "login_log" not in ss:
-        ss.login_log = []
-    if "audit_log" not in ss:
-        ss.audit_log = []
-
-    # --- Selection
-    if "station" not in ss:
-        ss.station = "BBT15"
-    if "gatehouse" not in ss:
-        ss.gatehouse = "BaratMainGateHouse"
-    if "selected_gate" not in ss:
-        ss.selected_gate = "Gate1"
-
-    # --- Comms / power / protection
-    if "remote_enabled" not in ss:
-        ss.remote_enabled = True
-    if "comm_main" not in ss:
-        ss.comm_main = "NORMAL"
-    if "comm_backup" not in ss:
-        ss.comm_backup = "STANDBY"
-
-    if "commercial_power" not in ss:
-        ss.commercial_power = True
-    if "gen_state" not in ss:
-        ss.gen_state = "OFF"
-
-    if "prot" not in ss:
-        ss.prot = {
-            "ELR": False,
-            "Overload": False,
-            "Over Torque Open": False,
-            "Over Torque Close": False,
-            "Control De-Energize": False,
-        }
-
-    # --- Gate house type: TC / SPC (demo)
-    if "gatehouse_type" not in ss:
-        ss.gatehouse_type = {}
-        for stn, ghs in ASSETS.items():
-            for gh in ghs.keys():
-                ss.gatehouse_type[f"{stn}/{gh}"] = "SPC" if ("Ciberang" in gh or "Waru" in gh) else "TC"
-
-    # --- Mode
-    if "mode" not in ss:
-        ss.mode = "REMOTE AUTOMATIC"
-
-    # --- Gate states
-    if "gate_state" not in ss:
-        gs = {}
-        for stn, ghs in ASSETS.items():
-            for gh, gates in ghs.items():
-                for g in gates:
-                    key = f"{stn}/{gh}/{g}"
-                    open_pct = random.choice([0, 10, 25, 40, 55, 70, 85])
-                    max_open_m = random.choice([2.00, 1.80, 1.60])
-                    gs[key] = {
-                        "open_pct": open_pct,
-                        "max_open_m": max_open_m,
-                        "last_cmd": "—",
-                        "last_cmd_time": "—",
-                    }
-        ss.gate_state = gs
-
-    # --- Gate House process values: Qplan, Qact, Hplan, Hact, Ktarget, Kact
-    if "gh_state" not in ss:
-        ds = {}
-        for stn, ghs in ASSETS.items():
-            for gh in ghs.keys():
-                k = f"{stn}/{gh}"
-                q_plan = round(random.uniform(9.0, 14.0), 2)
-                h_plan = compute_h_plan_from_qplan(q_plan)
-                q_act = round(q_plan + random.uniform(-0.6, 0.6), 2)
-                h_act = round(h_plan + random.uniform(-0.08, 0.08), 2)
-                k_target = random.choice([1.0, 0.9, 0.8, 0.7, 0.6])
-                ds[k] = {
-                    "q_plan": q_plan,
-                    "h_plan": h_plan,
-                    "q_act": q_act,
-                    "h_act": h_act,
-                    "k_target": k_target,
-                    "k_act": None,
-                    "trend_q": [
-                        round(q_act + 0.12 * math.sin(i / 12) + random.uniform(-0.10, 0.10), 2) for i in range(120)
-                    ],
-                    "auto_alarm": False,
-                    "auto_alarm_msg": "",
-                }
-        ss.gh_state = ds
-
-    # --- Auto execution
-    if "auto_state" not in ss:
-        ss.auto_state = "STOPPED"  # RUNNING / PAUSED / STOPPED
-    if "auto_first_exec_ts" not in ss:
-        ss.auto_first_exec_ts = None
-
-    # --- Program execution
-    if "program_running" not in ss:
-        ss.program_running = False
-    if "program_mode" not in ss:
-        ss.program_mode = "K VALUE"  # K VALUE / GATE POSITION / DRIVE TIME
-    if "prog_k_pattern" not in ss:
-        ss.prog_k_pattern = list(K_PATTERNS.keys())[0]
-
-    if "prog_gate_pos_unit" not in ss:
-        ss.prog_gate_pos_unit = "%"
-    if "prog_gate_pos_value" not in ss:
-        ss.prog_gate_pos_value = 50.0
-    if "prog_drive_direction" not in ss:
-        ss.prog_drive_direction = "RAISE"
-    if "prog_drive_minutes" not in ss:
-        ss.prog_drive_minutes = 1.0
-
-    # --- Remote Manual: per selected gate continuous command (RAISE/DOWN/STOP)
-    if "manual_cmd" not in ss:
-        ss.manual_cmd = {}  # { gate_key: "STOP"/"RAISE"/"DOWN" }
-    if "manual_last_tick_ts" not in ss:
-        ss.manual_last_tick_ts = time.time()
-
-    # --- Trends
-    if "trend_gate" not in ss:
-        ss.trend_gate = [random.randint(0, 100) for _ in range(120)]
-    if "trend_large" not in ss:
-        ss.trend_large = False
-    if "cctv_camera" not in ss:
-        ss.cctv_camera = "CCTV — Gate Area"
-
-
-init_state()
 
 # =========================================================
-# Auth / timeout / logging
+# State init / idle timeout / tick
 # =========================================================
-def touch_activity():
-    st.session_state.auth["last_activity_ts"] = time.time()
-
-
-def is_idle_timeout() -> bool:
-    auth = st.session_state.auth
-    if not auth["logged_in"]:
-        return False
-    return (time.time() - auth["last_activity_ts"]) > auth["idle_timeout_sec"]
-
-
-def do_logout(reason="AUTO-LOGOUT"):
-    auth = st.session_state.auth
-    if auth["logged_in"]:
-        st.session_state.login_log.append(
-            {
-                "user": auth["user"],
-                "role": auth["role"],
-                "event": "LOGOUT",
-                "reason": reason,
-                "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            }
-        )
-    auth["logged_in"] = False
-
-
-def audit(event: str, detail: str):
-    st.session_state.audit_log.append(
-        {
-            "time": datetime.now().strftime("%H:%M:%S"),
-            "user": st.session_state.auth["user"] if st.session_state.auth["logged_in"] else "—",
-            "role": st.session_state.auth["role"] if st.session_state.auth["logged_in"] else "—",
-            "event": event,
-            "detail": detail,
-        }
+ss = st.session_state
+restored = None
+if CHECKPOINT_ROOT and "checkpoint" not in ss:
+    ss.checkpoint = Checkpointer(CHECKPOINT_ROOT)
+    # A recorded run must start from its seed, not from the last plant state
+    if not RECORD_DIR and ss.checkpoint.restore(ss):
+        restored = ss.checkpoint.restored
+if "stats" not in ss:
+    ss.stats = DischargeStats(DAY_START_HOUR)
+if "history" not in ss:
+    # Day-partitioned trend / log history of the plant for bulk export, written by the console that runs it
+    ss.history = HistoryStore(HISTORY_ROOT or None)
+if "kact" not in ss:
+    ss.kact = KactConditioner([f.strip().upper() for f in KACT_FILTER.split(",") if f.strip()])
+seed = SIM_SEED
+if seed is None and RECORD_DIR and "rng" not in ss:
+    seed = secrets.randbits(31)  # a recorded run replays only from the seed it ran with
+init_state(ss, seed)
+if restored:
+    audit(
+        ss,
+        "RESTORE",
+        f"Plant state from checkpoint {datetime.fromtimestamp(restored['ckpt_ts']).strftime('%H:%M:%S')}"
+        f" + {restored['records']} journal record(s) ({restored['ms']:.0f} ms)",
     )
-
+if STATE_DB and not RECORD_DIR and "sync" not in ss:
+    ss.sync = StateSync(SqliteBackend(STATE_DB))
+    ss.sync.attach(ss)
+if "plant_id" not in ss:
+    # Viewer snapshot key: the shared plant, or this session's own
+    ss.plant_id = STATE_DB if "sync" in ss else f"session-{uuid.uuid4().hex[:12]}"
+if RECORD_DIR and "recorder" not in ss:
+    os.makedirs(RECORD_DIR, exist_ok=True)
+    ss.recorder = Recorder(
+        os.path.join(RECORD_DIR, f"run-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}.jsonl"), ss
+    )
+if DSS_DIR and not RECORD_DIR and "dss" not in ss:
+    # A recorded run keeps its plan inputs to what the recorder captures
+    ss.dss = DssIngest(DSS_DIR)
+if COMM_QUEUE_ROOT and ss.comm.queue.path is None:
+    # Store-and-forward buffer of the plant, on disk across restarts; retried while another console holds it
+    ss.comm.queue.attach(os.path.join(COMM_QUEUE_ROOT, COMM_QUEUE_FILE))
 
 # Enforce idle timeout
-if is_idle_timeout():
-    do_logout("IDLE TIMEOUT")
+if is_idle_timeout(ss):
+    do_logout(ss, "IDLE TIMEOUT")
     st.warning("You were logged out due to inactivity (auto-timeout). Please log in again.")
     st.stop()
 
-# =========================================================
-# Key helpers
-# =========================================================
-def current_gh_key():
-    ss = st.session_state
-    return f"{ss.station}/{ss.gatehouse}"
-
-
-def current_gate_key():
-    ss = st.session_state
-    return f"{ss.station}/{ss.gatehouse}/{ss.selected_gate}"
-
-
-def get_gatehouse_type() -> str:
-    return st.session_state.gatehouse_type.get(current_gh_key(), "TC")
-
-
-def get_gate():
-    return st.session_state.gate_state[current_gate_key()]
-
-
-def get_gh():
-    return st.session_state.gh_state[current_gh_key()]
-
-
-def all_gates_in_gatehouse() -> list[str]:
-    ss = st.session_state
-    return ASSETS[ss.station][ss.gatehouse]
-
-
-# =========================================================
-# Safety / interlock (simplified)
-# =========================================================
-def blocked() -> bool:
-    ss = st.session_state
-    if ss.mode == "LOCAL (LCP ACTIVE)":
-        return True
-    if any(ss.prot.values()):
-        return True
-    if ss.gen_state == "ERROR":
-        return True
-    if not ss.remote_enabled:
-        return True
-    if not ss.auth["logged_in"]:
-        return True
-    if ss.auth["role"] == "Viewer":
-        return True
-    return False
-
-
-def send_cmd_to_gate(gate_key: str, cmd: str):
-    touch_activity()
-    now = datetime.now().strftime("%H:%M:%S")
-    st.session_state.gate_state[gate_key]["last_cmd"] = cmd
-    st.session_state.gate_state[gate_key]["last_cmd_time"] = now
-    audit("COMMAND", f"{gate_key} :: {cmd}")
-
-
-def send_cmd_to_gatehouse(cmd: str):
-    touch_activity()
-    now = datetime.now().strftime("%H:%M:%S")
-    ss = st.session_state
-    for g in all_gates_in_gatehouse():
-        key = f"{ss.station}/{ss.gatehouse}/{g}"
-        ss.gate_state[key]["last_cmd"] = cmd
-        ss.gate_state[key]["last_cmd_time"] = now
-    audit("COMMAND", f"{current_gh_key()} :: {cmd}")
-
-
-def step_gate_toward(gate_key: str, target_pct: int):
-    gg = st.session_state.gate_state[gate_key]
-    p = gg["open_pct"]
-    if p < target_pct:
-        p = min(100, p + 2)
-    elif p > target_pct:
-        p = max(0, p - 2)
-    gg["open_pct"] = p
-
-
-def step_all_gates_in_gatehouse(target_pct: int):
-    ss = st.session_state
-    for g in all_gates_in_gatehouse():
-        k = f"{ss.station}/{ss.gatehouse}/{g}"
-        step_gate_toward(k, target_pct)
-
-
-# =========================================================
-# Remote Automatic logic (skeleton)
-# =========================================================
-def compute_k_act(gh: dict) -> float:
-    q_plan = gh["q_plan"]
-    if q_plan <= 0:
-        return 0.0
-    return gh["q_act"] / q_plan
-
-
-def auto_target_q(gh: dict) -> float:
-    return gh["k_target"] * gh["q_plan"]
-
-
-def dummy_gate_opening_from_qtarget(q_target: float) -> int:
-    return int(clamp(10 + q_target * 6.0, 0, 100))
-
-
-def apply_remote_automatic_if_running():
-    ss = st.session_state
-    if ss.mode != "REMOTE AUTOMATIC":
-        return
-    if ss.auto_state != "RUNNING":
-        return
-    if blocked():
-        ss.auto_state = "STOPPED"
-        return
-
-    gh = get_gh()
-    k_act = compute_k_act(gh)
-    k_target = gh["k_target"]
-    gh["k_act"] = k_act
-
-    diff_pct = (k_target - k_act) * 100.0
-    out_of_band = abs(diff_pct) > K_TOL_PCT
-
-    if ss.auto_first_exec_ts is None:
-        ss.auto_first_exec_ts = time.time()
-
-    if out_of_band and (time.time() - ss.auto_first_exec_ts) >= AUTO_FAIL_TIMEOUT_SEC:
-        ss.auto_state = "STOPPED"
-        gh["auto_alarm"] = True
-        gh["auto_alarm_msg"] = (
-            "Automatic control stopped: Ktarget cannot be achieved within 1 hour. "
-            "Please check discharge at preceding/subsequent gates and canals."
-        )
-        audit("ALARM", f"{current_gh_key()} :: {gh['auto_alarm_msg']}")
-        return
-
-    q_target = auto_target_q(gh)
-    gp_target_pct = dummy_gate_opening_from_qtarget(q_target)
-    step_all_gates_in_gatehouse(gp_target_pct)
-
-
-# =========================================================
-# Remote Program logic (kept)
-# =========================================================
-def apply_remote_program_if_running():
-    ss = st.session_state
-    if ss.mode != "REMOTE PROGRAM":
-        return
-    if not ss.program_running:
-        return
-    if blocked():
-        ss.program_running = False
-        return
-
-    gh = get_gh()
-
-    if ss.program_mode == "K VALUE":
-        k_target = K_PATTERNS.get(ss.prog_k_pattern, 1.0)
-        gh["k_target"] = k_target
-        q_target = auto_target_q(gh)
-        gp_target_pct = dummy_gate_opening_from_qtarget(q_target)
-        step_all_gates_in_gatehouse(gp_target_pct)
-        return
-
-    if ss.program_mode == "GATE POSITION":
-        # Program mode may issue position instructions (not Remote Manual)
-        if ss.prog_gate_pos_unit == "%":
-            target_pct = int(clamp(round(ss.prog_gate_pos_value), 0, 100))
-        else:
-            rep = get_gate()
-            max_m = rep["max_open_m"]
-            target_m = clamp(ss.prog_gate_pos_value / 100.0, 0.0, max_m)  # cm -> m
-            target_pct = opening_pct_from_m(target_m, max_m)
-        step_all_gates_in_gatehouse(target_pct)
-        return
-
-    if ss.program_mode == "DRIVE TIME":
-        minutes = clamp(ss.prog_drive_minutes, 0.0, 30.0)
-        delta_m = minutes * GATE_SPEED_M_PER_MIN
-        for g in all_gates_in_gatehouse():
-            key = f"{ss.station}/{ss.gatehouse}/{g}"
-            gs = ss.gate_state[key]
-            max_m = gs["max_open_m"]
-            cur_m = opening_m_from_pct(gs["open_pct"], max_m)
-            if ss.prog_drive_direction == "RAISE":
-                new_m = clamp(cur_m + delta_m, 0.0, max_m)
-            else:
-                new_m = clamp(cur_m - delta_m, 0.0, max_m)
-            gs["open_pct"] = opening_pct_from_m(new_m, max_m)
-        return
-
-
-# =========================================================
-# Remote Manual (SPEC-ALIGNED): continuous Raise/Down/Stop
-# =========================================================
-def manual_set_cmd(gate_key: str, cmd: str):
-    # cmd: "RAISE" / "DOWN" / "STOP"
-    st.session_state.manual_cmd[gate_key] = cmd
-    send_cmd_to_gate(gate_key, f"REMOTE MANUAL {cmd}")
-
-
-def manual_force_stop_all(reason: str):
-    ss = st.session_state
-    for k in list(ss.manual_cmd.keys()):
-        ss.manual_cmd[k] = "STOP"
-    audit("INTERLOCK", f"Remote Manual forced STOP ({reason})")
-
-
-def tick_remote_manual_motion():
-    ss = st.session_state
-
-    if ss.mode != "REMOTE MANUAL":
-        return
-
-    # Spec: SPC does not support Remote Manual
-    if get_gatehouse_type() == "SPC":
-        manual_force_stop_all("SPC does not support Remote Manual")
-        return
-
-    # Interlocks / access
-    if blocked():
-        manual_force_stop_all("Blocked by interlock/access")
-        return
-
-    now = time.time()
-    dt = max(0.0, now - ss.manual_last_tick_ts)
-    dt = min(dt, 2.0)  # avoid jump after long pause
-    ss.manual_last_tick_ts = now
-
-    gate_key = current_gate_key()
-    cmd = ss.manual_cmd.get(gate_key, "STOP")
-
-    if cmd not in ("RAISE", "DOWN"):
-        return
-
-    gs = ss.gate_state[gate_key]
-    max_m = gs["max_open_m"]
-    cur_m = opening_m_from_pct(gs["open_pct"], max_m)
-
-    delta_m = (GATE_SPEED_M_PER_MIN / 60.0) * dt  # m/min -> m/sec
-    if cmd == "RAISE":
-        new_m = clamp(cur_m + delta_m, 0.0, max_m)
-    else:
-        new_m = clamp(cur_m - delta_m, 0.0, max_m)
-
-    gs["open_pct"] = opening_pct_from_m(new_m, max_m)
-
-    # Auto-stop at bounds (practical safeguard)
-    if new_m <= 0.0 and cmd == "DOWN":
-        ss.manual_cmd[gate_key] = "STOP"
-        send_cmd_to_gate(gate_key, "REMOTE MANUAL STOP (Lower limit)")
-    if new_m >= max_m and cmd == "RAISE":
-        ss.manual_cmd[gate_key] = "STOP"
-        send_cmd_to_gate(gate_key, "REMOTE MANUAL STOP (Upper limit)")
-
-
-# =========================================================
-# Signal updates (dummy process simulation)
-# =========================================================
-def tick_gatehouse_signals():
-    ss = st.session_state
-    gh = get_gh()
-
-    gh["h_plan"] = compute_h_plan_from_qplan(gh["q_plan"])
-
-    k_target = gh.get("k_target", 1.0)
-    q_target = k_target * gh["q_plan"]
-
-    nudge = 0.015 if (ss.auto_state == "RUNNING" or ss.program_running) else 0.0
-    gh["q_act"] = round(max(0.0, gh["q_act"] + random.uniform(-0.08, 0.08) - (gh["q_act"] - q_target) * nudge), 2)
-    gh["h_act"] = round(gh["h_plan"] + random.uniform(-0.05, 0.05), 2)
-    gh["trend_q"] = (gh["trend_q"] + [gh["q_act"]])[-120:]
-
-
-def tick_gate_trend():
-    gg = get_gate()
-    st.session_state.trend_gate = (st.session_state.trend_gate + [gg["open_pct"]])[-120:]
-
-
-# Tick order
-tick_gatehouse_signals()
-apply_remote_automatic_if_running()
-apply_remote_program_if_running()
-tick_remote_manual_motion()
-tick_gate_trend()
-
-# =========================================================
-# SVG
-# =========================================================
-def overview_building_svg(
-    station: str,
-    gatehouse: str,
-    gates: list[str],
-    gate_states: dict,
-    selected_gate: str,
-    alarm_active: bool,
-    mode_text: str,
-    k_target: float,
-    k_act: float,
-):
-    n = max(1, len(gates))
-    W, H = 1100, 460
-    margin = 60
-    bay_gap = 14
-    bay_w = (W - 2 * margin - (n - 1) * bay_gap) / n
-    bay_h = 200
-    bay_y = 175
-
-    stroke = "#223049"
-    card = "#0b1220"
-    panel = "#0a1020"
-    water1 = "#0ea5e9"
-    water2 = "#2563eb"
-    txt = "#e5e7eb"
-    sub = "#94a3b8"
-    bad = "#fb7185"
-    ok = "#34d399"
-
-    alarm_color = bad if alarm_active else ok
-
-    dev_pct = (k_target - k_act) * 100.0
-    k_status = "OK" if abs(dev_pct) <= K_TOL_PCT else "OUT"
-    k_color = ok if k_status == "OK" else bad
-
-    svg_parts = []
-    svg_parts.append(
-        f"""
-<svg width="100%" height="100%" viewBox="0 0 {W} {H}" preserveAspectRatio="xMidYMid meet"
-     xmlns="http://www.w3.org/2000/svg">
-  <defs>
-    <linearGradient id="bggrad" x1="0" y1="0" x2="0" y2="1">
-      <stop offset="0" stop-color="#0b1220" stop-opacity="1"/>
-      <stop offset="1" stop-color="#070b14" stop-opacity="1"/>
-    </linearGradient>
-    <linearGradient id="water" x1="0" y1="0" x2="0" y2="1">
-      <stop offset="0" stop-color="{water1}" stop-opacity="0.95"/>
-      <stop offset="1" stop-color="{water2}" stop-opacity="0.75"/>
-    </linearGradient>
-    <filter id="shadow" x="-20%" y="-20%" width="140%" height="140%">
-      <feDropShadow dx="0" dy="8" stdDeviation="10" flood-color="#000" flood-opacity="0.35"/>
-    </filter>
-  </defs>
-
-  <rect x="0" y="0" width="{W}" height="{H}" rx="22" fill="url(#bggrad)" stroke="none"/>
-
-  <text x="{margin}" y="46" fill="{txt}" font-size="18" font-weight="900">{station}  —  {gatehouse}</text>
-  <text x="{margin}" y="70" fill="{sub}" font-size="12" font-weight="800">MODE (Gate House): {mode_text}</text>
-
-  <circle cx="{W-margin-18}" cy="40" r="7" fill="{alarm_color}" opacity="0.9"/>
-  <text x="{W-margin-30}" y="59" fill="{sub}" font-size="11" font-weight="800" text-anchor="end">
-    {'ALARM' if alarm_active else 'NORMAL'}
-  </text>
-
-  <rect x="{margin}" y="95" width="{W-2*margin}" height="58" rx="14" fill="#0f172a" stroke="{stroke}" opacity="0.95"/>
-  <text x="{margin+18}" y="122" fill="{sub}" font-size="12" font-weight="900">Ktarget</text>
-  <text x="{margin+18}" y="145" fill="{txt}" font-size="16" font-weight="900">{k_target:.2f}</text>
-
-  <text x="{margin+200}" y="122" fill="{sub}" font-size="12" font-weight="900">Kact</text>
-  <text x="{margin+200}" y="145" fill="{txt}" font-size="16" font-weight="900">{k_act:.2f}</text>
-
-  <text x="{margin+360}" y="122" fill="{sub}" font-size="12" font-weight="900">ΔK</text>
-  <text x="{margin+360}" y="145" fill="{txt}" font-size="16" font-weight="900">{dev_pct:+.1f}%</text>
-
-  <circle cx="{margin+520}" cy="136" r="8" fill="{k_color}" opacity="0.9"/>
-  <text x="{margin+535}" y="142" fill="{txt}" font-size="12" font-weight="900">{k_status} (±{K_TOL_PCT:.0f}%)</text>
-"""
-    )
-
-    for i, gname in enumerate(gates):
-        key = f"{station}/{gatehouse}/{gname}"
-        gs = gate_states.get(key, None)
-        open_pct = gs["open_pct"] if gs else 0
-        max_m = gs["max_open_m"] if gs else 2.0
-        open_m = opening_m_from_pct(open_pct, max_m)
-
-        x = margin + i * (bay_w + bay_gap)
-        sel = (gname == selected_gate)
-
-        outline = "#60a5fa" if sel else stroke
-        glow = 'filter="url(#shadow)"' if sel else ""
-
-        svg_parts.append(
-            f"""
-  <g {glow}>
-    <rect x="{x}" y="{bay_y}" width="{bay_w}" height="{bay_h}" rx="18" fill="{card}" stroke="{outline}" stroke-width="{2 if sel else 1}"/>
-    <rect x="{x+18}" y="{bay_y+128}" width="{bay_w-36}" height="46" rx="14" fill="{panel}" stroke="{stroke}"/>
-    <rect x="{x+26}" y="{bay_y+138}" width="{bay_w-52}" height="28" rx="12" fill="url(#water)" opacity="0.95"/>
-
-    <rect x="{x+bay_w*0.36}" y="{bay_y+26}" width="{bay_w*0.28}" height="130" rx="12" fill="{panel}" stroke="{stroke}"/>
-    <rect x="{x+bay_w*0.36+6}" y="{bay_y+40}" width="{bay_w*0.28-12}" height="70" rx="12" fill="#1f6feb" stroke="#60a5fa" opacity="0.92"/>
-
-    <text x="{x+24}" y="{bay_y+30}" fill="{txt}" font-size="13" font-weight="900">{gname}</text>
-    <text x="{x+bay_w/2}" y="{bay_y+bay_h+28}" fill="{txt}" font-size="13" font-weight="900" text-anchor="middle">{open_pct}%</text>
-    <text x="{x+bay_w/2}" y="{bay_y+bay_h+48}" fill="{sub}" font-size="12" font-weight="800" text-anchor="middle">{open_m:.2f} m</text>
-  </g>
-"""
-        )
-
-    svg_parts.append("</svg>")
-    return "\n".join(svg_parts)
-
-
-def gate_svg(open_pct: int):
-    y = 120 - int(open_pct * 0.8)
-    y = max(40, min(120, y))
-    return f"""
-<svg width="100%" height="100%" viewBox="0 0 520 260" xmlns="http://www.w3.org/2000/svg">
-  <defs>
-    <linearGradient id="water_d" x1="0" x2="0" y1="0" y2="1">
-      <stop offset="0" stop-color="#0ea5e9" stop-opacity="0.92"/>
-      <stop offset="1" stop-color="#2563eb" stop-opacity="0.72"/>
-    </linearGradient>
-    <filter id="sh_d" x="-20%" y="-20%" width="140%" height="140%">
-      <feDropShadow dx="0" dy="6" stdDeviation="8" flood-color="#000" flood-opacity="0.35"/>
-    </filter>
-  </defs>
-
-  <rect x="22" y="20" width="476" height="220" rx="18" fill="#0b1220" stroke="#223049"/>
-  <rect x="150" y="40" width="46" height="170" rx="10" fill="#111c2e" stroke="#223049"/>
-  <rect x="324" y="40" width="46" height="170" rx="10" fill="#111c2e" stroke="#223049"/>
-
-  <rect x="80" y="170" width="360" height="44" rx="12" fill="#0a1020" stroke="#223049"/>
-  <rect x="92" y="182" width="336" height="30" rx="10" fill="url(#water_d)" opacity="0.95"/>
-
-  <rect x="220" y="62" width="80" height="140" rx="10" fill="#0a1020" stroke="#223049"/>
-
-  <g filter="url(#sh_d)">
-    <rect x="226" y="{y}" width="68" height="90" rx="10" fill="#1f6feb" opacity="0.92" stroke="#60a5fa"/>
-  </g>
-</svg>
-"""
+# Viewer consoles take the shared read-only snapshot path (ticked when a snapshot is built)
+viewer = ss.auth["logged_in"] and ss.auth["role"] == "Viewer"
+if ss.get("tick_done"):
+    ss.tick_done = False  # already ticked by the auto-refresh poll that triggered this rerun
+elif not viewer:
+    run_ticks(ss)
 
 
 # =========================================================
@@ -922,6 +352,7 @@ st.sidebar.markdown("## WMS HMI Demo")
 
 card_start("User Login", "Access levels + auto-timeout (demo)", "🔐")
 if not st.session_state.auth["logged_in"]:
+    flush_html()
     u = st.selectbox("User", ["admin", "operator", "viewer"], index=1)
     role = st.selectbox("Role", ["Administrator", "Operator", "Viewer"], index=1)
     _ = st.text_input("Password", type="password", value="demo")
@@ -930,25 +361,18 @@ if not st.session_state.auth["logged_in"]:
         st.session_state.auth["user"] = u
         st.session_state.auth["role"] = role
         st.session_state.auth["last_activity_ts"] = time.time()
-        st.session_state.login_log.append(
-            {
-                "user": u,
-                "role": role,
-                "event": "LOGIN",
-                "reason": "MANUAL",
-                "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            }
-        )
-        audit("LOGIN", f"{u} ({role})")
+        log_login(ss, u, role, "LOGIN", "MANUAL")
+        audit(ss, "LOGIN", f"{u} ({role})")
         st.rerun()
 else:
     auth = st.session_state.auth
     remaining = max(0, int(auth["idle_timeout_sec"] - (time.time() - auth["last_activity_ts"])))
     row("User", f"{auth['user']} ({auth['role']})")
     row("Idle timeout", f"{remaining}s remaining")
+    flush_html()
     if st.button("Log out", use_container_width=True):
-        do_logout("MANUAL")
-        audit("LOGOUT", "Manual logout")
+        do_logout(ss, "MANUAL")
+        audit(ss, "LOGOUT", "Manual logout")
         st.rerun()
 card_end()
 
@@ -961,19 +385,75 @@ if st.session_state.gatehouse not in gatehouses:
     st.session_state.gatehouse = gatehouses[0]
 st.sidebar.selectbox("Gate House", gatehouses, key="gatehouse")
 
-gh_type = get_gatehouse_type()
+
+# =========================================================
+# Viewer (read-only snapshot)
+# =========================================================
+def build_snapshot(gh_key: str, t: float) -> dict:
+    run_ticks(ss)
+    if "checkpoint" in ss:
+        ss.checkpoint.commit(ss, t)
+    return build_viewer_snapshot(ss, gh_key, t)
+
+
+@st.fragment(run_every=VIEWER_REFRESH_SEC)
+def viewer_refresh_poll():
+    if time.time() - ss.viewer_snapshot_ts >= VIEWER_REFRESH_SEC:
+        st.rerun()
+
+
+if viewer:
+    gh_key = current_gh_key(ss)
+    t = time.time()
+    snap = viewer_snapshots().get((ss.plant_id, gh_key), t, lambda: build_snapshot(gh_key, t))
+    ss.viewer_snapshot_ts = snap["t"]
+
+    st.markdown(f"### {st.session_state.station}  ›  Gate House: {st.session_state.gatehouse}")
+    st.caption(f"Read-only view  |  snapshot {datetime.fromtimestamp(snap['t']).strftime('%H:%M:%S')}")
+    card_start("Gate House Overview", "Schematic: gate positions + Ktarget/Kact status (Gate House-level).", "🏛️")
+    flush_html()
+    components.html(snap["overview_html"], height=470, scrolling=False)
+    card_end()
+    v1, v2, v3 = st.columns([1.10, 1.25, 1.05], gap="large")
+    with v1:
+        card_start("Gate House Status", None, "🚪")
+        _html.append(snap["status_html"])
+        card_end()
+    with v2:
+        card_start("Gate House Discharge", None, "📈")
+        flush_html()
+        st.line_chart(snap["trend"], x="time", y="Qact", height=180)
+        card_end()
+    with v3:
+        card_start("Alarms", None, "🛡️")
+        _html.append(snap["alarms_html"])
+        card_end()
+    viewer_refresh_poll()
+    st.stop()
+
+gh_type = get_gatehouse_type(ss)
 st.sidebar.markdown(f"**Gate House Type:** `{gh_type}`")
 st.sidebar.caption("Spec: SPC does not support Remote Manual Mode.")
 
 st.sidebar.markdown("---")
 
+# Control state of the selected Gate House (its gh_state row: shared with every console, run by the tick owner)
+ctl = get_gh(ss)
 allowed_modes = ["LOCAL (LCP ACTIVE)", "REMOTE AUTOMATIC", "REMOTE PROGRAM", "REMOTE MANUAL"]
 if gh_type == "SPC" and "REMOTE MANUAL" in allowed_modes:
     allowed_modes.remove("REMOTE MANUAL")
-if st.session_state.mode not in allowed_modes:
-    st.session_state.mode = "REMOTE AUTOMATIC"
+if ctl["mode"] not in allowed_modes:
+    ctl["mode"] = "REMOTE AUTOMATIC"
+
+
 
-st.sidebar.radio("Control Mode (Gate House)", allowed_modes, key="mode")
+def _set_mode(gh_key: str):
+    ss.gh_state[gh_key]["mode"] = ss.ctl_mode
+
+
+# The widget follows the row, so a mode set from another console shows up here too
+ss.ctl_mode = ctl["mode"]
+st.sidebar.radio("Control Mode (Gate House)", allowed_modes, key="ctl_mode", on_change=_set_mode, args=(current_gh_key(ss),))
 
 st.sidebar.markdown("---")
 st.sidebar.markdown("### Comms / Access (dummy)")
@@ -984,29 +464,71 @@ st.session_state.comm_main = st.sidebar.selectbox(
 st.session_state.comm_backup = st.sidebar.selectbox(
     "Backup comm", ["STANDBY", "ACTIVE", "DOWN"], index=["STANDBY", "ACTIVE", "DOWN"].index(st.session_state.comm_backup)
 )
+with st.sidebar.expander("Comm fault injection"):
+    st.session_state.comm_fault_flaps = st.checkbox("Random link flaps", value=st.session_state.comm_fault_flaps)
+    st.session_state.comm_fault_latency_ms = {
+        "MAIN": st.slider("Main latency [ms]", 0, 5000, st.session_state.comm_fault_latency_ms["MAIN"], 100),
+        "BACKUP": st.slider("Backup latency [ms]", 0, 5000, st.session_state.comm_fault_latency_ms["BACKUP"], 100),
+    }
 
 st.sidebar.markdown("### Generator / Power")
 st.session_state.commercial_power = st.sidebar.checkbox("Commercial power", value=st.session_state.commercial_power)
 st.session_state.gen_state = st.sidebar.selectbox(
     "Generator state", ["OFF", "READY", "RUNNING", "ERROR"], index=["OFF", "READY", "RUNNING", "ERROR"].index(st.session_state.gen_state)
 )
+update_console_alarms(ss)
+comm = st.session_state.comm
+st.sidebar.caption(
+    f"Active link: {comm.active or 'NONE'}  |  buffered {comm.backlog}"
+    + (f" (dropped {comm.queue.dropped})" if comm.queue.dropped else "")
+    + f"  |  backfilled {comm.backfilled}  |  failovers {comm.failovers}"
+)
 
 st.sidebar.markdown("### Protection / Alarms")
-for k in list(st.session_state.prot.keys()):
-    st.session_state.prot[k] = st.sidebar.checkbox(k, value=st.session_state.prot[k])
+gh_prot = st.session_state.prot[current_gh_key(ss)]
+for k in PROT_FLAGS:
+    on = st.sidebar.checkbox(k, value=gh_prot[k], key=f"prot::{current_gh_key(ss)}::{k}")
+    set_protection(ss, current_gh_key(ss), k, on)
+
+with st.sidebar.expander("Sensor fault injection"):
+    faults = st.session_state.sensor_faults
+    faults.q_mode = st.selectbox("Flow meter (Q)", SENSOR_FAULT_MODES, index=SENSOR_FAULT_MODES.index(faults.q_mode))
+    faults.h_offset_m = st.slider("Level sensor offset (H) [m]", -0.5, 0.5, float(faults.h_offset_m), 0.01)
 
 st.sidebar.markdown("### Gate House Plan (dummy)")
-gh = get_gh()
+gh = get_gh(ss)
 gh["q_plan"] = round(st.sidebar.slider("Qplan (Gate House) [m³/s]", 5.0, 20.0, float(gh["q_plan"]), 0.05), 2)
 
 st.sidebar.markdown("---")
-auto_refresh = st.sidebar.checkbox("Auto refresh (1s)", value=False)
+auto_refresh = st.sidebar.checkbox(f"Auto refresh ({AUTO_REFRESH_SEC:.0f}s)", value=False)
+if ss.sim_seed is not None:
+    st.sidebar.caption(f"Simulation seed: {ss.sim_seed}")
+if "recorder" in ss:
+    st.sidebar.caption(f"Recording: {os.path.basename(ss.recorder.path)} ({ss.recorder.ticks} ticks)")
+if "checkpoint" in ss:
+    ckpt = ss.checkpoint
+    st.sidebar.caption(
+        f"Checkpoint #{ckpt.seq}  |  journal {ckpt.records} record(s)"
+        if ckpt.owner
+        else "Checkpoint: read-only (written by another console)"
+    )
+if "dss" in ss and ss.dss.applied:
+    st.sidebar.caption(
+        f"DSS plan: {ss.dss.last_batch['gatehouses']} Gate House(s) updated at "
+        f"{datetime.fromtimestamp(ss.dss.last_batch['t']).strftime('%H:%M:%S')}"
+        + (f"  |  {ss.dss.rejected} row(s) rejected" if ss.dss.rejected else "")
+    )
+if "sync" in ss:
+    st.sidebar.caption(
+        "Shared state: leader (runs the plant)" if ss.sync.is_leader else "Shared state: follower (mirrors the leader)"
+    )
 
 # =========================================================
 # Header
 # =========================================================
-mode = st.session_state.mode
-is_blocked = blocked()
+mode = ctl["mode"]
+block_reasons = interlock_reasons(ss)
+is_blocked = bool(block_reasons)
 
 st.markdown(f"### {st.session_state.station}  ›  Gate House: {st.session_state.gatehouse}")
 
@@ -1016,25 +538,31 @@ with h1:
         f"MODE: {('AUTO' if mode=='REMOTE AUTOMATIC' else 'PROGRAM' if mode=='REMOTE PROGRAM' else 'MANUAL' if mode=='REMOTE MANUAL' else 'LOCAL')}",
         "hmi-pill hmi-ok" if mode != "LOCAL (LCP ACTIVE)" else "hmi-pill hmi-bad",
     )
+    flush_html()
 with h2:
     pill(
-        f"COMM: MAIN={st.session_state.comm_main} / BK={st.session_state.comm_backup}",
-        "hmi-pill hmi-ok" if st.session_state.comm_main == "NORMAL" else "hmi-pill hmi-warn",
+        f"COMM: {st.session_state.comm.active or 'NONE'}" + (f" · BUFFER {st.session_state.comm.backlog}" if st.session_state.comm.backlog else ""),
+        "hmi-pill hmi-ok" if st.session_state.comm.active == "MAIN"
+        else "hmi-pill hmi-warn" if st.session_state.comm.active == "BACKUP"
+        else "hmi-pill hmi-bad",
     )
+    flush_html()
 with h3:
     pill(
         f"GEN: {st.session_state.gen_state}",
         "hmi-pill hmi-ok" if st.session_state.gen_state != "ERROR" else "hmi-pill hmi-bad",
     )
+    flush_html()
 with h4:
     pill(f"LAST UPDATE: {datetime.now().strftime('%H:%M:%S')}", "hmi-pill")
+    flush_html()
 
 st.markdown("")
 
 # =========================================================
 # Gate House Controls
 # =========================================================
-alarm_active = any(st.session_state.prot.values()) or get_gh().get("auto_alarm", False)
+alarm_active = st.session_state.alarms.has_active(current_gh_key(ss))
 
 if mode == "REMOTE AUTOMATIC":
     card_start(
@@ -1042,45 +570,44 @@ if mode == "REMOTE AUTOMATIC":
         "Gate House-level execution controls. Ktarget vs Kact (±5%) + 1-hour stop condition.",
         "🤖",
     )
+    flush_html()
     b1, b2, b3, b4 = st.columns([1, 1, 1, 1], gap="large")
     with b1:
         if st.button("▶ Start", use_container_width=True, disabled=is_blocked):
-            touch_activity()
-            st.session_state.auto_state = "RUNNING"
-            st.session_state.auto_first_exec_ts = None
-            get_gh()["auto_alarm"] = False
-            get_gh()["auto_alarm_msg"] = ""
-            audit("AUTO", f"{current_gh_key()} :: START")
+            touch_activity(ss)
+            ctl["auto_state"] = "RUNNING"
+            ctl["auto_first_exec_ts"] = None
+            set_auto_alarm(ss, current_gh_key(ss), False)
+            audit(ss, "AUTO", f"{current_gh_key(ss)} :: START")
     with b2:
         if st.button("⏸ Pause", use_container_width=True, disabled=not st.session_state.auth["logged_in"]):
-            touch_activity()
-            st.session_state.auto_state = "PAUSED"
-            audit("AUTO", f"{current_gh_key()} :: PAUSE")
+            touch_activity(ss)
+            ctl["auto_state"] = "PAUSED"
+            audit(ss, "AUTO", f"{current_gh_key(ss)} :: PAUSE")
     with b3:
         if st.button("⏹ Stop", use_container_width=True, disabled=not st.session_state.auth["logged_in"]):
-            touch_activity()
-            st.session_state.auto_state = "STOPPED"
-            audit("AUTO", f"{current_gh_key()} :: STOP")
+            touch_activity(ss)
+            ctl["auto_state"] = "STOPPED"
+            audit(ss, "AUTO", f"{current_gh_key(ss)} :: STOP")
     with b4:
         if st.button("Clear Auto Alarm", use_container_width=True, disabled=not st.session_state.auth["logged_in"]):
-            touch_activity()
-            get_gh()["auto_alarm"] = False
-            get_gh()["auto_alarm_msg"] = ""
-            audit("ALARM", f"{current_gh_key()} :: CLEAR")
+            touch_activity(ss)
+            set_auto_alarm(ss, current_gh_key(ss), False)
+            audit(ss, "ALARM", f"{current_gh_key(ss)} :: CLEAR")
 
     row(
         "Auto state",
-        st.session_state.auto_state,
+        ctl["auto_state"],
         None,
-        "hmi-ok" if st.session_state.auto_state == "RUNNING" else "hmi-warn" if st.session_state.auto_state == "PAUSED" else "hmi-bad",
+        "hmi-ok" if ctl["auto_state"] == "RUNNING" else "hmi-warn" if ctl["auto_state"] == "PAUSED" else "hmi-bad",
     )
 
-    gh = get_gh()
-    k_act = compute_k_act(gh)
-    gh["k_act"] = k_act
+    gh = get_gh(ss)
+    k_act = filtered_k_act(gh)
     dev_pct = (gh["k_target"] - k_act) * 100.0
     row("Ktarget (from DSS)", f"{gh['k_target']:.2f}")
-    row("Kact (computed)", f"{k_act:.2f}", f"Δ {dev_pct:+.1f}% (±{K_TOL_PCT:.0f}%)", dev_badge(abs(dev_pct)))
+    row("Kact (filtered)", f"{k_act:.2f}", f"Δ {dev_pct:+.1f}% (±{K_TOL_PCT:.0f}%)", dev_badge(abs(dev_pct)))
+    row("Kact (raw)", f"{compute_k_act(gh):.3f}")
     diverging_bar(-dev_pct, scale_pct=10.0)
 
     q_target = auto_target_q(gh)
@@ -1093,8 +620,19 @@ if mode == "REMOTE AUTOMATIC":
         dev_badge(abs(pct_delta(q_target, gh["q_act"]))),
     )
 
+    suspect = st.session_state.anomaly.suspect(current_gh_key(ss), st.session_state.last_tick_ts)
+    row(
+        "Q/H data quality",
+        ", ".join(st.session_state.anomaly.reasons.get(current_gh_key(ss), [])) if suspect else "Plausible",
+        "SUSPECT" if suspect else "OK",
+        "hmi-warn" if suspect else "hmi-ok",
+    )
+    if ctl["auto_hold_since"] is not None:
+        pill("AUTO HOLD: SUSPECT SENSOR DATA", "hmi-pill hmi-warn")
+
     if gh.get("auto_alarm", False):
         pill("AUTO ALARM: ACTIVE", "hmi-pill hmi-bad")
+        flush_html()
         st.write(gh.get("auto_alarm_msg", ""))
 
     card_end()
@@ -1102,64 +640,141 @@ if mode == "REMOTE AUTOMATIC":
 
 if mode == "REMOTE PROGRAM":
     card_start("Program Mode Control", "Gate House-level: (1) K value pattern / (2) Gate position / (3) Drive time", "🧩")
+    flush_html()
 
-    st.session_state.program_mode = st.radio(
+    ctl["program_mode"] = st.radio(
         "Program mode",
-        ["K VALUE", "GATE POSITION", "DRIVE TIME"],
+        PROGRAM_MODES,
         horizontal=True,
-        index=["K VALUE", "GATE POSITION", "DRIVE TIME"].index(st.session_state.program_mode),
+        index=PROGRAM_MODES.index(ctl["program_mode"]),
     )
 
-    if st.session_state.program_mode == "K VALUE":
+    if ctl["program_mode"] == "K VALUE":
         opts = list(K_PATTERNS.keys())
-        cur = st.session_state.prog_k_pattern
+        cur = ctl["prog_k_pattern"]
         idx = opts.index(cur) if cur in opts else 0
-        st.session_state.prog_k_pattern = st.selectbox("K Pattern (A–I)", opts, index=idx)
+        ctl["prog_k_pattern"] = st.selectbox("K Pattern (A–I)", opts, index=idx)
         st.caption("Operator selects Ktarget instead of obtaining it from DSS (spec).")
-        row("Selected Ktarget", f"{K_PATTERNS[st.session_state.prog_k_pattern]:.2f}")
+        row("Selected Ktarget", f"{K_PATTERNS[ctl['prog_k_pattern']]:.2f}")
+        flush_html()
 
-    elif st.session_state.program_mode == "GATE POSITION":
+        with st.expander("What-if: compare K patterns"):
+            st.caption(
+                "Simulates every pattern forward from the current plant state (same disturbances for all) "
+                "and ranks them by time to reach the Ktarget band (±5%), then by gate travel."
+            )
+            if st.button("Evaluate all patterns", use_container_width=True):
+                touch_activity(ss)
+                st.session_state.whatif = evaluate_patterns(ss)
+            wi = st.session_state.get("whatif")
+            if wi and wi["gh_key"] == current_gh_key(ss):
+                st.caption(
+                    f"Evaluated {datetime.fromtimestamp(wi['t0']).strftime('%H:%M:%S')}  |  "
+                    f"Qplan {wi['q_plan']:.2f} m³/s  |  horizon {wi['horizon_sec'] / 60:.0f} min"
+                )
+                for i, r in enumerate(wi["results"], 1):
+                    if r["blocked"]:
+                        band = "blocked by interlock"
+                    elif r["band_sec"] is None:
+                        band = "band not reached"
+                    else:
+                        band = f"in band {r['band_sec'] / 60:.1f} min"
+                    mark = "  ◀ selected" if r["k_pattern"] == ctl["prog_k_pattern"] else ""
+                    st.caption(
+                        f"{i}. {r['k_pattern']}  |  {band}  |  gate travel {r['travel_m']:.2f} m  |  "
+                        f"Qact {r['q_start']:.2f} → {r['q_end']:.2f} m³/s  |  "
+                        f"released {r['volume_m3'] / 1000:.1f}k m³{mark}"
+                    )
+
+    elif ctl["program_mode"] == "GATE POSITION":
         c1, c2 = st.columns([1, 1], gap="large")
         with c1:
-            st.session_state.prog_gate_pos_unit = st.selectbox(
-                "Unit", ["%", "cm"], index=["%", "cm"].index(st.session_state.prog_gate_pos_unit)
+            ctl["prog_gate_pos_unit"] = st.selectbox(
+                "Unit", ["%", "cm"], index=["%", "cm"].index(ctl["prog_gate_pos_unit"])
             )
         with c2:
-            if st.session_state.prog_gate_pos_unit == "%":
-                st.session_state.prog_gate_pos_value = st.slider(
-                    "Target Gate Position (%)", 0.0, 100.0, float(st.session_state.prog_gate_pos_value), 1.0
+            if ctl["prog_gate_pos_unit"] == "%":
+                ctl["prog_gate_pos_value"] = st.slider(
+                    "Target Gate Position (%)", 0.0, 100.0, float(ctl["prog_gate_pos_value"]), 1.0
                 )
             else:
-                st.session_state.prog_gate_pos_value = st.slider(
-                    "Target Gate Position (cm)", 0.0, 200.0, float(st.session_state.prog_gate_pos_value), 1.0
+                ctl["prog_gate_pos_value"] = st.slider(
+                    "Target Gate Position (cm)", 0.0, 200.0, float(ctl["prog_gate_pos_value"]), 1.0
                 )
         st.caption("Program mode may issue gate position instructions (spec).")
 
     else:
         c1, c2 = st.columns([1, 1], gap="large")
         with c1:
-            st.session_state.prog_drive_direction = st.selectbox(
-                "Direction", ["RAISE", "DOWN"], index=["RAISE", "DOWN"].index(st.session_state.prog_drive_direction)
+            ctl["prog_drive_direction"] = st.selectbox(
+                "Direction", ["RAISE", "DOWN"], index=["RAISE", "DOWN"].index(ctl["prog_drive_direction"])
             )
         with c2:
-            st.session_state.prog_drive_minutes = st.slider(
-                "Drive time (minutes)", 0.0, 10.0, float(st.session_state.prog_drive_minutes), 0.1
+            ctl["prog_drive_minutes"] = st.slider(
+                "Drive time (minutes)", 0.0, 10.0, float(ctl["prog_drive_minutes"]), 0.1
             )
         row("Gate speed", f"{GATE_SPEED_M_PER_MIN:.1f} m/min (spec)")
+        flush_html()
 
     bb1, bb2 = st.columns(2, gap="large")
     with bb1:
         if st.button("▶ RUN", use_container_width=True, disabled=is_blocked):
-            touch_activity()
-            st.session_state.program_running = True
-            send_cmd_to_gatehouse(f"REMOTE PROGRAM RUN ({st.session_state.program_mode})")
+            touch_activity(ss)
+            ctl["program_running"] = True
+            send_cmd_to_gatehouse(ss, f"REMOTE PROGRAM RUN ({ctl['program_mode']})")
     with bb2:
         if st.button("⏹ STOP", use_container_width=True, disabled=not st.session_state.auth["logged_in"]):
-            touch_activity()
-            st.session_state.program_running = False
-            send_cmd_to_gatehouse("REMOTE PROGRAM STOP")
-
-    row("Program state", "RUNNING" if st.session_state.program_running else "STOPPED", None, "hmi-ok" if st.session_state.program_running else "hmi-bad")
+            touch_activity(ss)
+            ctl["program_running"] = False
+            send_cmd_to_gatehouse(ss, "REMOTE PROGRAM STOP")
+
+    row("Program state", "RUNNING" if ctl["program_running"] else "STOPPED", None, "hmi-ok" if ctl["program_running"] else "hmi-bad")
+
+    sched = st.session_state.scheduler
+    gh_key = current_gh_key(ss)
+    active = st.session_state.program_active.get(gh_key)
+    row("Timetable active", describe_entry(active) if active else "—", None, "hmi-ok" if active else "hmi-warn")
+    nxt = sched.next_fire(gh_key)
+    row("Next transition", f"{datetime.fromtimestamp(nxt[0]).strftime('%Y-%m-%d %H:%M')}  ({describe_entry(nxt[2])})" if nxt else "—")
+
+    can_edit = st.session_state.auth["logged_in"] and st.session_state.auth["role"] != "Viewer"
+    flush_html()
+    with st.expander("Timetable (scheduled transitions)"):
+        for e in sched.entries(gh_key):
+            t1, t2 = st.columns([5, 1])
+            with t1:
+                st.caption(describe_entry(e))
+            with t2:
+                if st.button("✕", key=f"sched_del_{e['id']}", disabled=not can_edit):
+                    touch_activity(ss)
+                    sched.remove_entry(gh_key, e["id"])
+                    if st.session_state.program_active.get(gh_key, {}).get("id") == e["id"]:
+                        del st.session_state.program_active[gh_key]
+                    audit(ss, "PROGRAM", f"{gh_key} :: TIMETABLE REMOVE {describe_entry(e)}")
+                    st.rerun()
+        if not sched.entries(gh_key):
+            st.caption("(No timetable entries)")
+
+        s1, s2, s3 = st.columns([1, 2, 1.4])
+        with s1:
+            at = st.time_input("From", value=datetime.strptime("06:00", "%H:%M").time(), step=300)
+        with s2:
+            days = st.multiselect("Days (empty = daily)", WEEKDAYS)
+        with s3:
+            one_off = st.date_input("Closure day (one-off)", value=None)
+        if st.button("Add current program to timetable", use_container_width=True, disabled=not can_edit):
+            touch_activity(ss)
+            e = sched.add_entry(
+                gh_key,
+                {
+                    **current_program(ss),
+                    "time": at.strftime("%H:%M"),
+                    "days": [WEEKDAYS.index(d) for d in days],
+                    "date": one_off.isoformat() if one_off else "",
+                },
+            )
+            audit(ss, "PROGRAM", f"{gh_key} :: TIMETABLE ADD {describe_entry(e)}")
+            st.rerun()
     card_end()
     st.markdown("")
 
@@ -1169,10 +784,13 @@ if mode == "REMOTE MANUAL":
         "Spec-aligned: Operator selects a gate and sends continuous Raise / Down / Stop while monitoring gate position.",
         "🕹️",
     )
-    if get_gatehouse_type() == "SPC":
+    if get_gatehouse_type(ss) == "SPC":
         pill("NOT SUPPORTED ON SPC (Spec)", "hmi-pill hmi-bad")
     else:
         pill("READY" if not is_blocked else "BLOCKED", "hmi-pill hmi-ok" if not is_blocked else "hmi-pill hmi-bad")
+        flush_html()
+        if is_blocked:
+            st.caption(f"Interlock: {', '.join(block_reasons)}")
         st.caption("No % / m setpoint inputs in Remote Manual (per spec).")
     card_end()
     st.markdown("")
@@ -1184,9 +802,8 @@ gates = ASSETS[st.session_state.station][st.session_state.gatehouse]
 if st.session_state.selected_gate not in gates:
     st.session_state.selected_gate = gates[0]
 
-gh = get_gh()
-k_act = compute_k_act(gh)
-gh["k_act"] = k_act
+gh = get_gh(ss)
+k_act = filtered_k_act(gh)
 
 card_start("Gate House Overview", "Schematic: gate positions + Ktarget/Kact status (Gate House-level).", "🏛️")
 
@@ -1200,34 +817,12 @@ svg_overview = overview_building_svg(
     mode_text=mode,
     k_target=gh["k_target"],
     k_act=k_act,
+    gate_etas=st.session_state.eta.gate_etas(current_gh_key(ss)),
+    gh_eta=st.session_state.eta.gatehouse_eta(current_gh_key(ss)),
 )
 
-html_overview = f"""
-<!doctype html>
-<html>
-<head>
-  <meta charset="utf-8" />
-  <style>
-    html, body {{
-      margin: 0;
-      padding: 0;
-      background: transparent;
-      overflow: hidden;
-      height: 100%;
-      width: 100%;
-    }}
-    svg {{
-      display: block;
-      width: 100%;
-      height: 100%;
-    }}
-  </style>
-</head>
-<body>
-  {svg_overview}
-</body>
-</html>
-"""
+html_overview = svg_document_html(svg_overview)
+flush_html()
 components.html(html_overview, height=470, scrolling=False)
 
 sel = st.radio(
@@ -1239,60 +834,82 @@ sel = st.radio(
 )
 if sel != st.session_state.selected_gate:
     st.session_state.selected_gate = sel
-    touch_activity()
+    touch_activity(ss)
     st.rerun()
 
+moves = st.session_state.eta.moves()
+with st.expander(f"Moves in progress ({len(moves)})"):
+    log_lines(
+        [
+            f"{mv['gate_key']}  |  {mv['source']}  |  target {mv['target_pct']:.0f}% ({mv['target_m']:.2f} m)  |  "
+            f"ETA {format_eta(mv['eta_sec'])}{' (queued for power)' if mv['queued'] else ''}  |  done {datetime.fromtimestamp(mv['done_ts']).strftime('%H:%M:%S')}"
+            for mv in moves
+        ],
+        "(All gates at rest)",
+    )
+    flush_html()
+
 card_end()
 st.markdown("")
 
 # =========================================================
 # Detail area
 # =========================================================
-g = get_gate()
-opening_pct = g["open_pct"]
-opening_m = opening_m_from_pct(opening_pct, g["max_open_m"])
+g = get_gate(ss)
+opening_m = g["open_m"]
+opening_pct = gate_open_pct(g)
 
 
 def panel_gate_status_and_controls():
-    gate_key = current_gate_key()
+    gate_key = current_gate_key(ss)
 
     card_start(f"Gate Status — {st.session_state.selected_gate}", "Status view + (Remote Manual) Raise/Down/Stop only.", "🚪")
+    flush_html()
 
     components.html(gate_svg(opening_pct), height=290, scrolling=False)
 
-    row("Opening (Percent)", f"{opening_pct}%")
+    row("Opening (Percent)", f"{opening_pct:.0f}%")
     bar(opening_pct)
     row("Opening (Meters)", f"{opening_m:.2f} m  (max {g['max_open_m']:.2f} m)")
     bar(int(round((opening_m / g["max_open_m"]) * 100)) if g["max_open_m"] > 0 else 0)
+    acked = g["last_cmd"] == "—" or (g.get("last_ack"), g.get("last_ack_time")) == (g["last_cmd"], g["last_cmd_time"])
+    row(
+        "Last command / field ack",
+        f"{g['last_cmd']} @ {g['last_cmd_time']}  /  {g.get('last_ack_time', '—')}",
+        "ACK" if acked else "PENDING",
+        "hmi-ok" if acked else "hmi-warn",
+    )
 
     # SPEC-ALIGNED Remote Manual controls: Raise / Down / Stop only
-    if st.session_state.mode == "REMOTE MANUAL":
-        st.markdown("<div style='height:10px;'></div>", unsafe_allow_html=True)
+    if ctl["mode"] == "REMOTE MANUAL":
+        spacer()
 
-        if get_gatehouse_type() == "SPC":
+        if get_gatehouse_type(ss) == "SPC":
             pill("REMOTE MANUAL NOT AVAILABLE (SPC)", "hmi-pill hmi-bad")
         else:
             cur_cmd = st.session_state.manual_cmd.get(gate_key, "STOP")
             row("Remote Manual command (continuous)", cur_cmd, None, "hmi-ok" if cur_cmd == "STOP" else "hmi-warn")
+            flush_html()
 
             c1, c2, c3 = st.columns(3, gap="large")
             with c1:
                 if st.button("⬆ Raise", use_container_width=True, disabled=is_blocked):
-                    manual_set_cmd(gate_key, "RAISE")
+                    manual_set_cmd(ss, gate_key, "RAISE")
             with c2:
                 if st.button("■ Stop", use_container_width=True, disabled=not st.session_state.auth["logged_in"]):
-                    manual_set_cmd(gate_key, "STOP")
+                    manual_set_cmd(ss, gate_key, "STOP")
             with c3:
                 if st.button("⬇ Down", use_container_width=True, disabled=is_blocked):
-                    manual_set_cmd(gate_key, "DOWN")
+                    manual_set_cmd(ss, gate_key, "DOWN")
 
             st.caption("Behavior: Raise/Down continues until Stop (spec concept).")
 
-    st.markdown("<div style='height:10px;'></div>", unsafe_allow_html=True)
-    st.markdown("<div class='hmi-sub' style='margin-top:2px;'>CCTV</div>", unsafe_allow_html=True)
+    spacer()
+    _html.append("<div class='hmi-sub' style='margin-top:2px;'>CCTV</div>")
+    flush_html()
     st.selectbox(
         "CCTV Camera",
-        ["CCTV — Gate Area", "CCTV — Upstream", "CCTV — Downstream"],
+        CCTV_VIEWS,
         key="cctv_camera",
         label_visibility="collapsed",
     )
@@ -1301,50 +918,190 @@ def panel_gate_status_and_controls():
     card_end()
 
 
+def trend_chart(t, y, label: str, width: int, height: int):
+    t, y = minmax_downsample(t, y, width)
+    st.line_chart({"time": [datetime.fromtimestamp(x) for x in t], label: y}, x="time", y=label, height=height)
+
+
 def panel_trends():
     card_start("Historical Trends", "Gate Opening + Gate House Discharge (dummy).", "📈")
+    flush_html()
     st.session_state.trend_large = st.toggle("Large view", value=st.session_state.trend_large)
-    h = 320 if st.session_state.trend_large else 180
+    large = st.session_state.trend_large
+    h = 320 if large else 180
+    w = TREND_CHART_LARGE_PX if large else TREND_CHART_PX
+    window = None
+    if large and ss.history.enabled:
+        names = list(TREND_WINDOWS)
+        st.session_state.trend_window = st.radio(
+            "Window", names, index=names.index(st.session_state.trend_window), horizontal=True
+        )
+        window = TREND_WINDOWS[st.session_state.trend_window]
 
-    gh = get_gh()
+    gh = get_gh(ss)
     c1, c2 = st.columns(2, gap="large")
     with c1:
-        st.line_chart(st.session_state.trend_gate, height=h)
-        pill(f"Gate: {opening_pct}%", "hmi-pill hmi-ok")
+        if window is None:
+            trend_chart(st.session_state.trend_gate_t, st.session_state.trend_gate, "Gate %", w, h)
+        else:
+            trend_chart(*history_trend(ss.history.root, current_gate_key(ss), "open_pct", window, w, now(ss)), "Gate %", w, h)
+        pill(f"Gate: {opening_pct:.0f}%", "hmi-pill hmi-ok")
+        flush_html()
     with c2:
-        st.line_chart(gh["trend_q"], height=h)
+        if window is None:
+            trend_chart(gh["trend_q_t"], gh["trend_q"], "Qact", w, h)
+        else:
+            trend_chart(*history_trend(ss.history.root, current_gh_key(ss), "q_act", window, w, now(ss)), "Qact", w, h)
         pill(f"Gate House Qact: {gh['q_act']:.2f} m³/s", "hmi-pill hmi-ok")
+        flush_html()
     card_end()
 
 
 def panel_alarms_and_logs():
     card_start("Alarms / Logs", "Protection + Auto alarm + Audit trail (demo).", "🛡️")
 
-    if any(st.session_state.prot.values()):
+    if protection_active(ss):
         pill("ACTIVE PROTECTION / TRIP", "hmi-pill hmi-bad")
     else:
         pill("NO ACTIVE TRIP", "hmi-pill hmi-ok")
 
-    for k, v in st.session_state.prot.items():
-        row(k, "ON" if v else "OFF", None, "hmi-bad" if v else "hmi-ok")
-
-    gh = get_gh()
-    if gh.get("auto_alarm", False):
-        pill("AUTO ALARM", "hmi-pill hmi-bad")
-        st.write(gh.get("auto_alarm_msg", ""))
+    alarms = st.session_state.alarms
+    user = st.session_state.auth["user"] if st.session_state.auth["logged_in"] else "—"
+    can_ack = st.session_state.auth["logged_in"] and st.session_state.auth["role"] != "Viewer"
+    visible = alarms.alarms_for(current_gh_key(ss))
+    row("Unacknowledged alarms", str(alarms.unacked_count), None, "hmi-bad" if alarms.unacked_count else "hmi-ok")
+    for a in visible[:ALARM_PANEL_MAX]:
+        badge = "hmi-bad" if a["state"] == "ACTIVE" and a["severity"] == "HIGH" else "hmi-warn" if a["state"] == "ACTIVE" else "hmi-ok"
+        label = f"{a['severity']} · {a['state']}" + ("" if a["acked"] else " · UNACK") + (f" ×{a['count']}" if a["count"] > 1 else "")
+        row(a["message"], "", label, badge)
+        flush_html()
+        a1, a2 = st.columns(2)
+        with a1:
+            if st.button("Ack", key=f"ack_{a['id']}", use_container_width=True, disabled=a["acked"] or not can_ack):
+                touch_activity(ss)
+                alarms.ack(a["id"], user)
+                audit(ss, "ALARM", f"ACK {a['id']}")
+                st.rerun()
+        with a2:
+            if st.button("Shelve 15 min", key=f"shelve_{a['id']}", use_container_width=True, disabled=not can_ack):
+                touch_activity(ss)
+                alarms.shelve(a["id"], user)
+                audit(ss, "ALARM", f"SHELVE {a['id']}")
+                st.rerun()
+    if len(visible) > ALARM_PANEL_MAX:
+        log_lines([f"+ {len(visible) - ALARM_PANEL_MAX} more alarm(s) not shown"])
+    flush_html()
+    if visible and st.button("Ack all", use_container_width=True, disabled=not can_ack):
+        touch_activity(ss)
+        for a in visible:
+            alarms.ack(a["id"], user)
+        audit(ss, "ALARM", f"ACK ALL ({len(visible)})")
+        st.rerun()
 
-    st.markdown("<div style='height:10px;'></div>", unsafe_allow_html=True)
-    st.markdown("**Recent Audit Log**")
+    shelved = [a for a in alarms.alarms_for(current_gh_key(ss), include_shelved=True) if a["id"] in alarms.shelved]
+    if shelved:
+        with st.expander(f"Shelved ({len(shelved)})"):
+            for a in shelved:
+                if st.button(f"Unshelve: {a['message']}", key=f"unshelve_{a['id']}", disabled=not can_ack):
+                    touch_activity(ss)
+                    alarms.unshelve(a["id"], user)
+                    audit(ss, "ALARM", f"UNSHELVE {a['id']}")
+                    st.rerun()
+    with st.expander("Alarm history"):
+        hist = list(alarms.history)[-20:]
+        log_lines([f"{it['time']}  |  {it['event']}  |  {it['severity']}  |  {it['message']}" for it in reversed(hist)])
+        flush_html()
+
+    spacer()
+    _html.append("<div><b>Recent Audit Log</b></div>")
     recent = st.session_state.audit_log[-12:]
-    if recent:
-        for it in reversed(recent):
-            st.caption(f"{it['time']}  |  {it['user']}({it['role']})  |  {it['event']}  |  {it['detail']}")
-    else:
-        st.caption("(No records yet)")
+    log_lines([f"{it['time']}  |  {it['user']}({it['role']})  |  {it['event']}  |  {it['detail']}" for it in reversed(recent)])
+    flush_html()
+
+    with st.expander("Export history (CSV / Parquet)"):
+        if ss.history.enabled:
+            panel_export()
+        else:
+            st.caption("History is disabled (WMS_HISTORY_DIR is empty).")
 
     card_end()
 
 
+def _read_export(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def panel_export():
+    kind = EXPORT_KINDS[st.selectbox("Data", list(EXPORT_KINDS), key="export_kind")]
+    today = datetime.now().date()
+    days = st.date_input("Days", (today, today), key="export_days")
+    fmt = st.radio("Format", EXPORT_FORMATS, horizontal=True, key="export_fmt")
+    this_gh = st.checkbox("Current Gate House only", value=True, key="export_this_gh", disabled=kind != "trend")
+
+    job = ss.get("export_job")
+    running = job is not None and not job.done
+    if st.button("Start export", use_container_width=True, disabled=running or not ss.auth["logged_in"] or len(days) != 2):
+        touch_activity(ss)
+        t_from = datetime.combine(days[0], datetime.min.time()).timestamp()
+        t_to = datetime.combine(days[1], datetime.min.time()).timestamp() + 24 * 3600
+        keys = None
+        if kind == "trend" and this_gh:
+            gh_key = current_gh_key(ss)
+            keys = {gh_key} | {f"{gh_key}/{g}" for g in all_gates_in_gatehouse(ss)}
+        ss.history.flush()
+        ss.export_job = ExportJob(ss.history.root, kind, fmt, t_from, t_to, keys).start()
+        audit(ss, "EXPORT", f"{kind} {days[0]}..{days[1]} as {fmt}")
+        st.rerun()
+
+    if job is None:
+        st.caption(f"History rows recorded this session: {ss.history.rows_written:,}")
+    elif not job.done:
+        st.caption(f"Exporting {job.file_name} … {job.rows:,} rows written (runs in the background)")
+    elif job.error:
+        st.error(f"Export failed: {job.error}")
+    elif job.downloadable:
+        st.download_button(
+            f"Download {job.file_name} ({job.rows:,} rows, {job.size_mb:.1f} MB)",
+            data=lambda: _read_export(job.path),  # read on click, not on every rerun
+            file_name=job.file_name,
+            use_container_width=True,
+        )
+    else:
+        st.caption(f"{job.rows:,} rows, {job.size_mb:.0f} MB (over {EXPORT_DOWNLOAD_MAX_MB} MB): saved as {job.path}")
+
+
+def panel_delivery():
+    card_start("Water Delivery", f"Daily accounting per Gate House (day starts {DAY_START_HOUR:02d}:00).", "💧")
+    gh_key = current_gh_key(ss)
+    today = st.session_state.stats.today_summary(gh_key)
+    if today:
+        in_band = today["in_band_pct"]
+        row("Volume today", f"{today['volume_m3']:,.0f} m³")
+        row(
+            f"Inside ±{K_TOL_PCT:.0f}% band",
+            "—" if in_band is None else f"{in_band:.1f}%  ({today['in_band_sec'] / 60:.0f} / {(today['in_band_sec'] + today['out_band_sec']) / 60:.0f} min)",
+            None if in_band is None else ("OK" if in_band >= 90 else "LOW"),
+            "hmi-ok" if in_band is not None and in_band >= 90 else "hmi-warn",
+        )
+        row("Mean Kact", "—" if today["mean_k_act"] is None else f"{today['mean_k_act']:.3f}")
+    flush_html()
+    with st.expander("Daily report"):
+        log_lines(
+            [
+                f"{d['day']}  |  {d['volume_m3']:,.0f} m³  |  in band "
+                + ("—" if d["in_band_pct"] is None else f"{d['in_band_pct']:.1f}%")
+                + "  |  mean Kact "
+                + ("—" if d["mean_k_act"] is None else f"{d['mean_k_act']:.3f}")
+                + (f"  |  no data {d['no_data_sec'] / 60:.0f} min" if d["no_data_sec"] else "")
+                for d in st.session_state.stats.daily_report(gh_key)
+            ],
+            "(No completed days yet)",
+        )
+        flush_html()
+    card_end()
+
+
 def panel_power():
     card_start("Power / Generator", "Power source status (dummy)", "⚡")
     row(
@@ -1359,6 +1116,18 @@ def panel_power():
         None,
         "hmi-ok" if st.session_state.gen_state != "ERROR" else "hmi-bad",
     )
+    gh_key = current_gh_key(ss)
+    budget = power_budget_kw(ss, gh_key)
+    motion = ss.motion
+    running = len(motion.running.get(gh_key, ()))
+    waiting = motion.waiting.get(gh_key, 0)
+    row(
+        "Gate motors (this Gate House)",
+        f"{running} running  |  {waiting} waiting"
+        + ("" if budget is None else f"  |  {motion.load_kw.get(gh_key, 0.0):.1f} / {budget:.0f} kW"),
+        "SEQUENCED" if budget is not None else None,
+        "hmi-warn" if waiting else "hmi-ok",
+    )
     card_end()
 
 
@@ -1367,13 +1136,32 @@ with left:
     panel_gate_status_and_controls()
 with mid:
     panel_trends()
+    panel_delivery()
 with right:
     panel_alarms_and_logs()
     panel_power()
 
+if "checkpoint" in ss:
+    ss.checkpoint.commit(ss, time.time())  # operator actions of this rerun reach the journal now
+if "sync" in ss:
+    ss.sync.push(ss)  # and the other consoles
+
 # =========================================================
 # Auto refresh
 # =========================================================
+# The poll ticks the process every AUTO_REFRESH_SEC without redrawing; the
+# page is rerun only when the tick produced an exception (deadband exceeded,
+# integrity refresh, command/alarm event).
+@st.fragment(run_every=AUTO_REFRESH_SEC)
+def auto_refresh_poll():
+    if time.time() - ss.last_tick_ts < AUTO_REFRESH_SEC * 0.5:
+        return  # the full rerun that rendered this fragment has just ticked
+    run_ticks(ss)
+    if ss.rbe.take_ui_dirty():
+        ss.tick_done = True
+        st.rerun()
+
+
 if auto_refresh:
-    time.sleep(1)
-    st.rerun()
+    st.session_state.rbe.take_ui_dirty()  # this render is current
+    auto_refresh_poll()
@@ -0,0 +1,15 @@
+from datetime import datetime
+
+import pytest
+
+from wms_core import SimClock, new_plant_state
+
+T0 = datetime(2025, 1, 6, 6, 0).timestamp()
+
+
+@pytest.fixture
+def plant():
+    """Seeded headless plant on a simulated clock, operator logged in."""
+    ss = new_plant_state(7, SimClock(T0))
+    ss.auth.update({"logged_in": True, "user": "operator", "role": "Operator"})
+    return ss
@@ -0,0 +1,69 @@
+from wms_core.alarms import ALARM_CHATTER_SEC, CONSOLE_WIDE, AlarmEngine
+
+GH = "BBT15/BaratMainGateHouse"
+ID = f"{GH}|PROT_ELR"
+
+
+def raise_elr(eng: AlarmEngine, on: bool, t: float):
+    eng.update(ID, on, GH, "HIGH", "Protection trip: ELR", t)
+
+
+def events(eng: AlarmEngine) -> list[str]:
+    return [e["event"] for e in eng.history]
+
+
+def test_repeated_inputs_are_ignored():
+    eng = AlarmEngine()
+    raise_elr(eng, True, 0.0)
+    version = eng.version
+    raise_elr(eng, True, 1.0)
+    assert eng.version == version
+    assert events(eng) == ["RAISE"]
+
+
+def test_rtn_alarm_stays_until_acknowledged():
+    eng = AlarmEngine()
+    raise_elr(eng, True, 0.0)
+    raise_elr(eng, False, 1.0)
+    eng.tick(100.0)
+    assert eng.active[ID]["state"] == "RTN"
+    assert eng.unacked_count == 1
+
+    eng.ack(ID, "op", 101.0)
+    eng.tick(101.0 + ALARM_CHATTER_SEC)
+    assert ID not in eng.active
+    assert events(eng) == ["RAISE", "CLEAR", "ACK"]
+    assert eng.unacked_count == 0
+
+
+def test_chatter_is_folded_into_one_alarm():
+    eng = AlarmEngine()
+    raise_elr(eng, True, 0.0)
+    for t in (1.0, 3.0, 5.0):
+        raise_elr(eng, False, t)
+        raise_elr(eng, True, t + 1.0)
+    assert events(eng).count("RAISE") == 1
+    assert eng.active[ID]["count"] == 4
+
+    raise_elr(eng, False, 10.0)
+    raise_elr(eng, True, 10.0 + ALARM_CHATTER_SEC + 1.0)
+    assert events(eng).count("RAISE") == 2
+
+
+def test_shelved_alarm_is_hidden_until_it_expires():
+    eng = AlarmEngine()
+    raise_elr(eng, True, 0.0)
+    eng.shelve(ID, "op", seconds=60.0, now=0.0)
+    assert not eng.has_active(GH)
+    assert eng.alarms_for(GH) == []
+    eng.tick(60.0)
+    assert eng.has_active(GH)
+
+
+def test_console_wide_alarms_show_on_every_gatehouse():
+    eng = AlarmEngine()
+    eng.update("GEN_ERROR", True, CONSOLE_WIDE, "HIGH", "Generator error", 0.0)
+    raise_elr(eng, True, 1.0)
+    eng.update("LOW_ONE", True, GH, "LOW", "low", 2.0)
+    assert [a["id"] for a in eng.alarms_for(GH)] == [ID, "GEN_ERROR", "LOW_ONE"]  # severity, then newest
+    assert eng.has_active("BUT10/WaruGateHouse")
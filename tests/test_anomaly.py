@@ -0,0 +1,81 @@
+import random
+
+from wms_core import automatic_step, compute_h_plan_from_qplan, now
+from wms_core.anomaly import (
+    ANOMALY_CLEAR_SEC,
+    FLATLINE_SAMPLES,
+    SPIKE_MAX_RUN,
+    WARMUP_SAMPLES,
+    AnomalyDetector,
+    RollingMinMax,
+    SignalMonitor,
+)
+
+from conftest import T0
+
+GH = "BBT15/BaratMainGateHouse"
+
+
+def test_rolling_min_max_follows_the_window():
+    w = RollingMinMax(3)
+    for x in (5.0, 1.0, 4.0):
+        w.push(x)
+    assert w.full and w.span == 4.0
+    w.push(2.0)  # 5.0 leaves the window
+    assert w.span == 3.0
+    w.push(3.0)  # so does 1.0
+    assert w.span == 2.0
+
+
+def test_stuck_meter_is_a_flatline_unless_the_flow_is_zero():
+    stuck, closed = SignalMonitor("q"), SignalMonitor("q")
+    flags = [stuck.check(10.0, T0 + i) for i in range(FLATLINE_SAMPLES)]
+    assert "FLATLINE" not in flags[-2] and "FLATLINE" in flags[-1]
+    assert all("FLATLINE" not in closed.check(0.0, T0 + i) for i in range(FLATLINE_SAMPLES))
+
+
+def test_spike_is_flagged_and_a_new_level_is_accepted():
+    rng = random.Random(1)
+    mon = SignalMonitor("q")
+    for i in range(WARMUP_SAMPLES + 10):
+        mon.check(10.0 + rng.gauss(0.0, 0.01), T0 + i)
+    t = T0 + WARMUP_SAMPLES + 10
+    assert "SPIKE" in mon.check(13.0, t)
+    assert "SPIKE" not in mon.check(10.0, t + 1)  # the outlier did not move the baseline
+
+    # The same jump held: flagged SPIKE_MAX_RUN times, then taken as the new level
+    flags = [mon.check(13.0, t + 10 + i) for i in range(SPIKE_MAX_RUN + 1)]
+    assert all("SPIKE" in f for f in flags[:SPIKE_MAX_RUN])
+    assert "SPIKE" not in flags[-1]
+
+
+def test_level_drift_makes_the_gatehouse_suspect_until_it_clears():
+    det = AnomalyDetector()
+    q = 10.0
+    t = T0
+    for i in range(200):
+        t = T0 + i
+        det.check(GH, q + 0.01 * (i % 2), compute_h_plan_from_qplan(q) + 0.3, t)
+    assert "HQ_DRIFT" in det.flags[GH]
+    assert det.suspect(GH, t) and det.reasons[GH] == ["HQ_DRIFT"]
+    assert not det.suspect(GH, t + ANOMALY_CLEAR_SEC)
+
+
+def test_automatic_holds_on_suspect_data(plant):
+    gh = plant.gh_state[GH]
+    gh.update({"mode": "REMOTE AUTOMATIC", "k_target": 0.3})
+    t = now(plant)
+    for i in range(FLATLINE_SAMPLES):
+        plant.anomaly.check(GH, 10.0, compute_h_plan_from_qplan(10.0), t - FLATLINE_SAMPLES + 1 + i)
+    gates = {k: dict(gs) for k, gs in plant.gate_state.items() if k.startswith(GH)}
+
+    automatic_step(plant, GH)
+    assert gh["auto_hold_since"] == t
+    assert "HOLD" in plant.audit_log[-1]["detail"]
+    assert {k: plant.gate_state[k] for k in gates} == gates
+
+    plant.clock.advance(ANOMALY_CLEAR_SEC)
+    automatic_step(plant, GH)
+    assert gh["auto_hold_since"] is None
+    assert "RESUME" in plant.audit_log[-1]["detail"]
+    assert {k: plant.gate_state[k] for k in gates} != gates  # and the gates move again
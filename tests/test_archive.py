@@ -0,0 +1,99 @@
+import math
+import random
+from datetime import datetime
+
+import pytest
+
+from wms_core import archive
+from wms_core.archive import archive_path, compact_closed, decode_block, encode_block, iter_archive, read_index, write_archive
+from wms_core.export import iter_rows
+from wms_core.history import HistoryStore
+
+DAY = datetime(2025, 1, 6).timestamp()
+
+
+def roundtrip(ts, vs):
+    out_ts, out_vs = decode_block(encode_block(ts, vs), ts[0], len(ts))
+    assert out_ts == ts
+    assert [repr(v) for v in out_vs] == [repr(v) for v in vs]  # exact, NaN included
+
+
+# =========================================================
+# Block codec
+# =========================================================
+def test_codec_roundtrip_regular_series():
+    ts = [1_736_121_600_000 + 1000 * i for i in range(500)]
+    vs = [round(10.0 + 0.01 * math.sin(i / 7.0), 2) for i in range(500)]
+    roundtrip(ts, vs)
+
+
+def test_codec_roundtrip_irregular_and_special_values():
+    rng = random.Random(1)
+    ts = [0]
+    for _ in range(300):
+        ts.append(ts[-1] + rng.choice([1, 999, 1000, 1001, 65_000, 10**9]))
+    vs = [rng.choice([0.0, -0.0, 50.0, -3.25, 1e-300, float("inf"), float("nan"), rng.random()]) for _ in ts]
+    roundtrip(ts, vs)
+
+
+def test_codec_single_sample():
+    roundtrip([123], [4.5])
+
+
+def test_constant_series_costs_a_few_bytes():
+    ts = [1000 * i for i in range(1024)]
+    data = encode_block(ts, [50.0] * 1024)
+    assert len(data) < 1024 // 8 + 16  # one bit per regular timestamp, one run
+
+
+# =========================================================
+# Archive files
+# =========================================================
+@pytest.fixture
+def small_blocks(monkeypatch):
+    monkeypatch.setattr(archive, "ARCHIVE_BLOCK_SAMPLES", 50)
+
+
+def series_of(n: int) -> dict:
+    t0 = int(DAY * 1000)
+    return {
+        ("ST/GH", "q_act"): [(t0 + 1000 * i, 10.0 + i / 100.0) for i in range(n)],
+        ("ST/GH/G1", "open_pct"): [(t0 + 1000 * i + 500, float(i // 60 * 10)) for i in range(n)],
+    }
+
+
+def test_archive_query_is_time_ordered_and_filtered(tmp_path, small_blocks):
+    path = str(tmp_path / "day.wmsa")
+    write_archive(path, series_of(600))
+    assert len(read_index(path)["blocks"]) == 24
+
+    rows = list(iter_archive(path, DAY, DAY + 86400))
+    assert len(rows) == 1200
+    assert all(a[0] <= b[0] for a, b in zip(rows, rows[1:]))
+
+    window = list(iter_archive(path, DAY + 100, DAY + 110, {"ST/GH"}))
+    assert [r[0] - DAY for r in window] == [float(s) for s in range(100, 110)]
+    assert {r[1] for r in window} == {"ST/GH"}
+
+    high = list(iter_archive(path, DAY, DAY + 86400, None, (80.0, None)))
+    assert high and all(r[3] >= 80.0 for r in high)
+    assert list(iter_archive(path, DAY + 86400, DAY + 2 * 86400)) == []
+
+
+def test_compaction_keeps_every_row(tmp_path):
+    root = str(tmp_path)
+    h = HistoryStore(root)
+    for s in range(0, 3600, 5):
+        h.record_trend("ST/GH", "q_act", round(10.0 + s / 3600.0, 2), DAY + s)
+        h.record_trend("ST/GH/G1", "open_pct", float(s // 600 * 10), DAY + s)
+    h.flush()
+    before = sorted(map(tuple, iter_rows(root, "trend", DAY, DAY + 86400)))
+    assert len(before) == 1440
+
+    done = compact_closed(root, "2025-01-07")
+    assert set(done) == {"2025-01-06"}
+    assert done["2025-01-06"]["archive_bytes"] < done["2025-01-06"]["csv_bytes"]
+    after = sorted(map(tuple, iter_rows(root, "trend", DAY, DAY + 86400)))
+    assert [(round(r[0], 3),) + r[1:] for r in after] == [(round(r[0], 3),) + r[1:] for r in before]
+    assert compact_closed(root, "2025-01-07") == {}
+    assert read_index(archive_path(root, "2025-01-06"))["blocks"]
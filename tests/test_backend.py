@@ -0,0 +1,94 @@
+import pytest
+
+from wms_core import SimClock, SqliteBackend, StateBackend, StateSync, audit, new_plant_state, run_ticks
+
+from conftest import T0
+
+UTARA = "BUT10/UtaraMainGateHouse"
+
+
+def console(db: str, seed: int = 3):
+    ss = new_plant_state(seed, SimClock(T0))
+    ss.auth.update({"logged_in": True, "user": "operator", "role": "Operator"})
+    ss.sync = StateSync(SqliteBackend(db))
+    ss.sync.attach(ss)
+    return ss
+
+
+def tick(*sessions):
+    for ss in sessions:
+        run_ticks(ss)
+        ss.clock.advance(1.0)
+
+
+def test_backend_interface_is_abstract():
+    with pytest.raises(TypeError):
+        StateBackend()
+
+
+def test_follower_command_runs_on_its_own_gatehouse(tmp_path):
+    db = str(tmp_path / "state.db")
+    leader, follower = console(db), console(db)
+    tick(leader, follower)
+    assert leader.sync.is_leader and not follower.sync.is_leader
+
+    # The follower looks at another Gate House than the leader
+    follower.station, follower.gatehouse = "BUT10", "UtaraMainGateHouse"
+    gate = f"{UTARA}/Gate1"
+    start = leader.gate_state[gate]["open_m"]
+    follower.gh_state[UTARA]["mode"] = "REMOTE MANUAL"
+    follower.manual_cmd[gate] = "RAISE"
+    follower.sync.push(follower)
+    for _ in range(5):
+        tick(leader, follower)
+
+    assert leader.gh_state[UTARA]["mode"] == "REMOTE MANUAL"
+    assert leader.gate_state[gate]["open_m"] > start
+    assert follower.gate_state[gate] == leader.gate_state[gate]
+    assert leader.gh_state[f"{leader.station}/{leader.gatehouse}"]["mode"] == "REMOTE AUTOMATIC"  # the leader's own is untouched
+
+
+def test_pull_returns_only_the_changed_fields(tmp_path):
+    db = str(tmp_path / "state.db")
+    a, b = console(db), console(db)
+    tick(a, b)
+    b.gh_state[UTARA]["k_target"] = 0.75
+    b.sync.push(b)
+
+    rec = a.sync.pull(a)
+    assert rec["gh"] == {UTARA: {"k_target": 0.75}}
+    assert a.sync.pull(a) is None
+
+
+def test_unpushed_change_survives_a_pull(tmp_path):
+    db = str(tmp_path / "state.db")
+    leader, follower = console(db), console(db)
+    tick(leader, follower)
+    audit(follower, "NOTE", "before rerun")  # not pushed yet
+    tick(leader)
+
+    follower.sync.pull(follower)
+    follower.sync.push(follower)
+    leader.sync.pull(leader)
+
+    assert leader.audit_log[-1]["event"] == "NOTE"
+
+
+def test_alarm_acks_from_two_consoles_both_stick(tmp_path):
+    db = str(tmp_path / "state.db")
+    leader, follower = console(db), console(db)
+    for a in ("X|TEST", "Y|TEST"):
+        leader.alarms.update(a, True, UTARA, "LOW", a, T0)
+    tick(leader, follower)
+    assert {"X|TEST", "Y|TEST"} <= follower.alarms.active.keys()
+
+    # Neither console has seen the other's ack when it publishes its own
+    follower.alarms.ack("X|TEST", "operator", T0)
+    follower.sync.push(follower)
+    leader.alarms.ack("Y|TEST", "operator", T0)
+    leader.sync.push(leader)
+    follower.sync.pull(follower)
+    leader.sync.pull(leader)
+
+    for ss in (leader, follower):
+        assert ss.alarms.active["X|TEST"]["acked"] and ss.alarms.active["Y|TEST"]["acked"]
@@ -0,0 +1,85 @@
+import pytest
+
+from wms_core.cctv import CctvProxy, MjpegFileSource
+
+CAM = "CCTV — Gate Area"
+FRAMES = [b"\xff\xd8" + bytes([i]) * 16 + b"\xff\xd9" for i in range(5)]
+
+
+class FakeClock:
+    """Monotonic time that only moves when the test (or a viewer's sleep) moves it."""
+
+    def __init__(self):
+        self.t = 1000.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.t
+
+    def sleep(self, sec: float):
+        self.sleeps.append(sec)
+        self.t += sec
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def proxy(tmp_path, clock):
+    path = tmp_path / "gate-area.mjpeg"
+    path.write_bytes(b"".join(FRAMES))
+    p = CctvProxy({CAM: MjpegFileSource(str(path), fps=200.0)}, idle_sec=30.0, clock=clock, sleep=clock.sleep)
+    yield p
+    p.close()
+
+
+def test_viewers_share_one_upstream_connection(proxy):
+    a, b = proxy.stream(CAM), proxy.stream(CAM)
+    assert next(a) in FRAMES and next(b) in FRAMES
+    assert proxy.snapshot(CAM)[1] in FRAMES
+    feed = proxy.feeds[CAM]
+    assert feed.connects == 1 and feed.viewers == 2
+    a.close()
+    b.close()
+    assert feed.viewers == 0
+
+
+def test_slow_viewer_backs_off_then_recovers(proxy, clock):
+    frames = proxy.stream(CAM, fps=5.0)
+    next(frames)
+
+    def interval(consume_sec: float) -> float:
+        t = clock()
+        clock.t += consume_sec  # the viewer takes this long to take the frame
+        next(frames)
+        return clock() - t
+
+    assert interval(0.01) == pytest.approx(0.2)  # fast viewer: its own frame rate
+    for _ in range(10):
+        assert interval(0.6) == pytest.approx(0.6)  # slow viewer: one current frame per frame it manages
+    recover = [interval(0.01) for _ in range(15)]
+    assert recover[0] > 0.4  # still spaced out like the slow frames
+    assert all(x >= y for x, y in zip(recover, recover[1:]))
+    assert recover[-1] == pytest.approx(0.2, abs=0.01)
+    frames.close()
+
+
+def test_idle_camera_is_disconnected_and_reconnects(proxy, clock):
+    assert proxy.snapshot(CAM) is not None
+    feed = proxy.feeds[CAM]
+    watching = proxy.stream(CAM)
+    next(watching)
+    clock.t += 60.0
+    proxy.reap()
+    assert feed.connected  # a viewer is still on it
+
+    watching.close()
+    clock.t += 31.0
+    proxy.reap()
+    feed._thread.join(2.0)
+    assert not feed.connected and feed.frame is None
+
+    assert proxy.snapshot(CAM) is not None
+    assert feed.connects == 2
@@ -0,0 +1,128 @@
+import copy
+
+from wms_core import Checkpointer, PlantState, StateDiff, apply_delta, audit, init_state, run_ticks, set_protection
+from wms_core import checkpoint as checkpoint_mod
+
+GH = "BBT15/BaratMainGateHouse"
+GATE = f"{GH}/Gate1"
+
+
+def run(ss, n: int):
+    for _ in range(n):
+        run_ticks(ss)
+        ss.clock.advance(1.0)
+
+
+def restored(root: str, clock) -> PlantState:
+    ss = PlantState()
+    ss.clock = clock
+    Checkpointer(root).restore(ss)
+    init_state(ss, 7)
+    return ss
+
+
+# =========================================================
+# StateDiff / apply_delta
+# =========================================================
+def test_first_delta_is_the_baseline(plant):
+    diff = StateDiff()
+    assert diff.delta(plant) == {}
+    assert diff.delta(plant) == {}
+    full = StateDiff().delta(plant, full=True)
+    assert set(full["gates"]) == set(plant.gate_state)
+    assert set(full["gh"]) == set(plant.gh_state)
+
+
+def test_delta_holds_only_what_changed(plant):
+    diff = StateDiff()
+    diff.delta(plant)
+    plant.gen_state = "ERROR"
+    plant.gate_state[GATE]["open_m"] += 0.1
+    plant.gh_state[GH]["mode"] = "REMOTE MANUAL"
+    plant.gh_state[GH]["trend_q"].append(1.0)
+    audit(plant, "TEST", "one entry")
+
+    rec = diff.delta(plant)
+    assert rec["set"] == {"gen_state": "ERROR"}
+    assert list(rec["gates"]) == [GATE]
+    assert rec["gh"] == {GH: {"mode": "REMOTE MANUAL"}}  # trends are left to the checkpoints
+    assert [e["event"] for e in rec["audit_log"]] == ["TEST"]
+    assert diff.delta(plant) == {}
+
+
+def test_apply_delta_reproduces_the_changes(plant):
+    mirror = copy.deepcopy({k: plant[k] for k in ("gate_state", "gh_state", "manual_cmd", "audit_log")})
+    mirror_ss = PlantState(mirror)
+    diff = StateDiff()
+    diff.delta(plant)
+    plant.manual_cmd[GATE] = "RAISE"
+    plant.gate_state[GATE]["open_m"] = 0.42
+    plant.gh_state[GH]["k_target"] = 0.8
+    audit(plant, "TEST", "mirrored")
+
+    apply_delta(mirror_ss, diff.delta(plant))
+    for k in mirror:
+        assert mirror_ss[k] == plant[k], k
+
+
+def test_gh_changes_compares_with_the_last_seen_row(plant):
+    diff = StateDiff(trends=True)  # as the state sync uses it
+    diff.delta(plant)
+    row = dict(plant.gh_state[GH], mode="LOCAL (LCP ACTIVE)")
+    assert diff.gh_changes(GH, row) == {"mode": "LOCAL (LCP ACTIVE)"}
+
+
+# =========================================================
+# Checkpointer
+# =========================================================
+def test_restore_replays_the_journal(plant, tmp_path):
+    root = str(tmp_path)
+    plant.checkpoint = Checkpointer(root)
+    plant.gh_state[GH]["auto_state"] = "RUNNING"
+    run(plant, 10)
+    set_protection(plant, GH, "ELR", True)
+    plant.gh_state[GH]["mode"] = "REMOTE MANUAL"
+    run(plant, 5)
+    assert plant.checkpoint.records > 0  # the last changes are only in the journal
+
+    back = restored(root, plant.clock)
+    assert back.gate_state == plant.gate_state
+    assert back.prot == plant.prot
+    assert back.gh_state[GH]["mode"] == "REMOTE MANUAL"
+    assert back.alarms.active == plant.alarms.active
+    assert back.audit_log == plant.audit_log
+
+
+def test_torn_journal_tail_is_ignored(plant, tmp_path):
+    root = str(tmp_path)
+    plant.checkpoint = Checkpointer(root)
+    run(plant, 5)
+    with open(plant.checkpoint.journal_path, "ab") as f:
+        f.write(b"\x10\x00\x00\x00garbage")
+    assert restored(root, plant.clock).gate_state == plant.gate_state
+
+
+def test_second_console_takes_over_when_the_owner_exits(plant, tmp_path):
+    root = str(tmp_path)
+    owner = plant.checkpoint = Checkpointer(root)
+    run(plant, 3)
+    other = Checkpointer(root)
+    assert not other.owner
+    other.commit(plant, plant.clock())
+    assert not other.owner
+
+    seq = owner.seq
+    del owner, plant.checkpoint  # exit: the lock goes with the open file
+    other.commit(plant, plant.clock())
+    assert other.owner
+    assert other.seq == seq + 1  # continues after the owner's checkpoint
+
+
+def test_checkpoint_keeps_the_last_log_entries(plant, tmp_path, monkeypatch):
+    monkeypatch.setattr(checkpoint_mod, "CHECKPOINT_LOG_MAX", 5)
+    for i in range(12):
+        audit(plant, "TEST", str(i))
+    ck = Checkpointer(str(tmp_path))
+    ck.checkpoint(plant, plant.clock())
+    back = restored(str(tmp_path), plant.clock)
+    assert [e["detail"] for e in back.audit_log] == [str(i) for i in range(7, 12)]
@@ -0,0 +1,71 @@
+import json
+
+from wms_core.comm import DiskQueue
+
+
+def lines(path) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def msgs(lo: int, hi: int) -> list[dict]:
+    return [{"ts": float(i)} for i in range(lo, hi)]
+
+
+def test_memory_queue_is_fifo():
+    q = DiskQueue()
+    q.push_many(msgs(0, 5))
+    assert q.pop_many(2) == msgs(0, 2)
+    assert len(q) == 3
+    assert q.pop_many(10) == msgs(2, 5)
+    assert len(q) == 0
+
+
+def test_overflow_drops_the_oldest():
+    q = DiskQueue(maxlen=3)
+    q.push_many(msgs(0, 5))
+    assert q.full
+    assert q.dropped == 2
+    assert q.pop_many(3) == msgs(2, 5)
+
+
+def test_file_is_compacted_once_half_is_consumed(tmp_path):
+    path = tmp_path / "plant.jsonl"
+    q = DiskQueue(str(path))
+    q.push_many(msgs(0, 10))
+    q.pop_many(4)
+    assert len(lines(path)) == 10  # consumed entries stay until they are half of the file
+    q.pop_many(1)
+    assert lines(path) == msgs(5, 10)
+    q.pop_many(5)
+    assert not path.exists()  # empty queue: no file
+
+
+def test_queue_resumes_from_its_file(tmp_path):
+    path = str(tmp_path / "plant.jsonl")
+    q = DiskQueue(path)
+    q.push_many(msgs(0, 6))
+    q.pop_many(2)
+    del q  # process restart: the lock goes with the open file
+
+    resumed = DiskQueue(path)
+    assert resumed.pop_many(10) == msgs(0, 6)  # at-least-once: pops not yet compacted are sent again
+
+
+def test_compacted_pops_are_not_resent(tmp_path):
+    path = str(tmp_path / "plant.jsonl")
+    q = DiskQueue(path)
+    q.push_many(msgs(0, 6))
+    q.pop_many(3)
+    del q
+
+    assert DiskQueue(path).pop_many(10) == msgs(3, 6)
+
+
+def test_one_queue_owns_the_file(tmp_path):
+    path = str(tmp_path / "plant.jsonl")
+    owner = DiskQueue(path)
+    other = DiskQueue()
+    assert not other.attach(path)
+    assert other.path is None
+    assert owner.path == path
@@ -0,0 +1,55 @@
+import numpy as np
+
+from wms_core.downsample import TREND_CACHE_QUANTUM_SEC, _closed_day, history_trend, minmax_downsample
+from wms_core.history import HistoryStore
+
+from conftest import T0
+
+
+def test_short_series_is_returned_as_is():
+    t, y = minmax_downsample([0.0, 1.0, 2.0], [5.0, 6.0, 7.0], 480)
+    assert t.tolist() == [0.0, 1.0, 2.0]
+    assert y.tolist() == [5.0, 6.0, 7.0]
+
+
+def test_late_rows_are_sorted_by_time():
+    t, y = minmax_downsample([0.0, 2.0, 1.0], [5.0, 7.0, 6.0], 480)
+    assert t.tolist() == [0.0, 1.0, 2.0]
+    assert y.tolist() == [5.0, 6.0, 7.0]
+
+
+def test_reduced_to_the_chart_width_keeping_peaks():
+    n = 100_000
+    t = np.arange(n, dtype=float)
+    y = np.sin(t / 500.0)
+    y[12_345] = 50.0   # spike
+    y[77_777] = -50.0  # dip
+    rt, ry = minmax_downsample(t, y, 480)
+
+    assert len(rt) <= 480
+    assert rt[0] == 0.0 and rt[-1] == n - 1
+    assert np.all(np.diff(rt) > 0)
+    assert 50.0 in ry and -50.0 in ry
+
+
+def test_constant_timestamps_still_reduce():
+    rt, ry = minmax_downsample(np.zeros(1000), np.arange(1000.0), 100)
+    assert len(rt) <= 100
+    assert ry.min() == 0.0 and ry.max() == 999.0
+
+
+def test_history_window_reads_closed_days_once(tmp_path):
+    h = HistoryStore(str(tmp_path))
+    for i in range(0, 3 * 86400, 60):
+        h.record_trend("A/B", "q_act", float(i % 7), T0 + i)
+    h.record_trend("A/B", "q_act", 50.0, T0 + 86400 + 30)  # spike on a closed day
+    h.flush()
+    now = T0 + 3 * 86400 - 600
+    before = _closed_day.cache_info()
+
+    t, y = history_trend(str(tmp_path), "A/B", "q_act", 7 * 86400.0, 480, now)
+    history_trend(str(tmp_path), "A/B", "q_act", 7 * 86400.0, 480, now + TREND_CACHE_QUANTUM_SEC)
+    after = _closed_day.cache_info()
+
+    assert len(t) <= 480 and y.max() == 50.0 and y.min() == 0.0
+    assert after.misses - before.misses == after.hits - before.hits  # second window: closed days from the cache
@@ -0,0 +1,66 @@
+from datetime import datetime
+
+from wms_core.dss import DSS_POLL_SEC, DssIngest
+
+GH = "BBT15/BaratMainGateHouse"
+T = datetime(2025, 1, 6, 6, 0).timestamp()
+HEADER = "gh_key,from,to,q_plan,k_target\n"
+
+
+def write(path, text: str, mode: str = "a"):
+    with open(path, mode, encoding="utf-8") as f:
+        f.write(text)
+
+
+def test_active_row_is_applied_once(plant, tmp_path):
+    write(tmp_path / "plan.csv", HEADER + f"{GH},2025-01-06T06:00,2025-01-06T18:00,11.5,0.9\n", "w")
+    dss = DssIngest(str(tmp_path))
+    assert dss.poll(plant, T) == {GH: {"q_plan": 11.5, "k_target": 0.9}}
+    assert plant.gh_state[GH]["q_plan"] == 11.5
+    assert dss.poll(plant, T + DSS_POLL_SEC) == {}
+
+
+def test_rows_wait_for_their_period(plant, tmp_path):
+    write(tmp_path / "plan.csv", HEADER + f"{GH},2025-01-06T07:00,,,0.8\n", "w")
+    dss = DssIngest(str(tmp_path))
+    assert dss.poll(plant, T) == {}
+    assert dss.poll(plant, T + 3600) == {GH: {"k_target": 0.8}}  # empty q_plan: left as it is
+
+
+def test_appended_rows_are_read_incrementally(plant, tmp_path):
+    path = tmp_path / "plan.csv"
+    write(path, HEADER + f"{GH},,,10.0,\n", "w")
+    dss = DssIngest(str(tmp_path))
+    dss.poll(plant, T)
+    write(path, f"{GH},,,12.0,\n{GH},,,13")  # the DSS is mid-append: the partial line waits
+    assert dss.poll(plant, T + DSS_POLL_SEC) == {GH: {"q_plan": 12.0}}
+    write(path, ".0,\n")
+    assert dss.poll(plant, T + 2 * DSS_POLL_SEC) == {GH: {"q_plan": 13.0}}
+
+
+def test_bad_rows_are_rejected(plant, tmp_path):
+    write(tmp_path / "plan.csv", HEADER + "NOPE/GH,,,1.0,\n" + f"{GH},yesterday,,1.0,\n" + f"{GH},,,1.0\n", "w")
+    dss = DssIngest(str(tmp_path))
+    assert dss.poll(plant, T) == {}
+    assert dss.rejected == 3
+
+
+def test_out_of_range_values_are_rejected(plant, tmp_path):
+    rows = [f"{GH},,,nan,\n", f"{GH},,,inf,\n", f"{GH},,,-1.0,\n", f"{GH},,,,1.5\n", f"{GH},,,,-0.1\n"]
+    write(tmp_path / "plan.csv", HEADER + "".join(rows), "w")
+    dss = DssIngest(str(tmp_path))
+    assert dss.poll(plant, T) == {}
+    assert dss.rejected == len(rows)
+
+
+def test_k_value_timetable_keeps_its_ktarget(plant, tmp_path):
+    plant.program_active[GH] = {"program_mode": "K VALUE"}
+    write(tmp_path / "plan.csv", HEADER + f"{GH},,,9.0,0.5\n", "w")
+    assert DssIngest(str(tmp_path)).poll(plant, T) == {GH: {"q_plan": 9.0}}
+
+
+def test_operator_k_value_run_keeps_its_ktarget(plant, tmp_path):
+    plant.gh_state[GH].update({"mode": "REMOTE PROGRAM", "program_running": True, "program_mode": "K VALUE"})
+    write(tmp_path / "plan.csv", HEADER + f"{GH},,,9.0,0.5\n", "w")
+    assert DssIngest(str(tmp_path)).poll(plant, T) == {GH: {"q_plan": 9.0}}
+    assert "Ktarget kept by K VALUE program" in plant.audit_log[-1]["detail"]
@@ -0,0 +1,66 @@
+import numpy as np
+
+import pytest
+
+from wms_core.eta import EtaEngine
+
+GATES = {
+    "S/A/G1": {"open_m": 0.0, "max_open_m": 2.0},
+    "S/A/G2": {"open_m": 1.0, "max_open_m": 2.0},
+    "S/B/G1": {"open_m": 0.5, "max_open_m": 1.0},
+}
+
+
+@pytest.fixture
+def eta():
+    e = EtaEngine(GATES)
+    e.begin_tick(None)
+    return e
+
+
+def test_idle_plant_has_no_eta(eta):
+    eta.compute(GATES, 0.0)
+    assert eta.gatehouse_eta("S/A") is None
+    assert eta.gate_etas("S/A") == {"G1": None, "G2": None}
+    assert eta.moves() == []
+
+
+def test_gatehouse_completes_with_its_slowest_gate(eta):
+    eta.set_moves(["S/A/G1", "S/A/G2"], [1.0, 0.0], [0.1, 0.5], "AUTO")
+    eta.compute(GATES, 100.0)
+    assert eta.gate_eta("S/A/G1") == pytest.approx(10.0)
+    assert eta.gate_eta("S/A/G2") == pytest.approx(2.0)
+    assert eta.gatehouse_eta("S/A") == pytest.approx(10.0)
+    assert eta.gatehouse_eta("S/B") is None
+    assert [m["gate_key"] for m in eta.moves()] == ["S/A/G2", "S/A/G1"]
+    assert eta.moves()[1]["done_ts"] == pytest.approx(110.0)
+
+
+def test_arrived_or_stopped_gates_have_no_eta(eta):
+    eta.set_moves(["S/A/G2"], 1.0, 0.1, "AUTO")  # already there
+    eta.set_moves(["S/B/G1"], 0.0, 0.0, "AUTO")  # not driven
+    eta.compute(GATES, 0.0)
+    assert np.isnan(eta.eta_sec).all()
+
+
+def test_queued_gate_waits_for_a_running_motor(eta):
+    eta.set_moves(["S/A/G1", "S/A/G2"], [1.0, 0.0], [0.1, 0.5], "AUTO", [False, True])
+    eta.set_moves(["S/B/G1"], 1.0, 0.1, "AUTO", True)  # nothing running there: starts next
+    eta.compute(GATES, 0.0)
+    assert eta.gate_eta("S/A/G2") == pytest.approx(10.0 + 2.0)
+    assert eta.gatehouse_eta("S/A") == pytest.approx(12.0)
+    assert eta.gate_eta("S/B/G1") == pytest.approx(5.0)
+    assert {m["gate_key"]: m["queued"] for m in eta.moves()} == {"S/A/G1": False, "S/A/G2": True, "S/B/G1": True}
+
+
+def test_moves_are_cleared_every_tick(eta):
+    eta.set_moves(["S/A/G1"], 2.0, 0.1, "MANUAL")
+    eta.begin_tick(1.0)
+    eta.compute(GATES, 1.0)
+    assert eta.gatehouse_eta("S/A") is None
+
+
+def test_step_rate_follows_the_tick_period(eta):
+    for _ in range(50):
+        eta.begin_tick(2.0)
+    assert eta.step_rate(0.04) == pytest.approx(0.02, rel=1e-3)
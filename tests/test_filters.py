@@ -0,0 +1,54 @@
+import math
+
+import pytest
+
+from wms_core.filters import Ewma, HoldLastGood, KactConditioner, RollingMedian
+
+GH = "BBT15/BaratMainGateHouse"
+
+
+def test_rolling_median_drops_a_single_spike():
+    med = RollingMedian(window=5)
+    out = [med.update(x, True, t) for t, x in enumerate([1.0, 1.0, 9.0, 1.0, 1.0])]
+    assert out == [1.0, 1.0, 1.0, 1.0, 1.0]
+
+
+def test_rolling_median_window_slides():
+    med = RollingMedian(window=3)
+    out = [med.update(x, True, t) for t, x in enumerate([5.0, 1.0, 3.0, 7.0, 8.0])]
+    assert out == [5.0, 3.0, 3.0, 3.0, 7.0]  # even counts average the middle pair
+
+
+def test_ewma_converges_by_alpha():
+    f = Ewma(alpha=0.5)
+    assert f.update(0.0, True, 0) == 0.0
+    assert f.update(1.0, True, 1) == 0.5
+    assert f.update(1.0, True, 2) == 0.75
+
+
+def test_hold_last_good_for_a_limited_time():
+    f = HoldLastGood(max_sec=60.0)
+    assert f.update(0.9, True, 0.0) == 0.9
+    assert f.update(5.0, False, 30.0) == 0.9
+    assert f.update(float("nan"), True, 40.0) == 0.9  # not finite: held as well
+    assert f.update(5.0, False, 61.0) == 5.0  # nothing recent to hold
+
+
+def test_conditioner_chains_in_order_per_gatehouse():
+    kc = KactConditioner(("HOLD", "EWMA"))
+    assert kc.update(GH, 1.0, True, 0.0) == 1.0
+    assert kc.update(GH, 9.0, False, 1.0) == 1.0  # held before smoothing
+    assert kc.update("OTHER", 2.0, True, 1.0) == 2.0
+    kc.reset(GH)
+    assert kc.update(GH, 3.0, True, 2.0) == 3.0
+
+
+def test_empty_chain_is_raw_kact():
+    kc = KactConditioner(())
+    assert kc.update(GH, 0.73, False, 0.0) == 0.73
+    assert math.isnan(kc.update(GH, float("nan"), True, 1.0))
+
+
+def test_unknown_filter_is_rejected():
+    with pytest.raises(ValueError, match="BOXCAR"):
+        KactConditioner(("HOLD", "BOXCAR"))
@@ -0,0 +1,53 @@
+from datetime import datetime
+
+from wms_core.export import iter_rows
+from wms_core.history import HistoryStore
+
+DAY = datetime(2025, 1, 6).timestamp()
+
+
+def trend(root: str) -> list[tuple]:
+    return [tuple(r) for r in iter_rows(root, "trend", DAY, DAY + 86400)]
+
+
+def test_rows_are_written_per_day_segment(tmp_path):
+    root = str(tmp_path)
+    h = HistoryStore(root)
+    h.record_trend("ST/GH", "q_act", 10.0, DAY + 1.0)
+    h.record_trend("ST/GH", "q_act", 11.0, DAY + 86401.0)
+    h.flush()
+    assert h.days("trend") == ["2025-01-06", "2025-01-07"]
+    assert trend(root) == [(DAY + 1.0, "ST/GH", "q_act", 10.0)]
+
+
+def test_sample_applies_the_deadband(tmp_path):
+    h = HistoryStore(str(tmp_path))
+    for i, pct in enumerate([50.0, 50.2, 50.4, 52.0]):
+        h.sample("ST/GH/G1", "open_pct", pct, DAY + i)
+    h.flush()
+    assert [r[3] for r in trend(str(tmp_path))] == [50.0, 52.0]
+
+
+def test_only_one_console_writes_a_plant_history(tmp_path):
+    root = str(tmp_path)
+    owner, other = HistoryStore(root), HistoryStore(root)
+    owner.record_trend("ST/GH", "q_act", 1.0, DAY + 1.0)
+    owner.flush()
+    other.record_trend("ST/GH", "q_act", 2.0, DAY + 2.0)
+    other.flush()
+    assert owner.writer and not other.writer
+    assert [r[3] for r in trend(root)] == [1.0]
+
+    owner.release()  # no longer the tick owner
+    other.record_trend("ST/GH", "q_act", 3.0, DAY + 3.0)
+    other.flush()
+    assert other.writer
+    assert [r[3] for r in trend(root)] == [1.0, 3.0]
+
+
+def test_disabled_store_records_nothing():
+    h = HistoryStore(None)
+    h.record_trend("ST/GH", "q_act", 1.0, DAY)
+    h.flush()
+    assert not h.enabled
+    assert h.days("trend") == []
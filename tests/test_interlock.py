@@ -0,0 +1,59 @@
+from wms_core import blocked, interlock_reasons, protection_active, set_protection
+from wms_core.interlock import InterlockEngine, prot_reason_code
+
+GH = "BBT15/BaratMainGateHouse"
+OTHER = "BBT15/WastewayGateHouse"
+
+
+def test_reason_codes():
+    assert prot_reason_code("ELR") == "PROT_ELR"
+    assert prot_reason_code("Control De-Energize") == "PROT_CONTROL_DE_ENERGIZE"
+
+
+def test_permitted_by_default(plant):
+    assert interlock_reasons(plant, GH) == ()
+    assert not blocked(plant, GH)
+
+
+def test_console_wide_inputs_block_every_gatehouse(plant):
+    plant.gen_state = "ERROR"
+    plant.remote_enabled = False
+    assert interlock_reasons(plant, GH) == ("GEN_ERROR", "REMOTE_DISABLED")
+    assert interlock_reasons(plant, OTHER) == ("GEN_ERROR", "REMOTE_DISABLED")
+
+    plant.gen_state = "RUNNING"
+    plant.remote_enabled = True
+    plant.auth["role"] = "Viewer"
+    assert interlock_reasons(plant, GH) == ("VIEWER_ROLE",)
+    plant.auth["logged_in"] = False
+    assert interlock_reasons(plant, GH) == ("NOT_LOGGED_IN",)
+
+
+def test_protection_blocks_its_own_gatehouse(plant):
+    set_protection(plant, GH, "Overload", True)
+    assert interlock_reasons(plant, GH) == ("PROT_OVERLOAD",)
+    assert protection_active(plant, GH)
+    assert not blocked(plant, OTHER)
+    assert plant.alarms.has_active(GH)
+
+    set_protection(plant, GH, "Overload", False)
+    assert not blocked(plant, GH)
+
+
+def test_local_mode_is_per_gatehouse(plant):
+    plant.gh_state[GH]["mode"] = "LOCAL (LCP ACTIVE)"
+    assert interlock_reasons(plant, GH) == ("LOCAL_MODE",)
+    assert not blocked(plant, OTHER)
+
+
+def test_only_changed_rows_are_reevaluated():
+    prot = {GH: {"ELR": False}, OTHER: {"ELR": False}}
+    eng = InterlockEngine(prot)
+    inputs = ("RUNNING", True, True, "Operator")
+    eng.refresh(inputs)
+    assert eng.set_protection(GH, "ELR", True)
+    assert not eng.set_protection(GH, "ELR", True)  # no change, nothing to re-evaluate
+    assert eng._dirty == {GH}
+    eng.refresh(inputs)
+    assert eng.reasons(GH) == ("PROT_ELR",)
+    assert eng.reasons(OTHER) == ()
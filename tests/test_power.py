@@ -0,0 +1,76 @@
+from wms_core import run_ticks
+from wms_core.power import GATE_MOTOR_KW, MotionSequencer
+
+GH = "BBT15/BaratMainGateHouse"
+
+
+def wants(*gates) -> dict:
+    return {f"{GH}/{g}": (0.1, 1.0) for g in gates}
+
+
+def test_commercial_power_grants_every_move(plant):
+    seq = MotionSequencer()
+    assert seq.grant(plant, GH, wants("Gate1", "Gate2", "Gate3")) == set(wants("Gate1", "Gate2", "Gate3"))
+    assert seq.load_kw[GH] == 3 * GATE_MOTOR_KW
+
+
+def test_generator_starts_one_motor_per_tick(plant):
+    plant.commercial_power = False
+    seq = MotionSequencer()
+    w = wants("Gate1", "Gate2", "Gate3", "Gate4")
+    assert len(seq.grant(plant, GH, w)) == 1
+    assert seq.waiting[GH] == 3
+    assert len(seq.grant(plant, GH, w)) == 2
+
+
+def test_grants_are_released_when_moves_end(plant):
+    plant.commercial_power = False
+    seq = MotionSequencer()
+    seq.grant(plant, GH, wants("Gate1", "Gate2"))
+    assert seq.grant(plant, GH, {}) == set()
+    assert GH not in seq.running and GH not in seq.waiting
+
+    seq.grant(plant, GH, wants("Gate1"))
+    seq.end_tick()
+    assert GH in seq.running  # asked this tick
+    seq.end_tick()
+    assert GH not in seq.running and GH not in seq.load_kw  # did not ask
+
+
+def test_transfer_replans_the_running_motors(plant):
+    seq = MotionSequencer()
+    seq.grant(plant, GH, wants("Gate1", "Gate2"))
+    plant.commercial_power = False
+    assert len(seq.grant(plant, GH, wants("Gate1", "Gate2"))) == 1
+    assert seq.replans == 1
+
+
+def test_stopped_automatic_frees_its_motors(plant):
+    plant.commercial_power = False
+    plant.gen_state = "RUNNING"
+    gh = plant.gh_state[GH]
+    gh["auto_state"] = "RUNNING"
+    gh["k_target"] = 0.3
+    for _ in range(3):
+        run_ticks(plant)
+        plant.clock.advance(1.0)
+    assert plant.motion.running.get(GH)
+
+    gh["auto_state"] = "STOPPED"
+    run_ticks(plant)
+    assert GH not in plant.motion.running
+    assert GH not in plant.motion.waiting
+
+
+def test_held_gates_have_a_queued_eta(plant):
+    plant.commercial_power = False
+    plant.gen_state = "RUNNING"
+    gh = plant.gh_state[GH]
+    gh["auto_state"] = "RUNNING"
+    gh["k_target"] = 0.3
+    run_ticks(plant)
+    assert plant.motion.waiting[GH]
+
+    queued = [m for m in plant.eta.moves() if m["queued"]]
+    assert len(queued) == plant.motion.waiting[GH]
+    assert plant.eta.gatehouse_eta(GH) == max(m["eta_sec"] for m in queued)
@@ -0,0 +1,53 @@
+from wms_core.rbe import TREND_LEN, DeadbandFilter, append_trend, backfill_trend
+
+
+def test_first_value_is_always_forwarded():
+    rbe = DeadbandFilter()
+    assert rbe.check("GH", "q_act", 10.0, now=0.0)
+    assert rbe.take_ui_dirty()
+    assert not rbe.take_ui_dirty()
+
+
+def test_changes_inside_the_deadband_are_suppressed():
+    rbe = DeadbandFilter({"q_act": {"abs": 0.02, "pct": 0.5}})
+    rbe.check("GH", "q_act", 10.0, now=0.0)
+    assert not rbe.check("GH", "q_act", 10.04, now=1.0)  # band = max(0.02, 0.5% of 10) = 0.05
+    assert rbe.check("GH", "q_act", 10.06, now=2.0)
+    assert not rbe.check("GH", "q_act", 10.03, now=3.0)  # measured from the last reported value
+    assert (rbe.forwarded, rbe.suppressed) == (2, 2)
+
+
+def test_absolute_band_near_zero():
+    rbe = DeadbandFilter({"q_act": {"abs": 0.02, "pct": 0.5}})
+    rbe.check("GH", "q_act", 0.0, now=0.0)
+    assert not rbe.check("GH", "q_act", 0.015, now=1.0)
+    assert rbe.check("GH", "q_act", 0.03, now=2.0)
+
+
+def test_points_are_independent():
+    rbe = DeadbandFilter()
+    rbe.check("A", "open_pct", 50.0, now=0.0)
+    assert rbe.check("B", "open_pct", 50.0, now=0.0)
+    assert not rbe.check("A", "open_pct", 50.2, now=1.0)
+
+
+def test_unchanged_value_is_refreshed_after_the_integrity_period():
+    rbe = DeadbandFilter(integrity_sec=60.0)
+    rbe.check("GH", "h_act", 2.0, now=0.0)
+    assert not rbe.check("GH", "h_act", 2.0, now=59.0)
+    assert rbe.check("GH", "h_act", 2.0, now=60.0)
+
+
+def test_trend_is_capped():
+    values, times = [], []
+    for i in range(TREND_LEN + 10):
+        append_trend(values, times, float(i), float(i))
+    assert len(values) == len(times) == TREND_LEN
+    assert values[0] == times[0] == 10.0
+
+
+def test_backfill_merges_late_points_in_time_order():
+    values, times = [1.0, 3.0], [10.0, 30.0]
+    backfill_trend(values, times, [(20.0, 2.0), (10.0, 9.0)])
+    assert times == [10.0, 20.0, 30.0]
+    assert values == [1.0, 2.0, 3.0]
@@ -0,0 +1,39 @@
+import json
+import os
+
+from wms_core.replay import RUN_VERSION, compare, read_run, replay, synth
+
+SCENARIOS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scenarios")
+
+
+def test_baseline_run_matches_the_golden():
+    # Recorded with run file version 1 (control state per console): still replays to the same trajectory
+    with open(os.path.join(SCENARIOS, "baseline_golden.json"), encoding="utf-8") as f:
+        golden = json.load(f)
+    report = compare(replay(os.path.join(SCENARIOS, "baseline_run.jsonl")), golden)
+    bad = {k: v for k, v in report["series"].items() if v["first_tick"] is not None}
+    assert report["ok"], bad
+
+
+def test_recorded_run_replays_identically(tmp_path):
+    run = str(tmp_path / "run.jsonl")
+    synth(run, seed=3, ticks=90)
+    header, ticks = read_run(run)
+    assert header["version"] == RUN_VERSION
+    assert len(ticks) == 90
+
+    first = replay(run)
+    assert compare(replay(run), first)["ok"]
+
+
+def test_compare_reports_the_first_diverging_tick(tmp_path):
+    run = str(tmp_path / "run.jsonl")
+    synth(run, seed=3, ticks=30)
+    golden = replay(run)
+    result = json.loads(json.dumps(golden))
+    key = next(iter(result["gates"]))
+    result["gates"][key][12] += 0.01
+
+    report = compare(result, golden)
+    assert not report["ok"]
+    assert report["series"][f"gates:{key}"]["first_tick"] == 12
@@ -0,0 +1,72 @@
+from datetime import datetime
+
+from wms_core.domain import K_PATTERNS
+from wms_core.scheduler import ProgramScheduler, describe_entry
+
+GH = "BBT15/BaratMainGateHouse"
+MON = datetime(2025, 1, 6)  # a Monday
+
+
+def ts(day: datetime, hh: int, mm: int = 0) -> float:
+    return day.replace(hour=hh, minute=mm).timestamp()
+
+
+def k_entry(time: str, **kw) -> dict:
+    return {"time": time, "program_mode": "K VALUE", "k_pattern": next(iter(K_PATTERNS)), **kw}
+
+
+def test_daily_entry_fires_once_per_day():
+    sched = ProgramScheduler(None)
+    e = sched.add_entry(GH, k_entry("06:00"), now=ts(MON, 5))
+
+    assert sched.pop_due(ts(MON, 5, 59)) == []
+    assert sched.pop_due(ts(MON, 6)) == [(GH, e)]
+    assert sched.pop_due(ts(MON, 23)) == []
+    assert sched.next_fire()[0] == ts(MON.replace(day=7), 6)
+
+
+def test_weekday_entry_skips_other_days():
+    sched = ProgramScheduler(None)
+    sched.add_entry(GH, k_entry("06:00", days=[2]), now=ts(MON, 7))  # Wednesday
+
+    assert sched.next_fire(GH)[0] == ts(MON.replace(day=8), 6)
+    assert sched.pop_due(ts(MON.replace(day=7), 23)) == []
+
+
+def test_removed_entry_does_not_fire():
+    sched = ProgramScheduler(None)
+    e = sched.add_entry(GH, k_entry("06:00"), now=ts(MON, 5))
+    sched.remove_entry(GH, e["id"], now=ts(MON, 5))
+
+    assert sched.pop_due(ts(MON, 7)) == []
+    assert sched.next_fire() is None
+    assert GH not in sched.timetables
+
+
+def test_edits_from_two_consoles_are_merged(tmp_path):
+    path = str(tmp_path / "program_schedules.json")
+    a = ProgramScheduler.load(path, ts(MON, 5))
+    b = ProgramScheduler.load(path, ts(MON, 5))
+    ea = a.add_entry(GH, k_entry("06:00"), now=ts(MON, 5))
+    eb = b.add_entry(GH, k_entry("07:00"), now=ts(MON, 5))  # b has not seen a's entry
+
+    assert {e["id"] for e in ProgramScheduler.load(path, ts(MON, 5)).entries(GH)} == {ea["id"], eb["id"]}
+    assert a.refresh(ts(MON, 5))
+    assert not a.refresh(ts(MON, 5))
+    assert [e for _, e in a.pop_due(ts(MON, 7))] == [ea, eb]
+
+
+def test_current_entries_resume_the_last_transition():
+    sched = ProgramScheduler(None)
+    sched.add_entry(GH, k_entry("06:00"), now=ts(MON, 5))
+    later = sched.add_entry(GH, k_entry("08:00"), now=ts(MON, 5))
+    sched.add_entry(GH, {"time": "09:00", "program_mode": "DRIVE TIME", "drive_direction": "RAISE", "drive_minutes": 1.0})
+
+    assert sched.current_entries(ts(MON, 8, 30)) == {GH: later}
+    assert sched.current_entries(ts(MON, 9, 30)) == {}  # a drive is a one-shot step, nothing to resume
+
+
+def test_describe_entry():
+    assert describe_entry(k_entry("06:00", days=[0, 4])).startswith("Mon,Fri 06:00 → K ")
+    assert describe_entry({"time": "07:30", "date": "2025-01-06", "program_mode": "GATE POSITION",
+                           "gate_pos_value": 40.0, "gate_pos_unit": "%"}) == "2025-01-06 07:30 → POS 40%"
@@ -0,0 +1,75 @@
+from wms_core import SimClock, SqliteBackend, StateSync, new_plant_state
+from wms_core.shard import ShardCoordinator
+
+from conftest import T0
+
+UTARA = "BUT10/UtaraMainGateHouse"
+
+
+def test_inline_and_process_shards_agree():
+    a = ShardCoordinator(7, T0, inline=True, schedule_path=None)
+    b = ShardCoordinator(7, T0, schedule_path=None)
+    seen = set()
+    try:
+        for i in range(20):
+            a.cycle(T0 + i)
+            b.cycle(T0 + i)
+            gh = a.ss.gh_state[UTARA]
+            seen.add((gh["q_act"], gh["k_act_raw"]))
+    finally:
+        b.close()
+    assert a.ss.gate_state == b.ss.gate_state
+    assert all(a.ss.gh_state[k]["q_act"] == b.ss.gh_state[k]["q_act"] for k in a.ss.gh_state)
+    # telemetry reaches the coordinator and the shards' outboxes drain every tick
+    assert len({q for q, _ in seen}) > 1 and len({k for _, k in seen}) > 1
+    assert all(not sh.ss.comm._outbox for sh in a._shards.values())
+
+
+def test_coordinator_forwards_only_pulled_rows(tmp_path, monkeypatch):
+    db = str(tmp_path / "state.db")
+    coord = ShardCoordinator(7, T0, stations=["BUT10"], inline=True, sync=StateSync(SqliteBackend(db)), schedule_path=None)
+    con = new_plant_state(3, SimClock(T0))
+    con.sync = StateSync(SqliteBackend(db))
+    con.sync.attach(con)
+    coord.cycle(T0)
+    sent = []
+    shard = coord._shards["BUT10"]
+    step = shard.step
+    monkeypatch.setattr(shard, "step", lambda t, inputs: (sent.append(inputs), step(t, inputs))[1])
+
+    con.gh_state[UTARA]["mode"] = "REMOTE MANUAL"
+    con.sync.push(con)
+    coord.cycle(T0 + 1)
+
+    assert "gates" not in sent[-1]
+    assert sent[-1]["gh"][UTARA]["mode"] == "REMOTE MANUAL"
+    assert set(sent[-1]["gh"][UTARA]) <= {"mode", "q_inflow"}  # plus the canal link inflow, sent every cycle
+    assert shard.ss.gh_state[UTARA]["mode"] == "REMOTE MANUAL"
+    coord.close()
+
+
+def test_console_ack_reaches_the_shard(tmp_path):
+    db = str(tmp_path / "state.db")
+    coord = ShardCoordinator(7, T0, stations=["BBT15"], inline=True, sync=StateSync(SqliteBackend(db)), schedule_path=None)
+    con = new_plant_state(3, SimClock(T0))
+    con.sync = StateSync(SqliteBackend(db))
+    con.sync.attach(con)
+    shard = coord._shards["BBT15"].ss
+    shard.sensor_faults.q_mode = "STUCK"
+    alarm = "BBT15/BaratMainGateHouse|SENSOR_SUSPECT"
+    for t in range(int(T0), int(T0) + 120):
+        coord.cycle(t)
+        if alarm in coord.ss.alarms.active:
+            break
+    con.sync.pull(con)
+
+    con.alarms.ack(alarm, "operator", t)
+    con.sync.push(con)
+    shard.sensor_faults.q_mode = "NONE"  # the shard's table keeps changing (return to normal)
+    for _ in range(5):
+        coord.cycle(t)
+        t += 1
+
+    assert shard.alarms.active[alarm]["acked"]
+    assert coord.ss.alarms.active[alarm]["acked"]
+    coord.close()
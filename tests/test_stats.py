@@ -0,0 +1,41 @@
+from wms_core.stats import STATS_MAX_GAP_SEC, DischargeStats
+
+from conftest import T0
+
+GH = "BBT15/BaratMainGateHouse"
+
+
+def row(q: float = 10.0, k_act: float = 1.0, k_target: float = 1.0) -> dict:
+    # Raw Kact is q_act / q_plan; k_act is what the filter chain made of it
+    return {GH: {"q_act": q, "q_plan": 10.0, "k_act": k_act, "k_target": k_target}}
+
+
+def test_gap_is_counted_as_no_data():
+    stats = DischargeStats()
+    stats.update(row(), T0)
+    stats.update(row(), T0 + 10)
+    stats.update(row(), T0 + 10 + STATS_MAX_GAP_SEC + 1)
+    day = stats.today_summary(GH)
+    assert day["volume_m3"] == 100.0
+    assert day["no_data_sec"] == STATS_MAX_GAP_SEC + 1
+
+
+def test_interval_is_split_at_the_day_boundary():
+    stats = DischargeStats(day_start_hour=6)  # T0 is 06:00
+    stats.update(row(), T0 - 60)
+    stats.update(row(), T0 + 60)
+    [closed] = stats.daily_report(GH)
+    today = stats.today_summary(GH)
+    assert closed["volume_m3"] == today["volume_m3"] == 600.0
+    assert closed["day"] < today["day"]
+
+
+def test_band_edges_use_the_filtered_kact():
+    stats = DischargeStats()
+    stats.update(row(k_act=1.049), T0)            # just inside ±5 %
+    stats.update(row(k_act=1.051), T0 + 10)       # just outside
+    stats.update(row(q=12.0, k_act=0.99), T0 + 30)  # raw spike (1.2), filtered in band
+    stats.update(row(), T0 + 40)
+    day = stats.today_summary(GH)
+    assert day["in_band_sec"] == 20.0 and day["out_band_sec"] == 20.0
+    assert day["in_band_pct"] == 50.0
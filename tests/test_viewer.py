@@ -0,0 +1,64 @@
+import threading
+
+from wms_core.viewer import VIEWER_SNAPSHOT_TTL_SEC, ViewerSnapshots, build_viewer_snapshot
+
+from conftest import T0
+
+GH = "BBT15/BaratMainGateHouse"
+
+
+def builder(t: float, log: list):
+    def build():
+        log.append(t)
+        return {"t": t}
+    return build
+
+
+def test_snapshot_is_reused_until_it_is_stale():
+    snaps, built = ViewerSnapshots(refresh_sec=2.0), []
+    first = snaps.get(("p", GH), T0, builder(T0, built))
+    assert snaps.get(("p", GH), T0 + 1.9, builder(T0 + 1.9, built)) is first
+    assert snaps.get(("p", GH), T0 + 2.0, builder(T0 + 2.0, built))["t"] == T0 + 2.0
+    assert built == [T0, T0 + 2.0] and snaps.hits == 1
+
+
+def test_snapshots_nobody_asks_for_expire():
+    snaps = ViewerSnapshots()
+    snaps.get(("a", GH), T0, builder(T0, []))
+    t = T0 + VIEWER_SNAPSHOT_TTL_SEC + 1
+    snaps.get(("b", GH), t, builder(t, []))
+    assert set(snaps._snaps) == {("b", GH)}
+    assert ("a", GH) not in snaps._building
+
+
+def test_one_build_per_key_without_blocking_other_keys():
+    snaps = ViewerSnapshots()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow_build():
+        calls.append("a")
+        started.set()
+        release.wait(5.0)
+        return {"t": T0}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(snaps.get(("a", GH), T0, slow_build))) for _ in range(3)]
+    threads[0].start()
+    started.wait(5.0)
+    for th in threads[1:]:
+        th.start()
+    # Another key builds while "a" is still being built
+    assert snaps.get(("b", GH), T0, builder(T0, calls))["t"] == T0
+    release.set()
+    for th in threads:
+        th.join(5.0)
+
+    assert calls.count("a") == 1 and len(calls) == 2
+    assert len(results) == 3 and all(r is results[0] for r in results)
+
+
+def test_snapshot_renders_the_gatehouse(plant):
+    snap = build_viewer_snapshot(plant, GH, T0)
+    assert snap["gh_key"] == GH and "<svg" in snap["overview_html"]
+    assert "Ktarget / Kact" in snap["status_html"]
@@ -0,0 +1,237 @@
+"""
+Multi-session load test for the HMI.
+
+Drives N simulated operator consoles through the real ``app.py`` in headless
+mode (Streamlit AppTest). Every session logs in, switches gate houses, presses
+Start / Pause / Raise and then keeps auto-refreshing. Rerun latency
+percentiles, CPU time and memory are reported for each N.
+
+All sessions live in this one process, like on one Streamlit server. AppTest
+cannot rerun from several threads at once, so reruns are served one at a time
+in due order. Latency is the time from when a rerun was due to when it
+finished, so it includes queueing once the process is saturated. Service
+time is the rerun alone. Checkpoints, history and the comm queue of the
+sessions go to a temporary directory, not to the plant's data/.
+
+    python tools/loadtest.py --sessions 1,5,10,20 --duration 30
+    python tools/loadtest.py --sessions 10 --duration 60 --json loadtest.json
+"""
+import argparse
+import json
+import os
+import heapq
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+
+from streamlit.testing.v1 import AppTest
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+# Directories the consoles write to; the load test points them at a scratch dir, never the plant's data/
+DATA_DIR_ENV = ("WMS_CHECKPOINT_DIR", "WMS_HISTORY_DIR", "WMS_COMM_QUEUE_DIR")
+
+
+# =========================================================
+# Process metrics
+# =========================================================
+def rss_mb() -> float:
+    # Current RSS (Linux /proc); falls back to peak RSS elsewhere
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+
+def cpu_sec() -> float:
+    ru = resource.getrusage(resource.RUSAGE_SELF)
+    return ru.ru_utime + ru.ru_stime
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    s = sorted(values)
+    i = min(len(s) - 1, max(0, int(round(p / 100.0 * (len(s) - 1)))))
+    return s[i]
+
+
+# =========================================================
+# Simulated console
+# =========================================================
+class Session:
+    def __init__(self, idx: int, timeout: float):
+        self.idx = idx
+        self.rng = random.Random(idx)
+        self.at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+        self.latencies: list[float] = []   # due -> done (includes queueing)
+        self.service: list[float] = []     # rerun time only
+        self.errors: list[str] = []
+        self.due = time.perf_counter()
+
+    def _run(self, action=None):
+        t0 = time.perf_counter()
+        if action is None:
+            self.at.run()
+        else:
+            action.run()
+        t1 = time.perf_counter()
+        self.service.append(t1 - t0)
+        self.latencies.append(t1 - min(self.due, t0))
+        self.due = t1
+        if self.at.exception:
+            self.errors.append(str(self.at.exception[0].message))
+
+    def _button(self, label: str):
+        for b in self.at.button:
+            if b.label == label and not b.disabled:
+                return b
+        return None
+
+    def _click(self, label: str):
+        b = self._button(label)
+        if b is not None:
+            self._run(b.click())
+
+    def _sidebar(self, kind: str, label: str):
+        for w in getattr(self.at.sidebar, kind):
+            if w.label == label:
+                return w
+        return None
+
+    def start(self):
+        self._run()
+        self._click("Log in")
+        ar = self._sidebar("checkbox", "Auto refresh (1s)")
+        if ar is not None:
+            self._run(ar.check())
+
+    def random_action(self):
+        r = self.rng.random()
+        if r < 0.25:
+            gh = self._sidebar("selectbox", "Gate House")
+            if gh is not None:
+                self._run(gh.set_value(self.rng.choice(gh.options)))
+        elif r < 0.45:
+            mode = self._sidebar("radio", "Control Mode (Gate House)")
+            if mode is not None and mode.value != "REMOTE AUTOMATIC" and "REMOTE AUTOMATIC" in mode.options:
+                self._run(mode.set_value("REMOTE AUTOMATIC"))
+            self._click(self.rng.choice(["▶ Start", "⏸ Pause"]))
+        elif r < 0.60:
+            mode = self._sidebar("radio", "Control Mode (Gate House)")
+            if mode is not None and "REMOTE MANUAL" in mode.options:
+                if mode.value != "REMOTE MANUAL":
+                    self._run(mode.set_value("REMOTE MANUAL"))
+                self._click(self.rng.choice(["⬆ Raise", "■ Stop"]))
+        else:
+            self._run()  # plain auto-refresh rerun
+
+
+# =========================================================
+# Runner
+# =========================================================
+def run_level(n: int, duration: float, refresh_sec: float, timeout: float) -> dict:
+    rss0, cpu0, t0 = rss_mb(), cpu_sec(), time.time()
+    sessions = [Session(i, timeout) for i in range(n)]
+    for s in sessions:
+        s.start()
+
+    # Steady state: every session is due once per refresh period (staggered)
+    base = time.perf_counter()
+    queue = [(base + refresh_sec * i / n, i) for i in range(n)]
+    heapq.heapify(queue)
+    for s in sessions:
+        s.latencies.clear()
+        s.service.clear()
+    stop_at = base + duration
+    while queue:
+        due, i = heapq.heappop(queue)
+        if due >= stop_at:
+            continue
+        now = time.perf_counter()
+        if due > now:
+            time.sleep(due - now)
+        s = sessions[i]
+        s.due = due
+        s.random_action()
+        heapq.heappush(queue, (due + refresh_sec, i))
+
+    wall = time.time() - t0
+    cpu = cpu_sec() - cpu0
+    rss = rss_mb()
+
+    lat = [x for s in sessions for x in s.latencies]
+    svc = [x for s in sessions for x in s.service]
+    errors = [e for s in sessions for e in s.errors]
+    return {
+        "sessions": n,
+        "reruns": len(lat),
+        "reruns_per_sec": len(lat) / wall if wall > 0 else 0.0,
+        "p50_ms": percentile(lat, 50) * 1e3,
+        "p90_ms": percentile(lat, 90) * 1e3,
+        "p99_ms": percentile(lat, 99) * 1e3,
+        "max_ms": max(lat, default=0.0) * 1e3,
+        "mean_ms": (statistics.fmean(lat) if lat else 0.0) * 1e3,
+        "service_p50_ms": percentile(svc, 50) * 1e3,
+        "service_p99_ms": percentile(svc, 99) * 1e3,
+        "saturated": statistics.fmean(svc) * n > refresh_sec if svc else False,
+        "cpu_util": cpu / wall if wall > 0 else 0.0,
+        "cpu_ms_per_rerun": cpu / len(lat) * 1e3 if lat else 0.0,
+        "rss_mb": rss,
+        "rss_mb_per_session": (rss - rss0) / n,
+        "errors": len(errors),
+        "first_error": errors[0] if errors else "",
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sessions", default="1,5,10", help="comma-separated session counts")
+    ap.add_argument("--duration", type=float, default=20.0, help="seconds of steady state per level")
+    ap.add_argument("--refresh", type=float, default=1.0, help="auto-refresh period per session [s]")
+    ap.add_argument("--timeout", type=float, default=30.0, help="per-rerun timeout [s]")
+    ap.add_argument("--json", default="", help="write results to this file")
+    args = ap.parse_args(argv)
+
+    scratch = tempfile.TemporaryDirectory(prefix="wms-loadtest-")
+    for var in DATA_DIR_ENV:
+        os.environ[var] = os.path.join(scratch.name, var.removeprefix("WMS_").removesuffix("_DIR").lower())
+    try:
+        return run(args)
+    finally:
+        scratch.cleanup()
+
+
+def run(args) -> int:
+    # Warm-up: first script run imports Streamlit/pandas/altair; keep it out of the per-session numbers
+    Session(-1, args.timeout).start()
+
+    results = []
+    print(
+        f"{'N':>4} {'reruns/s':>9} {'p50ms':>8} {'p90ms':>8} {'p99ms':>8} {'maxms':>8} {'svc50':>7} "
+        f"{'cpu%':>6} {'cpu/rr':>7} {'MB/sess':>8} {'err':>4}"
+    )
+    for n in (int(x) for x in args.sessions.split(",") if x.strip()):
+        r = run_level(n, args.duration, args.refresh, args.timeout)
+        results.append(r)
+        print(
+            f"{r['sessions']:>4} {r['reruns_per_sec']:>9.1f} {r['p50_ms']:>8.1f} {r['p90_ms']:>8.1f} {r['p99_ms']:>8.1f} "
+            f"{r['max_ms']:>8.1f} {r['service_p50_ms']:>7.1f} {r['cpu_util'] * 100:>6.0f} {r['cpu_ms_per_rerun']:>7.1f} "
+            f"{r['rss_mb_per_session']:>8.2f} {r['errors']:>4}" + ("  SATURATED" if r["saturated"] else "")
+        )
+        if r["first_error"]:
+            print(f"     first error: {r['first_error']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0 if not any(r["errors"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""
+Streamlit-free core of the WMS HMI: plant simulation, gate control,
+interlocks, alarms, Program timetables and SVG rendering.
+
+Functions that operate on session/plant state take it as the first argument
+``ss``: ``st.session_state`` in the HMI, or a ``PlantState`` from
+``new_plant_state()`` in headless workers, benchmarks and tests.
+"""
+import importlib
+
+from .alarms import (
+    ALARM_PANEL_MAX,
+    CONSOLE_WIDE,
+    AlarmEngine,
+    set_auto_alarm,
+    set_protection,
+    update_console_alarms,
+)
+from .anomaly import SENSOR_FAULT_MODES, AnomalyDetector, SensorFaultInjector, update_sensor_alarm
+from .backend import BACKEND_DB_PATH, SqliteBackend, StateBackend, StateSync
+from .checkpoint import CHECKPOINT_DIR, Checkpointer, StateDiff, apply_delta
+from .comm import COMM_QUEUE_DIR, COMM_QUEUE_FILE, CommLayer, DiskQueue, FaultInjector, send_ack, send_telemetry
+from .control import (
+    apply_remote_automatic_if_running,
+    apply_remote_program_if_running,
+    auto_target_q,
+    automatic_step,
+    compute_k_act,
+    current_program,
+    dummy_gate_opening_from_qtarget,
+    filtered_k_act,
+    manual_force_stop,
+    manual_set_cmd,
+    manual_step,
+    program_step,
+    send_cmd_to_gate,
+    send_cmd_to_gatehouse,
+    step_all_gates_in_gatehouse,
+    step_gate_toward,
+    tick_program_schedules,
+    tick_remote_manual_motion,
+    tick_sequenced_drives,
+)
+from .domain import (
+    ASSETS,
+    AUTO_FAIL_TIMEOUT_SEC,
+    CANAL_LINKS,
+    DATA_DIR,
+    GATE_SPEED_M_PER_MIN,
+    K_PATTERNS,
+    K_TOL_PCT,
+    PROGRAM_MODES,
+    build_demo_assets,
+    clamp,
+    compute_h_plan_from_qplan,
+    gate_open_pct,
+    gates_of,
+    opening_m_from_pct,
+    opening_pct_from_m,
+)
+from .dss import DSS_PLAN_DIR, DssIngest
+from .filters import KACT_FILTER_CHAIN, KACT_FILTERS, KactConditioner
+from .history import HISTORY_COLUMNS, HISTORY_DIR, HistoryStore
+from .interlock import PROT_FLAGS, InterlockEngine, blocked, interlock_reasons, prot_reason_code, protection_active
+from .power import GATE_MOTOR_KW, GEN_BUDGET_KW, MotionSequencer, power_budget_kw, power_source
+from .rbe import DEADBANDS, TREND_LEN, DeadbandFilter, append_trend
+from .render import (
+    bar_html,
+    card_header_html,
+    cctv_html,
+    cctv_stream_html,
+    dev_badge,
+    diverging_bar_html,
+    format_eta,
+    gate_svg,
+    overview_building_svg,
+    pct_delta,
+    pill_html,
+    row_html,
+    svg_document_html,
+)
+from .scheduler import WEEKDAYS, ProgramScheduler, describe_entry
+from .session import (
+    SimClock,
+    all_gates_in_gatehouse,
+    audit,
+    current_gate_key,
+    current_gh_key,
+    do_logout,
+    frozen_clock,
+    get_gate,
+    get_gatehouse_type,
+    get_gh,
+    is_idle_timeout,
+    log_login,
+    now,
+    touch_activity,
+)
+from .sim import run_ticks, tick_gate_trend, tick_gatehouse_signals, tick_history, tick_kact
+from .stats import STATS_DAY_START_HOUR, DischargeStats, day_summary
+from .state import GH_CONTROL_DEFAULTS, PlantState, init_state, new_plant_state
+
+# Imported on first use: numpy (ETA) and the what-if process pool are not needed to import the package
+_LAZY = {
+    "EtaEngine": ".eta",
+    "evaluate_patterns": ".whatif",
+    "fork_gatehouse": ".whatif",
+    "simulate_pattern": ".whatif",
+}
+
+
+def __getattr__(name: str):
+    if name in _LAZY:
+        return getattr(importlib.import_module(_LAZY[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,218 @@
+"""Event-driven alarm engine fed with input transitions only."""
+import time
+from collections import deque
+from datetime import datetime
+
+from .interlock import prot_reason_code
+from .session import now
+
+
+ALARM_CHATTER_SEC = 10.0     # re-raise within this window after a clear is folded into the same alarm
+ALARM_SHELVE_SEC = 15 * 60
+ALARM_HISTORY_MAX = 2000
+ALARM_PANEL_MAX = 8          # rows rendered per panel; the rest is summarised (flood control)
+ALARM_SEVERITY_RANK = {"HIGH": 0, "MEDIUM": 1, "LOW": 2}
+CONSOLE_WIDE = "*"           # gh_key for alarms not tied to one Gate House (comm / generator)
+
+
+class AlarmEngine:
+    """
+    Alarm table fed only with input transitions (update() is a no-op when a
+    signal repeats its last value).
+
+    An alarm stays in the active table while its input is ON, or after it has
+    returned to normal (RTN) until it is acknowledged. A re-raise within
+    ALARM_CHATTER_SEC of its clear is counted on the existing record instead
+    of producing a new history event. Active alarms are indexed per Gate House
+    so panels read them in O(active alarms).
+    """
+
+    def __init__(self):
+        self.active: dict[str, dict] = {}          # alarm_id -> record
+        self.by_gh: dict[str, set[str]] = {}       # gh_key -> {alarm_id}
+        self.shelved: dict[str, float] = {}        # alarm_id -> shelved until ts
+        self.history: deque = deque(maxlen=ALARM_HISTORY_MAX)
+        self._inputs: dict[str, bool] = {}         # last seen input per alarm_id
+        self._unacked = 0
+        self.version = 0                           # bumped on every change (checkpoint journal)
+        self.logged = 0                            # history entries ever appended
+
+    def _log(self, now: float, rec: dict, event: str, user: str = "—"):
+        self.version += 1
+        self.logged += 1
+        self.history.append(
+            {
+                "time": datetime.fromtimestamp(now).strftime("%Y-%m-%d %H:%M:%S"),
+                "id": rec["id"],
+                "gh_key": rec["gh_key"],
+                "severity": rec["severity"],
+                "event": event,
+                "message": rec["message"],
+                "user": user,
+            }
+        )
+
+    def update(self, alarm_id: str, on: bool, gh_key: str, severity: str, message: str, now: float | None = None):
+        if self._inputs.get(alarm_id, False) == on:
+            return
+        self._inputs[alarm_id] = on
+        self.version += 1
+        now = time.time() if now is None else now
+        rec = self.active.get(alarm_id)
+
+        if on:
+            if rec is not None:
+                chatter = rec["cleared_ts"] is not None and now - rec["cleared_ts"] <= ALARM_CHATTER_SEC
+                rec["state"] = "ACTIVE"
+                rec["count"] += 1
+                rec["message"] = message
+                rec["cleared_ts"] = None
+                if not chatter:
+                    rec["raised_ts"] = now
+                    if rec["acked"]:
+                        rec["acked"] = False
+                        self._unacked += 1
+                    self._log(now, rec, "RAISE")
+                return
+            rec = {
+                "id": alarm_id,
+                "gh_key": gh_key,
+                "severity": severity,
+                "message": message,
+                "state": "ACTIVE",
+                "acked": False,
+                "raised_ts": now,
+                "cleared_ts": None,
+                "count": 1,
+            }
+            self.active[alarm_id] = rec
+            self.by_gh.setdefault(gh_key, set()).add(alarm_id)
+            self._unacked += 1
+            self._log(now, rec, "RAISE")
+            return
+
+        if rec is None:
+            return
+        rec["state"] = "RTN"
+        rec["cleared_ts"] = now
+        self._log(now, rec, "CLEAR")
+
+    def _remove(self, alarm_id: str):
+        self.version += 1
+        rec = self.active.pop(alarm_id)
+        self.by_gh[rec["gh_key"]].discard(alarm_id)
+        self.shelved.pop(alarm_id, None)
+        if not rec["acked"]:
+            self._unacked -= 1
+
+    def tick(self, now: float | None = None):
+        # Retire acknowledged RTN alarms once the chatter window has passed; expire shelving
+        now = time.time() if now is None else now
+        for alarm_id in [a for a, until in self.shelved.items() if until <= now]:
+            del self.shelved[alarm_id]
+            self.version += 1
+        for alarm_id in [
+            a for a, r in self.active.items()
+            if r["state"] == "RTN" and r["acked"] and now - r["cleared_ts"] > ALARM_CHATTER_SEC
+        ]:
+            self._remove(alarm_id)
+
+    def ack(self, alarm_id: str, user: str, now: float | None = None):
+        rec = self.active.get(alarm_id)
+        if rec is None or rec["acked"]:
+            return
+        now = time.time() if now is None else now
+        rec["acked"] = True
+        self._unacked -= 1
+        self._log(now, rec, "ACK", user)
+
+    def shelve(self, alarm_id: str, user: str, seconds: float = ALARM_SHELVE_SEC, now: float | None = None):
+        rec = self.active.get(alarm_id)
+        if rec is None:
+            return
+        now = time.time() if now is None else now
+        self.shelved[alarm_id] = now + seconds
+        self._log(now, rec, "SHELVE", user)
+
+    def unshelve(self, alarm_id: str, user: str, now: float | None = None):
+        if self.shelved.pop(alarm_id, None) is not None:
+            self._log(time.time() if now is None else now, self.active[alarm_id], "UNSHELVE", user)
+
+    def row(self, alarm_id: str) -> dict | None:
+        # One alarm's share of the table (a sync / journal row); None once nothing is left of it
+        rec, until, on = self.active.get(alarm_id), self.shelved.get(alarm_id), self._inputs.get(alarm_id, False)
+        if rec is None and until is None and not on:
+            return None
+        return {"rec": None if rec is None else dict(rec), "shelved": until, "input": on}
+
+    def set_row(self, alarm_id: str, row: dict | None):
+        old = self.active.pop(alarm_id, None)
+        if old is not None:
+            self.by_gh[old["gh_key"]].discard(alarm_id)
+            self._unacked -= not old["acked"]
+        self.shelved.pop(alarm_id, None)
+        self._inputs.pop(alarm_id, None)
+        if row is not None:
+            if row["rec"] is not None:
+                rec = self.active[alarm_id] = dict(row["rec"])
+                self.by_gh.setdefault(rec["gh_key"], set()).add(alarm_id)
+                self._unacked += not rec["acked"]
+            if row["shelved"] is not None:
+                self.shelved[alarm_id] = row["shelved"]
+            self._inputs[alarm_id] = row["input"]
+        self.version += 1
+
+    def merge_table(self, table: dict, drop: set[str], log: list[dict]):
+        # Replace the alarms owned by another engine (a station shard) with its current table
+        for alarm_id in drop - table["active"].keys():
+            rec = self.active.pop(alarm_id, None)
+            if rec is not None:
+                self.by_gh[rec["gh_key"]].discard(alarm_id)
+            self.shelved.pop(alarm_id, None)
+            self._inputs.pop(alarm_id, None)
+        for alarm_id, rec in table["active"].items():
+            self.active[alarm_id] = rec
+            self.by_gh.setdefault(rec["gh_key"], set()).add(alarm_id)
+        self.shelved.update(table["shelved"])
+        self._inputs.update(table["_inputs"])
+        self._unacked = sum(not r["acked"] for r in self.active.values())
+        self.history.extend(log)
+        self.logged += len(log)
+        self.version += 1
+
+    def alarms_for(self, gh_key: str, include_shelved: bool = False) -> list[dict]:
+        ids = self.by_gh.get(gh_key, set()) | self.by_gh.get(CONSOLE_WIDE, set())
+        recs = [self.active[a] for a in ids if include_shelved or a not in self.shelved]
+        return sorted(recs, key=lambda r: (r["acked"], r["state"] != "ACTIVE", ALARM_SEVERITY_RANK[r["severity"]], -r["raised_ts"]))
+
+    def has_active(self, gh_key: str) -> bool:
+        for ids in (self.by_gh.get(gh_key, ()), self.by_gh.get(CONSOLE_WIDE, ())):
+            for a in ids:
+                if self.active[a]["state"] == "ACTIVE" and a not in self.shelved:
+                    return True
+        return False
+
+    @property
+    def unacked_count(self) -> int:
+        return self._unacked
+
+
+# =========================================================
+# Alarm inputs (transitions only)
+# =========================================================
+def set_protection(ss, gh_key: str, flag: str, on: bool):
+    if ss.interlock.set_protection(gh_key, flag, on):
+        ss.alarms.update(f"{gh_key}|{prot_reason_code(flag)}", on, gh_key, "HIGH", f"{gh_key} :: Protection trip: {flag}", now(ss))
+
+
+def set_auto_alarm(ss, gh_key: str, on: bool, msg: str = ""):
+    gh = ss.gh_state[gh_key]
+    gh["auto_alarm"] = on
+    gh["auto_alarm_msg"] = msg
+    ss.alarms.update(f"{gh_key}|AUTO_FAIL", on, gh_key, "MEDIUM", f"{gh_key} :: {msg or 'Automatic control failed'}", now(ss))
+
+
+def update_console_alarms(ss):
+    t = now(ss)
+    ss.comm.update_links(ss, t)  # link-down / buffering alarms follow the effective link state
+    ss.alarms.update("GEN_ERROR", ss.gen_state == "ERROR", CONSOLE_WIDE, "HIGH", "Generator error", t)
@@ -0,0 +1,204 @@
+"""
+Streaming sensor anomaly detection on the Gate House Q / H measurements.
+
+Every field sample goes through cheap incremental checks:
+
+* flatline: rolling min/max over the last FLATLINE_SAMPLES within FLATLINE_EPS (stuck meter)
+* spike: change from the last good sample more than SPIKE_SIGMA EWMA standard
+  deviations away from the EWMA mean change (ramps from control moves pass)
+* noise: EWMA standard deviation of the change above NOISE_MAX_STD (noisy meter)
+* rate of change: |dx/dt| above the physical limit of the signal
+* H–Q drift: EWMA of the residual h - rating(q) outside DRIFT_TOL_M
+
+Spikes are kept out of the EWMA so one outlier does not widen the band.
+A Gate House stays suspect until ANOMALY_CLEAR_SEC after its last flag.
+Automatic control holds while Q data is suspect, because Kact is computed
+from it. SensorFaultInjector is the local stand-in for a stuck, noisy or
+spiking flow meter and a drifting level sensor.
+"""
+import math
+import random
+from collections import deque
+
+from .domain import compute_h_plan_from_qplan
+
+EWMA_ALPHA = 0.05
+SPIKE_SIGMA = 6.0
+SPIKE_MIN_STD = {"q": 0.05, "h": 0.02}    # floor so a quiet signal does not flag its own noise
+SPIKE_MAX_RUN = 3                          # more consecutive outliers = level change, accepted
+NOISE_MAX_STD = {"q": 0.30, "h": 0.10}
+MAX_RATE_PER_SEC = {"q": 1.0, "h": 0.25}  # m³/s per s, m per s
+RATE_MIN_DT_SEC = 1.0                      # field samples are ~1 s apart; closer reruns must not inflate the rate
+FLATLINE_SAMPLES = 30
+FLATLINE_EPS = 1e-9
+FLATLINE_MIN_Q = 0.05                      # zero flow behind closed gates is not a stuck meter
+DRIFT_ALPHA = 0.02
+DRIFT_TOL_M = 0.08
+WARMUP_SAMPLES = 20                        # EWMA statistics settle before spikes / drift are judged
+ANOMALY_CLEAR_SEC = 30.0
+
+SENSOR_FAULT_MODES = ["NONE", "STUCK", "NOISY", "SPIKES"]
+
+
+class RollingMinMax:
+    """Min / max over the last n samples with monotonic deques (amortised O(1))."""
+
+    def __init__(self, n: int):
+        self.n = n
+        self.i = 0
+        self._min: deque = deque()   # (index, value), increasing values
+        self._max: deque = deque()   # (index, value), decreasing values
+
+    def push(self, x: float):
+        while self._min and self._min[-1][1] >= x:
+            self._min.pop()
+        while self._max and self._max[-1][1] <= x:
+            self._max.pop()
+        self._min.append((self.i, x))
+        self._max.append((self.i, x))
+        self.i += 1
+        lo = self.i - self.n
+        if self._min[0][0] < lo:
+            self._min.popleft()
+        if self._max[0][0] < lo:
+            self._max.popleft()
+
+    @property
+    def full(self) -> bool:
+        return self.i >= self.n
+
+    @property
+    def span(self) -> float:
+        return self._max[0][1] - self._min[0][1]
+
+
+class SignalMonitor:
+    """
+    Incremental statistics for one signal: EWMA mean / variance of the
+    sample-to-sample change, the previous sample and the rolling range.
+    """
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.d_mean = 0.0
+        self.d_var = 0.0
+        self.n = 0
+        self.prev: tuple[float, float] | None = None   # (ts, value) of the last sample
+        self.good: float | None = None                 # last sample that was not a spike
+        self.spike_run = 0
+        self.window = RollingMinMax(FLATLINE_SAMPLES)
+
+    def check(self, x: float, ts: float) -> list[str]:
+        flags = []
+        self.window.push(x)
+        if self.window.full and self.window.span <= FLATLINE_EPS and (self.kind != "q" or abs(x) > FLATLINE_MIN_Q):
+            flags.append("FLATLINE")
+
+        if self.prev is not None:
+            dt = max(ts - self.prev[0], RATE_MIN_DT_SEC)
+            if abs(x - self.prev[1]) / dt > MAX_RATE_PER_SEC[self.kind]:
+                flags.append("RATE")
+        self.prev = (ts, x)
+
+        if self.good is None:
+            self.good = x
+            return flags
+        d = x - self.good
+        if self.n >= WARMUP_SAMPLES:
+            std = math.sqrt(self.d_var)
+            if abs(d - self.d_mean) > SPIKE_SIGMA * max(std, SPIKE_MIN_STD[self.kind]):
+                self.spike_run += 1
+                if self.spike_run <= SPIKE_MAX_RUN:
+                    flags.append("SPIKE")
+                    return flags  # outlier: kept out of the statistics
+                # persistent: a new level, not a spike
+            if std > NOISE_MAX_STD[self.kind]:
+                flags.append("NOISE")
+        self.spike_run = 0
+        self.good = x
+        dd = d - self.d_mean
+        self.d_mean += EWMA_ALPHA * dd
+        self.d_var = (1.0 - EWMA_ALPHA) * (self.d_var + EWMA_ALPHA * dd * dd)
+        self.n += 1
+        return flags
+
+
+class AnomalyDetector:
+    """
+    Per Gate House monitors for Q and H plus the H–Q rating residual.
+
+    ``check`` returns the flags of the current sample. ``suspect`` stays
+    true for ANOMALY_CLEAR_SEC after the last Q or drift flag.
+    """
+
+    def __init__(self):
+        self._q: dict[str, SignalMonitor] = {}
+        self._h: dict[str, SignalMonitor] = {}
+        self._drift: dict[str, tuple[float, int]] = {}   # gh_key -> (EWMA residual, samples)
+        self._last_flag_ts: dict[str, float] = {}
+        self.flags: dict[str, list[str]] = {}            # gh_key -> flags of the last sample
+        self.reasons: dict[str, list[str]] = {}          # gh_key -> flags behind the current suspect state
+
+    def check(self, gh_key: str, q: float, h: float, ts: float) -> list[str]:
+        if gh_key not in self._q:
+            self._q[gh_key] = SignalMonitor("q")
+            self._h[gh_key] = SignalMonitor("h")
+        flags = [f"Q_{f}" for f in self._q[gh_key].check(q, ts)] + [f"H_{f}" for f in self._h[gh_key].check(h, ts)]
+
+        resid, n = self._drift.get(gh_key, (0.0, 0))
+        resid += DRIFT_ALPHA * ((h - compute_h_plan_from_qplan(q)) - resid)
+        n += 1
+        self._drift[gh_key] = (resid, n)
+        if n >= WARMUP_SAMPLES and abs(resid) > DRIFT_TOL_M:
+            flags.append("HQ_DRIFT")
+
+        self.flags[gh_key] = flags
+        q_flags = [f for f in flags if f.startswith("Q_") or f == "HQ_DRIFT"]
+        if q_flags:
+            self._last_flag_ts[gh_key] = ts
+            self.reasons[gh_key] = q_flags
+        return flags
+
+    def suspect(self, gh_key: str, ts: float) -> bool:
+        last = self._last_flag_ts.get(gh_key)
+        return last is not None and ts - last < ANOMALY_CLEAR_SEC
+
+    def drift_residual(self, gh_key: str) -> float:
+        return self._drift.get(gh_key, (0.0, 0))[0]
+
+
+# =========================================================
+# Sensor fault injection (local stand-in)
+# =========================================================
+class SensorFaultInjector:
+    """Corrupts field samples: Q meter mode from SENSOR_FAULT_MODES, H offset in m."""
+
+    def __init__(self, seed: int | None = None):
+        self.rng = random.Random(None if seed is None else f"sensor-{seed}")
+        self.q_mode = "NONE"
+        self.h_offset_m = 0.0
+        self._stuck: dict[str, float] = {}
+
+    def apply(self, gh_key: str, q: float, h: float) -> tuple[float, float]:
+        if self.q_mode != "STUCK":
+            self._stuck.pop(gh_key, None)
+        if self.q_mode == "STUCK":
+            q = self._stuck.setdefault(gh_key, q)
+        elif self.q_mode == "NOISY":
+            q = max(0.0, q + self.rng.gauss(0.0, 0.6))
+        elif self.q_mode == "SPIKES" and self.rng.random() < 0.05:
+            q = max(0.0, q + self.rng.choice([-1, 1]) * self.rng.uniform(3.0, 5.0))
+        return q, h + self.h_offset_m
+
+
+def update_sensor_alarm(ss, gh_key: str, t: float):
+    suspect = ss.anomaly.suspect(gh_key, t)
+    reasons = ", ".join(ss.anomaly.reasons.get(gh_key, []))
+    ss.alarms.update(
+        f"{gh_key}|SENSOR_SUSPECT",
+        suspect,
+        gh_key,
+        "MEDIUM",
+        f"{gh_key} :: Suspect Q/H data ({reasons}): Automatic control on hold",
+        t,
+    )
@@ -0,0 +1,363 @@
+"""
+Cold-tier archive of closed trend segments.
+
+A closed day of trend history (``<root>/trend/<YYYY-MM-DD>.csv``) is
+compacted into ``<root>/trend/<YYYY-MM-DD>.wmsa`` and the CSV is removed.
+Each series (key, signal) is cut into blocks of ARCHIVE_BLOCK_SAMPLES
+samples. A block is bit-packed with time-series encodings:
+
+- timestamps (ms): delta-of-delta, where a regular interval costs one bit;
+- values: run-length encoded (an unchanged ``open_pct`` costs a few bits
+  per run, whatever its length). Consecutive run values are XORed against
+  each other (Gorilla), so slowly moving flows store only the few bits that
+  changed.
+
+The block index at the end of the file keeps, per block, the series, the
+time span, the sample count and the min / max value. Range queries read the
+index and decode only the blocks that overlap the time range, the keys and
+the value range.
+
+Values are stored exactly; timestamps are rounded to the millisecond.
+Late rows for a compacted day (backfilled telemetry) land in a new CSV
+next to the archive; export reads both, and compacting the day again
+merges them.
+
+    python -m wms_core.archive compact
+    python -m wms_core.archive info data/history/trend/2025-01-06.wmsa
+"""
+import argparse
+import csv
+import heapq
+import json
+import os
+import struct
+import sys
+import zlib
+from datetime import datetime
+
+from .history import HISTORY_COLUMNS, HISTORY_DIR
+
+ARCHIVE_EXT = ".wmsa"
+ARCHIVE_VERSION = 1
+ARCHIVE_BLOCK_SAMPLES = 1024
+
+_MAGIC = b"WMSA"
+_HEAD = struct.Struct("<4sH")       # magic, version
+_FOOT = struct.Struct("<I4s")       # compressed index length, magic
+_F64 = struct.Struct(">d")
+_U64 = struct.Struct(">Q")
+# Delta-of-delta classes: (prefix, value bits); the last one takes any value
+_DOD_CLASSES = (("10", 7), ("110", 9), ("1110", 12), ("1111", 64))
+
+
+# =========================================================
+# Bit packing
+# =========================================================
+class _BitWriter:
+    def __init__(self):
+        self.parts: list[str] = []
+
+    def bits(self, s: str):
+        self.parts.append(s)
+
+    def put(self, v: int, n: int):
+        self.parts.append(format(v, f"0{n}b"))
+
+    def getvalue(self) -> bytes:
+        s = "".join(self.parts)
+        s += "0" * (-len(s) % 8)
+        return int(s, 2).to_bytes(len(s) // 8, "big") if s else b""
+
+
+class _BitReader:
+    def __init__(self, data: bytes):
+        self.s = format(int.from_bytes(data, "big"), f"0{len(data) * 8}b") if data else ""
+        self.pos = 0
+
+    def bit(self) -> int:
+        self.pos += 1
+        return self.s[self.pos - 1] == "1"
+
+    def get(self, n: int) -> int:
+        self.pos += n
+        return int(self.s[self.pos - n:self.pos], 2)
+
+
+def _bits_of(v: float) -> int:
+    return _U64.unpack(_F64.pack(v))[0]
+
+
+def _float_of(b: int) -> float:
+    return _F64.unpack(_U64.pack(b))[0]
+
+
+# =========================================================
+# Block codec
+# =========================================================
+def encode_block(ts_ms: list[int], values: list[float]) -> bytes:
+    w = _BitWriter()
+    # Timestamps: the first one is in the index; then delta-of-delta
+    prev_delta = 0
+    for i in range(1, len(ts_ms)):
+        delta = ts_ms[i] - ts_ms[i - 1]
+        dod = delta - prev_delta
+        prev_delta = delta
+        if dod == 0:
+            w.bits("0")
+            continue
+        for prefix, n in _DOD_CLASSES:
+            half = 1 << (n - 1)
+            if -half <= dod < half:
+                w.bits(prefix)
+                w.put(dod + half, n)
+                break
+
+    # Values: runs of equal values; each run value XORed with the previous one
+    prev = None
+    lead = trail = -1
+    i = 0
+    while i < len(values):
+        j = i + 1
+        b = _bits_of(values[i])
+        while j < len(values) and _bits_of(values[j]) == b:
+            j += 1
+        if prev is None:
+            w.put(b, 64)
+        else:
+            x = b ^ prev
+            if x == 0:
+                w.bits("0")  # only NaN runs split without a bit change
+            else:
+                lz = min(64 - x.bit_length(), 31)
+                tz = (x & -x).bit_length() - 1
+                if lead >= 0 and lz >= lead and tz >= trail:
+                    w.bits("10")
+                    w.put(x >> trail, 64 - lead - trail)
+                else:
+                    lead, trail = lz, tz
+                    w.bits("11")
+                    w.put(lead, 5)
+                    w.put(64 - lead - trail - 1, 6)
+                    w.put(x >> trail, 64 - lead - trail)
+        prev = b
+        # Run length, Elias gamma
+        n = j - i
+        w.bits("0" * (n.bit_length() - 1))
+        w.put(n, n.bit_length())
+        i = j
+    return w.getvalue()
+
+
+def decode_block(data: bytes, t0_ms: int, count: int) -> tuple[list[int], list[float]]:
+    r = _BitReader(data)
+    ts = [t0_ms]
+    delta = 0
+    for _ in range(count - 1):
+        if r.bit():
+            for prefix, n in _DOD_CLASSES:
+                if prefix[-1] == "0" and not r.bit() or prefix == "1111":
+                    delta += r.get(n) - (1 << (n - 1))
+                    break
+        ts.append(ts[-1] + delta)
+
+    values: list[float] = []
+    prev = None
+    lead = trail = 0
+    while len(values) < count:
+        if prev is None:
+            b = r.get(64)
+        elif not r.bit():
+            b = prev
+        else:
+            if r.bit():
+                lead = r.get(5)
+                trail = 64 - lead - (r.get(6) + 1)
+            b = prev ^ (r.get(64 - lead - trail) << trail)
+        prev = b
+        zeros = 0
+        while not r.bit():
+            zeros += 1
+        n = (1 << zeros) | (r.get(zeros) if zeros else 0)
+        values += [_float_of(b)] * n
+    return ts, values
+
+
+# =========================================================
+# Archive files
+# =========================================================
+def archive_path(root: str, day: str) -> str:
+    return os.path.join(root, "trend", f"{day}{ARCHIVE_EXT}")
+
+
+def write_archive(path: str, series: dict[tuple[str, str], list[tuple[int, float]]]) -> dict:
+    """
+    Write one archive from {(key, signal): [(ts_ms, value), ...]}, then
+    rename it into place. Returns the index.
+    """
+    blocks = []
+    body = [_HEAD.pack(_MAGIC, ARCHIVE_VERSION)]
+    off = _HEAD.size
+    for (key, signal), samples in sorted(series.items()):
+        samples.sort()
+        for i in range(0, len(samples), ARCHIVE_BLOCK_SAMPLES):
+            chunk = samples[i:i + ARCHIVE_BLOCK_SAMPLES]
+            ts = [s[0] for s in chunk]
+            vs = [s[1] for s in chunk]
+            data = encode_block(ts, vs)
+            blocks.append({
+                "key": key, "signal": signal, "n": len(chunk), "t0": ts[0], "t1": ts[-1],
+                "min": min(vs), "max": max(vs), "off": off, "len": len(data),
+            })
+            body.append(data)
+            off += len(data)
+    index = {"version": ARCHIVE_VERSION, "blocks": blocks}
+    packed = zlib.compress(json.dumps(index, separators=(",", ":")).encode("utf-8"))
+    body += [packed, _FOOT.pack(len(packed), _MAGIC)]
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(b"".join(body))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return index
+
+
+def read_index(path: str) -> dict:
+    with open(path, "rb") as f:
+        f.seek(-_FOOT.size, os.SEEK_END)
+        n, magic = _FOOT.unpack(f.read(_FOOT.size))
+        if magic != _MAGIC:
+            raise ValueError(f"{path}: not a trend archive")
+        f.seek(-_FOOT.size - n, os.SEEK_END)
+        return json.loads(zlib.decompress(f.read(n)))
+
+
+def _block_rows(f, b: dict, t_from: float, t_to: float, value_range):
+    f.seek(b["off"])
+    ts, vs = decode_block(f.read(b["len"]), b["t0"], b["n"])
+    lo, hi = value_range or (None, None)
+    for t, v in zip(ts, vs):
+        t = t / 1000.0
+        if t_from <= t < t_to and (lo is None or v >= lo) and (hi is None or v <= hi):
+            yield [t, b["key"], b["signal"], v]
+
+
+def iter_archive(path: str, t_from: float, t_to: float, keys: set[str] | None = None, value_range=None):
+    """
+    Trend rows of one archive with t_from <= ts < t_to, in time order.
+    ``value_range`` = (lo, hi) keeps only values in [lo, hi] (None = open).
+    Blocks outside the range, the keys or the value range are not decoded.
+    """
+    lo, hi = value_range or (None, None)
+    picked = [
+        b for b in read_index(path)["blocks"]
+        if b["t1"] / 1000.0 >= t_from and b["t0"] / 1000.0 < t_to
+        and (keys is None or b["key"] in keys)
+        and (lo is None or b["max"] >= lo) and (hi is None or b["min"] <= hi)
+    ]
+    if not picked:
+        return
+    # Blocks of one series follow each other; the series are merged by time
+    series: dict[tuple[str, str], list[dict]] = {}
+    for b in picked:
+        series.setdefault((b["key"], b["signal"]), []).append(b)
+    with open(path, "rb") as f:
+        # One lazy stream per series: a block is read and decoded when the merge reaches it
+        # (_block_rows reads its whole block before the first row, so the streams can share f)
+        rows = [
+            (r for b in blocks for r in _block_rows(f, b, t_from, t_to, value_range))
+            for blocks in series.values()
+        ]
+        yield from heapq.merge(*rows, key=lambda r: r[0])
+
+
+# =========================================================
+# Compaction
+# =========================================================
+def compact_day(root: str, day: str) -> dict | None:
+    """
+    Fold the CSV segment of a closed day (and an existing archive of that
+    day) into the archive. Returns {rows, csv_bytes, archive_bytes} or
+    None when there was nothing to compact.
+    """
+    csv_path = os.path.join(root, "trend", f"{day}.csv")
+    path = archive_path(root, day)
+    work = csv_path + ".compacting"
+    if os.path.exists(csv_path):
+        # Late appends go to a fresh segment while this one is compacted
+        os.replace(csv_path, work)
+    if not os.path.exists(work):
+        return None
+
+    series: dict[tuple[str, str], list[tuple[int, float]]] = {}
+    if os.path.exists(path):
+        for t, key, signal, v in iter_archive(path, float("-inf"), float("inf")):
+            series.setdefault((key, signal), []).append((round(t * 1000), v))
+    csv_bytes = os.path.getsize(work)
+    n = 0
+    with open(work, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        next(reader, None)  # header
+        for r in reader:
+            if len(r) != len(HISTORY_COLUMNS["trend"]):
+                continue  # torn last line of a crashed append
+            series.setdefault((r[1], r[2]), []).append((round(float(r[0]) * 1000), float(r[3])))
+            n += 1
+    write_archive(path, series)
+    os.remove(work)
+    return {"rows": n, "csv_bytes": csv_bytes, "archive_bytes": os.path.getsize(path)}
+
+
+def compact_closed(root: str, today: str | None = None) -> dict[str, dict]:
+    # Every trend day before ``today`` that still has a CSV segment
+    today = today or datetime.now().date().isoformat()
+    d = os.path.join(root, "trend")
+    if not os.path.isdir(d):
+        return {}
+    days = sorted({
+        name.split(".")[0] for name in os.listdir(d)
+        if name.endswith((".csv", ".csv.compacting"))
+    })
+    done = {}
+    for day in days:
+        if day < today:
+            res = compact_day(root, day)
+            if res is not None:
+                done[day] = res
+    return done
+
+
+# =========================================================
+# CLI
+# =========================================================
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m wms_core.archive", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("compact", help="compact the closed trend days of a history directory")
+    p.add_argument("--root", default=HISTORY_DIR, help=f"plant history directory (default: {HISTORY_DIR})")
+    p.add_argument("--today", help="first day to leave open (YYYY-MM-DD, default: today)")
+    p = sub.add_parser("info", help="block summary of an archive")
+    p.add_argument("path")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "compact":
+        done = compact_closed(args.root, args.today)
+        for day, res in done.items():
+            ratio = res["csv_bytes"] / max(res["archive_bytes"], 1)
+            print(f"{day}: {res['rows']} rows, {res['csv_bytes']:,} B CSV -> {res['archive_bytes']:,} B ({ratio:.1f}x)")
+        if not done:
+            print("nothing to compact")
+        return 0
+
+    blocks = read_index(args.path)["blocks"]
+    for b in blocks:
+        t0 = datetime.fromtimestamp(b["t0"] / 1000.0).strftime("%H:%M:%S")
+        t1 = datetime.fromtimestamp(b["t1"] / 1000.0).strftime("%H:%M:%S")
+        print(f"{b['key']} {b['signal']}  {t0}-{t1}  n={b['n']}  [{b['min']:g}, {b['max']:g}]  {b['len']} B")
+    print(f"{len(blocks)} block(s), {sum(b['n'] for b in blocks)} samples, {os.path.getsize(args.path):,} B")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,268 @@
+"""
+Shared state backend: several HMI server processes on one plant.
+
+Each console publishes what changed in its session state once per tick, as
+one batched transaction (the same StateDiff records the checkpoint journal
+uses). It pulls what other processes published. A row carries the version
+of the transaction that wrote it, so a pull only reads rows newer than the
+last version seen. When nothing was committed elsewhere, a pull costs one
+cheap change check and no reads. When there is something to read, the
+console publishes its own pending changes first, so applying the pull does
+not overwrite them.
+
+Only the lease holder runs the plant (the tick pipeline). The other
+consoles mirror the published state and publish their operator actions,
+which the leader picks up on its next tick. If the leader stops renewing,
+another console takes over after BACKEND_LEASE_SEC. Rows conflict
+last-writer-wins (gates, Gate House fields, alarms and console fields are
+separate rows), so an alarm acknowledged on one console and another one
+raised by the leader both survive.
+
+SqliteBackend is the local implementation (WAL mode: readers never block
+the writer). Change notification between processes uses
+``PRAGMA data_version``, which moves only when another connection commits.
+"""
+import abc
+import os
+import pickle
+import sqlite3
+import uuid
+
+from .checkpoint import SCALAR_FIELDS, StateDiff, apply_delta
+from .domain import DATA_DIR
+from .session import now
+
+BACKEND_DB_PATH = os.path.join(DATA_DIR, "state.db")
+BACKEND_LEASE_SEC = 5.0          # leader lease; renewed every tick
+BACKEND_BUSY_TIMEOUT_SEC = 2.0
+# Selection is per console (each operator looks at their own Gate House)
+SYNC_FIELDS = [f for f in SCALAR_FIELDS if f not in ("station", "gatehouse", "selected_gate")]
+
+
+class StateBackend(abc.ABC):
+    """
+    Interface for shared state stores. ``publish`` writes one delta record
+    atomically, ``changes`` returns a merged record of what other owners
+    published since the last call (or None), ``lease`` takes or renews a
+    named lease. ``pending`` is a cheap check for whether anything may have
+    been published since the last ``changes``.
+    """
+
+    @abc.abstractmethod
+    def publish(self, rec: dict):
+        ...
+
+    @abc.abstractmethod
+    def changes(self) -> dict | None:
+        ...
+
+    @abc.abstractmethod
+    def lease(self, name: str, ttl_sec: float, now: float) -> bool:
+        ...
+
+    def pending(self) -> bool:
+        return True
+
+    def skip_log(self):
+        pass
+
+    def close(self):
+        pass
+
+
+# =========================================================
+# SQLite (WAL)
+# =========================================================
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta  (k TEXT PRIMARY KEY, v INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS state (ns TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL,
+                                  version INTEGER NOT NULL, owner TEXT NOT NULL, PRIMARY KEY (ns, key));
+CREATE INDEX IF NOT EXISTS state_version ON state (version);
+CREATE TABLE IF NOT EXISTS log   (id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL,
+                                  entry BLOB NOT NULL, owner TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS lease (name TEXT PRIMARY KEY, owner TEXT NOT NULL, until REAL NOT NULL);
+INSERT OR IGNORE INTO meta VALUES ('version', 0);
+"""
+
+
+def _dumps(v) -> bytes:
+    return pickle.dumps(v, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+class SqliteBackend(StateBackend):
+    """
+    Rows: ``state(ns, key)`` with ns ``ctl`` (one row per field), ``gate``,
+    ``gh`` (Gate House fields, merged) and ``alarm`` (one per alarm id, None
+    once retired); ``log`` rows for
+    audit / login / alarm history entries.
+    """
+
+    def __init__(self, path: str = BACKEND_DB_PATH, owner: str | None = None):
+        self.path = path
+        self.owner = owner or uuid.uuid4().hex[:12]
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Autocommit mode; transactions are explicit (BEGIN IMMEDIATE takes the write lock up front)
+        self.db = sqlite3.connect(path, timeout=BACKEND_BUSY_TIMEOUT_SEC, isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(_SCHEMA)
+        self.version = 0                 # newest row version applied
+        self.log_id = 0                  # newest log row applied
+        self._data_version = None
+        self.publishes = 0
+        self.pulls = 0
+
+    def publish(self, rec: dict):
+        rows = [("ctl", k, _dumps(v)) for k, v in rec.get("set", {}).items()]
+        rows += [("gate", k, _dumps(v)) for k, v in rec.get("gates", {}).items()]
+        logs = [(kind, _dumps(e)) for kind in ("audit_log", "login_log") for e in rec.get(kind, [])]
+        alarms = rec.get("alarms")
+        if alarms is not None:
+            rows += [("alarm", k, _dumps(v)) for k, v in alarms["rows"].items()]
+            logs += [("alarm", _dumps(e)) for e in alarms["log"]]
+        gh = rec.get("gh", {})
+        if not rows and not logs and not gh:
+            return
+
+        cur = self.db.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            version = cur.execute("UPDATE meta SET v = v + 1 WHERE k = 'version' RETURNING v").fetchone()[0]
+            # Gate House rows hold all fields; merge the changed ones into the stored dict
+            for k, ch in gh.items():
+                old = cur.execute("SELECT value FROM state WHERE ns = 'gh' AND key = ?", (k,)).fetchone()
+                rows.append(("gh", k, _dumps({**(pickle.loads(old[0]) if old else {}), **ch})))
+            cur.executemany(
+                "INSERT INTO state VALUES (?, ?, ?, ?, ?) ON CONFLICT (ns, key) DO UPDATE SET "
+                "value = excluded.value, version = excluded.version, owner = excluded.owner",
+                [(ns, k, v, version, self.owner) for ns, k, v in rows],
+            )
+            cur.executemany("INSERT INTO log (kind, entry, owner) VALUES (?, ?, ?)", [(kind, e, self.owner) for kind, e in logs])
+            cur.execute("COMMIT")
+        except BaseException:
+            cur.execute("ROLLBACK")
+            raise
+        self.publishes += 1
+
+    def pending(self) -> bool:
+        # data_version moves only when another connection commits
+        return self.db.execute("PRAGMA data_version").fetchone()[0] != self._data_version
+
+    def changes(self) -> dict | None:
+        dv = self.db.execute("PRAGMA data_version").fetchone()[0]
+        if dv == self._data_version:
+            return None  # nothing committed by another connection
+        self._data_version = dv
+
+        rec: dict = {}
+        rows = self.db.execute(
+            "SELECT ns, key, value, version FROM state WHERE version > ? AND owner != ? ORDER BY version",
+            (self.version, self.owner),
+        ).fetchall()
+        for ns, k, v, version in rows:
+            v = pickle.loads(v)
+            if ns == "ctl":
+                rec.setdefault("set", {})[k] = v
+            elif ns == "gate":
+                rec.setdefault("gates", {})[k] = v
+            elif ns == "gh":
+                rec.setdefault("gh", {})[k] = v
+            elif ns == "alarm":
+                rec.setdefault("alarms", {"rows": {}, "log": []})["rows"][k] = v
+            self.version = max(self.version, version)
+        logs = self.db.execute(
+            "SELECT id, kind, entry FROM log WHERE id > ? AND owner != ? ORDER BY id", (self.log_id, self.owner)
+        ).fetchall()
+        for i, kind, e in logs:
+            if kind == "alarm":
+                rec.setdefault("alarms", {"rows": {}, "log": []})["log"].append(pickle.loads(e))
+            else:
+                rec.setdefault(kind, []).append(pickle.loads(e))
+            self.log_id = i
+        if not rows and not logs:
+            return None
+        self.pulls += 1
+        return rec
+
+    def lease(self, name: str, ttl_sec: float, now: float) -> bool:
+        cur = self.db.execute(
+            "INSERT INTO lease VALUES (?, ?, ?) ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, until = excluded.until "
+            "WHERE lease.owner = excluded.owner OR lease.until < ?",
+            (name, self.owner, now + ttl_sec, now),
+        )
+        return cur.rowcount == 1
+
+    def skip_log(self):
+        # A console joining late takes the current rows but not the whole log backlog
+        self.log_id = self.db.execute("SELECT COALESCE(MAX(id), 0) FROM log").fetchone()[0]
+
+    def close(self):
+        self.db.close()
+
+
+# =========================================================
+# Session sync
+# =========================================================
+class StateSync:
+    """
+    Connects one session state to a backend: ``pull`` before a tick (it
+    returns the record it applied, or None), ``push`` after it (and after
+    operator actions), ``leader`` decides whether this console runs the
+    plant.
+    """
+
+    def __init__(self, backend: StateBackend):
+        self.backend = backend
+        self.diff = StateDiff(SYNC_FIELDS, trends=True)
+        self.is_leader = False
+        self.applied = 0
+
+    def attach(self, ss):
+        # Mirror the current shared state, then take this session's values as the baseline
+        self.backend.skip_log()
+        joined = self.pull(ss) is not None
+        self.diff.reset()
+        rec = self.diff.delta(ss, full=not joined)
+        if rec:
+            self.backend.publish(rec)  # first console: its plant becomes the shared one
+
+    def leader(self, t: float) -> bool:
+        self.is_leader = self.backend.lease("plant", BACKEND_LEASE_SEC, t)
+        return self.is_leader
+
+    def pull(self, ss) -> dict | None:
+        if not self.backend.pending():
+            return None
+        # Publish this console's own changes first: the baseline taken after applying would swallow them
+        self.push(ss)
+        rec = self.backend.changes()
+        if not rec:
+            return None
+        if "alarms" in rec and not rec["alarms"]["rows"]:
+            ss.alarms.history.extend(rec["alarms"]["log"])  # log only: the table did not change
+            ss.alarms.logged += len(rec["alarms"]["log"])
+            del rec["alarms"]
+        if "gh" in rec:
+            # Gate House rows arrive whole: keep the fields the other owners changed
+            ghs = {k: self.diff.gh_changes(k, row) for k, row in rec["gh"].items() if k in ss.gh_state}
+            rec["gh"] = {k: ch for k, ch in ghs.items() if ch}
+        apply_delta(ss, rec)
+        self.diff.delta(ss)  # pulled values are not this console's changes
+        history = ss.get("history")
+        if history is not None:
+            # Other consoles' operator actions go into the plant history (written by the leader)
+            t = now(ss)
+            for e in rec.get("audit_log", []):
+                history.record("audit", t, e["user"], e["role"], e["event"], e["detail"])
+            for e in rec.get("login_log", []):
+                history.record("login", t, e["user"], e["role"], e["event"], e["reason"])
+        self.applied += 1
+        rbe = ss.get("rbe")
+        if rbe is not None:
+            rbe.mark_ui_dirty()
+        return rec
+
+    def push(self, ss):
+        rec = self.diff.delta(ss)
+        if rec:
+            self.backend.publish(rec)
@@ -0,0 +1,363 @@
+"""
+CCTV proxy: one upstream connection per camera, fanned out to every viewer.
+
+A ``CameraFeed`` reads frames from its source on a daemon thread and keeps
+only the latest JPEG. Viewers never read the source themselves. ``stream``
+hands a viewer the newest frame no faster than its own frame rate, and
+slows down further when the viewer is slow to consume frames (frames in
+between are skipped, never queued). ``snapshot`` returns the cached latest
+frame for thumbnails. A camera with no viewers and no snapshot requests
+for CCTV_IDLE_SEC is disconnected. It reconnects on the next request.
+
+Sources are callables returning a frame iterator. ``MjpegFileSource`` plays
+a local MJPEG file (concatenated JPEGs) in a loop, as the stand-in for a
+field camera. ``python -m wms_core.cctv serve`` exposes the proxy over
+HTTP: ``/snapshot/<camera>.jpg`` and ``/stream/<camera>?fps=N`` (MJPEG).
+
+    python -m wms_core.cctv demo data/cctv              # synthetic MJPEG files (needs Pillow)
+    python -m wms_core.cctv serve data/cctv --port 8601
+"""
+import argparse
+import os
+import re
+import sys
+import threading
+import time
+
+CCTV_VIEWS = ["CCTV — Gate Area", "CCTV — Upstream", "CCTV — Downstream"]
+CCTV_SOURCE_FPS = 10.0          # file sources play at this rate
+CCTV_VIEWER_FPS = 5.0           # default per-viewer rate
+CCTV_IDLE_SEC = 30.0            # disconnect a camera nobody watched for this long
+CCTV_SNAPSHOT_WAIT_SEC = 2.0    # first frame after a (re)connect
+CCTV_RECONNECT_SEC = 2.0
+CCTV_READ_CHUNK = 64 * 1024
+
+_SOI, _EOI = b"\xff\xd8", b"\xff\xd9"
+
+
+def camera_slug(name: str) -> str:
+    # "CCTV — Gate Area" -> "gate-area"
+    return re.sub(r"[^a-z0-9]+", "-", name.lower().replace("cctv", "")).strip("-")
+
+
+# =========================================================
+# Sources
+# =========================================================
+def iter_jpeg_frames(f):
+    """JPEG frames from a byte stream of concatenated JPEGs (SOI ... EOI)."""
+    buf = b""
+    while True:
+        chunk = f.read(CCTV_READ_CHUNK)
+        if not chunk:
+            return
+        buf += chunk
+        while True:
+            start = buf.find(_SOI)
+            if start < 0:
+                buf = buf[-1:]
+                break
+            end = buf.find(_EOI, start + 2)
+            if end < 0:
+                buf = buf[start:]
+                break
+            yield buf[start:end + 2]
+            buf = buf[end + 2:]
+
+
+class MjpegFileSource:
+    """Plays an MJPEG file at ``fps``, looping, like a live camera."""
+
+    def __init__(self, path: str, fps: float = CCTV_SOURCE_FPS, loop: bool = True):
+        self.path = path
+        self.fps = fps
+        self.loop = loop
+
+    def __call__(self):
+        period = 1.0 / self.fps
+        next_t = time.monotonic()
+        while True:
+            n = 0
+            with open(self.path, "rb") as f:
+                for frame in iter_jpeg_frames(f):
+                    delay = next_t - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    next_t = max(next_t + period, time.monotonic() - period)
+                    n += 1
+                    yield frame
+            if not self.loop or n == 0:
+                return
+
+
+def file_sources(root: str, fps: float = CCTV_SOURCE_FPS) -> dict:
+    # <root>/<slug>.mjpeg per CCTV view, e.g. data/cctv/gate-area.mjpeg
+    sources = {}
+    for name in CCTV_VIEWS:
+        path = os.path.join(root, f"{camera_slug(name)}.mjpeg")
+        if os.path.exists(path):
+            sources[name] = MjpegFileSource(path, fps)
+    return sources
+
+
+# =========================================================
+# Proxy
+# =========================================================
+class CameraFeed:
+    """
+    One upstream connection. The reader thread publishes each frame as
+    ``(seq, ts, jpeg)``; waiters are woken through a condition.
+    """
+
+    def __init__(self, name: str, source):
+        self.name = name
+        self.source = source
+        self.frame: tuple[int, float, bytes] | None = None
+        self.viewers = 0
+        self.last_used = time.monotonic()
+        self.connects = 0
+        self.error: str | None = None
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def connected(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.connected:
+            if not self._stop.is_set():
+                return
+            self._thread.join()  # disconnecting: let it finish, then reconnect
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"cctv-{camera_slug(self.name)}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        with self._cond:
+            self.frame = None  # a reconnect must not show a stale picture
+            self._cond.notify_all()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.connects += 1
+            frames = self.source()
+            try:
+                for jpeg in frames:
+                    with self._cond:
+                        if self._stop.is_set():
+                            return
+                        self._seq += 1
+                        self.frame = (self._seq, time.time(), jpeg)
+                        self._cond.notify_all()
+                self.error = "source ended"
+            except Exception as e:  # field link down: keep the last frame, retry
+                self.error = f"{type(e).__name__}: {e}"
+            finally:
+                frames.close()
+            self._stop.wait(CCTV_RECONNECT_SEC)
+
+    def wait_newer(self, seq: int, timeout: float) -> tuple[int, float, bytes] | None:
+        with self._cond:
+            self._cond.wait_for(lambda: (self.frame is not None and self.frame[0] > seq) or self._stop.is_set(), timeout)
+            return self.frame if self.frame is not None and self.frame[0] > seq else None
+
+
+class CctvProxy:
+    """
+    Camera registry shared by all consoles of one server process.
+    ``sources`` maps camera name -> source callable. ``clock`` (monotonic
+    seconds) and ``sleep`` pace the viewers and time out idle cameras.
+    """
+
+    def __init__(self, sources: dict, idle_sec: float = CCTV_IDLE_SEC, clock=time.monotonic, sleep=time.sleep):
+        self.sources = dict(sources)
+        self.idle_sec = idle_sec
+        self.clock = clock
+        self.sleep = sleep
+        self.feeds: dict[str, CameraFeed] = {}
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        threading.Thread(target=self._reaper, name="cctv-reaper", daemon=True).start()
+
+    def cameras(self) -> list[str]:
+        return list(self.sources)
+
+    def feed(self, camera: str) -> CameraFeed:
+        with self._lock:
+            f = self.feeds.get(camera)
+            if f is None:
+                f = self.feeds[camera] = CameraFeed(camera, self.sources[camera])
+            f.last_used = self.clock()
+            f.start()
+            return f
+
+    def snapshot(self, camera: str, wait: float = CCTV_SNAPSHOT_WAIT_SEC) -> tuple[float, bytes] | None:
+        # Latest cached frame; waits only when the camera has just been (re)connected
+        f = self.feed(camera)
+        frame = f.frame or f.wait_newer(0, wait)
+        return None if frame is None else (frame[1], frame[2])
+
+    def stream(self, camera: str, fps: float = CCTV_VIEWER_FPS):
+        """
+        Frames for one viewer, at most ``fps``. The interval stretches to
+        what the viewer actually takes to consume a frame (EWMA), so a slow
+        link gets fewer, current frames instead of a growing backlog.
+        """
+        f = self.feed(camera)
+        period = 1.0 / fps
+        consume = 0.0
+        seq = 0
+        with f._cond:
+            f.viewers += 1
+        try:
+            while not self._closed.is_set():
+                frame = f.wait_newer(seq, CCTV_SNAPSHOT_WAIT_SEC)
+                f.last_used = self.clock()
+                if frame is None:
+                    if not f.connected:
+                        f = self.feed(camera)  # reaped or dropped: reconnect
+                    continue
+                seq = frame[0]
+                t0 = self.clock()
+                yield frame[2]
+                dt = self.clock() - t0
+                consume += 0.3 * (dt - consume)
+                rest = max(period, consume) - dt
+                if rest > 0:
+                    self.sleep(rest)
+        finally:
+            with f._cond:
+                f.viewers -= 1
+            f.last_used = self.clock()
+
+    def _reaper(self):
+        while not self._closed.wait(1.0):
+            self.reap()
+
+    def reap(self, now: float | None = None):
+        now = self.clock() if now is None else now
+        with self._lock:
+            for f in self.feeds.values():
+                if f.connected and f.viewers == 0 and now - f.last_used > self.idle_sec:
+                    f.stop()
+
+    def stats(self) -> dict:
+        return {
+            name: {"connected": f.connected, "viewers": f.viewers, "connects": f.connects, "frame_ts": f.frame[1] if f.frame else None}
+            for name, f in self.feeds.items()
+        }
+
+    def close(self):
+        self._closed.set()
+        for f in self.feeds.values():
+            f.stop()
+
+
+# =========================================================
+# HTTP / CLI
+# =========================================================
+def serve(proxy: CctvProxy, host: str = "0.0.0.0", port: int = 8601):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qs, urlparse
+
+    by_slug = {camera_slug(c): c for c in proxy.cameras()}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            parts = url.path.strip("/").split("/")
+            if len(parts) != 2 or parts[0] not in ("snapshot", "stream"):
+                self.send_error(404)
+                return
+            camera = by_slug.get(parts[1].removesuffix(".jpg"))
+            if camera is None:
+                self.send_error(404, "unknown camera")
+                return
+            if parts[0] == "snapshot":
+                snap = proxy.snapshot(camera)
+                if snap is None:
+                    self.send_error(503, "no frame yet")
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "image/jpeg")
+                self.send_header("Content-Length", str(len(snap[1])))
+                self.send_header("Cache-Control", "no-cache")
+                self.end_headers()
+                self.wfile.write(snap[1])
+                return
+            fps = float(parse_qs(url.query).get("fps", [CCTV_VIEWER_FPS])[0])
+            self.send_response(200)
+            self.send_header("Content-Type", "multipart/x-mixed-replace; boundary=frame")
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            frames = proxy.stream(camera, max(0.1, min(fps, CCTV_SOURCE_FPS)))
+            try:
+                for jpeg in frames:
+                    self.wfile.write(b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n" % len(jpeg))
+                    self.wfile.write(jpeg + b"\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # viewer left
+            finally:
+                frames.close()
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer((host, port), Handler)
+    httpd.daemon_threads = True
+    return httpd
+
+
+def write_demo(root: str, frames: int = 50):
+    try:
+        from PIL import Image, ImageDraw
+    except ImportError as e:
+        raise RuntimeError("demo footage needs Pillow") from e
+    import io
+
+    os.makedirs(root, exist_ok=True)
+    for name in CCTV_VIEWS:
+        with open(os.path.join(root, f"{camera_slug(name)}.mjpeg"), "wb") as out:
+            for i in range(frames):
+                img = Image.new("RGB", (320, 180), (5, 10, 20))
+                d = ImageDraw.Draw(img)
+                x = int(300 * i / frames)
+                d.rectangle([x, 80, x + 20, 120], fill=(52, 211, 153))
+                d.text((10, 10), f"{name}  #{i}", fill=(229, 231, 235))
+                buf = io.BytesIO()
+                img.save(buf, "JPEG", quality=70)
+                out.write(buf.getvalue())
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m wms_core.cctv", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("serve", help="serve the MJPEG files in a directory through the proxy")
+    p.add_argument("dir")
+    p.add_argument("--port", type=int, default=8601)
+    p.add_argument("--fps", type=float, default=CCTV_SOURCE_FPS, help="source frame rate")
+    p = sub.add_parser("demo", help="write synthetic MJPEG files for every CCTV view")
+    p.add_argument("dir")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "demo":
+        write_demo(args.dir)
+        print(f"{len(CCTV_VIEWS)} cameras -> {args.dir}")
+        return 0
+    proxy = CctvProxy(file_sources(args.dir, args.fps))
+    httpd = serve(proxy, port=args.port)
+    print(f"CCTV proxy on :{args.port}: " + ", ".join(f"/stream/{camera_slug(c)}" for c in proxy.cameras()))
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        proxy.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,312 @@
+"""
+Crash-safe plant state: periodic binary checkpoints plus a write-ahead journal.
+
+A checkpoint is a pickle of the persistent plant / control fields
+(CHECKPOINT_FIELDS). It is written to a temp file, fsynced and renamed over
+``plant.ckpt``. Between checkpoints, every commit appends one journal record
+with what changed since the previous one: operator-facing fields, gate and
+Gate House values, changed alarms and new audit / login entries. Records
+are length-prefixed and CRC-checked. A record torn by a crash ends the
+replay, and records left over from an older checkpoint are skipped by their
+sequence number.
+
+On startup ``restore`` loads the checkpoint and re-applies the journal into
+the session state before ``init_state``. init_state then only builds what is
+not persisted (comm, ETA and interlock engines, UI state). One console per
+directory owns the files (advisory lock). Other consoles restore from them
+but do not write; they retry the lock on every commit and take over when
+the owner exits.
+
+The audit and login logs are kept in full by the history store; a
+checkpoint holds only their last CHECKPOINT_LOG_MAX entries, and the
+journal only the entries added since.
+"""
+import copy
+import os
+import pickle
+import struct
+import time
+import zlib
+
+from .domain import DATA_DIR
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory lock, every console writes
+    fcntl = None
+
+CHECKPOINT_DIR = os.path.join(DATA_DIR, "checkpoint")
+CHECKPOINT_VERSION = 2          # 2: control state per Gate House (in gh_state)
+CHECKPOINT_INTERVAL_SEC = 60.0
+JOURNAL_MAX_RECORDS = 600       # checkpoint early when the journal grows past this
+JOURNAL_FSYNC = False           # True: survive power loss per tick, at the cost of one fsync per tick
+CHECKPOINT_LOG_MAX = 1000       # audit / login entries kept in a checkpoint (the full logs are in the history)
+
+# Small operator / console fields, journaled whole when they change (per Gate House control is in gh_state)
+SCALAR_FIELDS = [
+    "station",
+    "gatehouse",
+    "selected_gate",
+    "remote_enabled",
+    "comm_main",
+    "comm_backup",
+    "commercial_power",
+    "gen_state",
+    "program_active",
+    "manual_cmd",
+    "prot",
+]
+# Checkpoint only (rebuilt or re-learned quickly after a restart if lost)
+BULK_FIELDS = ["gate_state", "gh_state", "alarms", "audit_log", "login_log", "trend_gate", "trend_gate_t", "stats", "anomaly", "sim_seed", "rng"]
+CHECKPOINT_FIELDS = SCALAR_FIELDS + BULK_FIELDS
+LOG_FIELDS = ("audit_log", "login_log")
+ALARM_STATE_FIELDS = ("active", "by_gh", "shelved", "_inputs", "_unacked")
+
+_REC_HEAD = struct.Struct("<II")   # payload length, crc32
+_MISSING = object()
+
+
+def _fsync_write(path: str, data: bytes):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class Checkpointer:
+    """
+    Owns ``plant.ckpt`` / ``plant.journal`` in one directory.
+
+    ``commit`` is called once per tick (and after operator actions). It
+    appends the journal record for what changed and writes a checkpoint every
+    CHECKPOINT_INTERVAL_SEC.
+    """
+
+    def __init__(self, root: str = CHECKPOINT_DIR):
+        self.root = root
+        self.ckpt_path = os.path.join(root, "plant.ckpt")
+        self.journal_path = os.path.join(root, "plant.journal")
+        os.makedirs(root, exist_ok=True)
+        self._lock_f = None
+        self.owner = self._lock()
+        self.seq = 0
+        self.last_ckpt_ts: float | None = None
+        self.records = 0               # journal records since the last checkpoint
+        self.restored: dict | None = None
+        self._journal = None
+        self._diff = StateDiff()
+
+    def _lock(self) -> bool:
+        if fcntl is None:
+            return True
+        self._lock_f = open(os.path.join(self.root, "LOCK"), "a")
+        try:
+            fcntl.flock(self._lock_f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            self._lock_f.close()
+            return False
+
+    # --- Restore
+    def restore(self, ss) -> bool:
+        t0 = time.perf_counter()
+        try:
+            with open(self.ckpt_path, "rb") as f:
+                ckpt = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return False
+        if ckpt.get("version") != CHECKPOINT_VERSION:
+            return False
+        for k, v in ckpt["fields"].items():
+            ss[k] = v
+        self.seq = ckpt["seq"]
+
+        applied = 0
+        for rec in self._read_journal():
+            if rec["seq"] == self.seq:
+                apply_delta(ss, rec)
+                applied += 1
+        self.restored = {
+            "ckpt_ts": ckpt["ts"],
+            "records": applied,
+            "ms": (time.perf_counter() - t0) * 1000.0,
+        }
+        return True
+
+    def _read_journal(self):
+        try:
+            f = open(self.journal_path, "rb")
+        except OSError:
+            return
+        with f:
+            while True:
+                head = f.read(_REC_HEAD.size)
+                if len(head) < _REC_HEAD.size:
+                    return
+                n, crc = _REC_HEAD.unpack(head)
+                data = f.read(n)
+                if len(data) < n or zlib.crc32(data) != crc:
+                    return  # torn tail
+                yield pickle.loads(data)
+
+    def _take_over(self) -> bool:
+        # The previous owner exited: continue after its last checkpoint sequence
+        if not self._lock():
+            return False
+        try:
+            with open(self.ckpt_path, "rb") as f:
+                self.seq = max(self.seq, pickle.load(f)["seq"])
+        except (OSError, pickle.UnpicklingError, EOFError, KeyError):
+            pass
+        self.last_ckpt_ts = None  # the first commit writes this console's plant as a checkpoint
+        self.owner = True
+        return True
+
+    # --- Write path
+    def commit(self, ss, t: float):
+        if not self.owner and not self._take_over():
+            return
+        if self.last_ckpt_ts is None or t - self.last_ckpt_ts >= CHECKPOINT_INTERVAL_SEC or self.records >= JOURNAL_MAX_RECORDS:
+            self.checkpoint(ss, t)
+            return
+        rec = self._diff.delta(ss)
+        if rec:
+            rec["seq"], rec["t"] = self.seq, t
+            data = pickle.dumps(rec, protocol=pickle.HIGHEST_PROTOCOL)
+            self._journal.write(_REC_HEAD.pack(len(data), zlib.crc32(data)) + data)
+            self._journal.flush()
+            if JOURNAL_FSYNC:
+                os.fsync(self._journal.fileno())
+            self.records += 1
+
+    def checkpoint(self, ss, t: float):
+        self.seq += 1
+        fields = {k: ss[k][-CHECKPOINT_LOG_MAX:] if k in LOG_FIELDS else ss[k] for k in CHECKPOINT_FIELDS if k in ss}
+        data = pickle.dumps({"version": CHECKPOINT_VERSION, "seq": self.seq, "ts": t, "fields": fields}, protocol=pickle.HIGHEST_PROTOCOL)
+        _fsync_write(self.ckpt_path, data)
+        # The new checkpoint is durable: the old journal can go (its records carry the old seq)
+        if self._journal is not None:
+            self._journal.close()
+        self._journal = open(self.journal_path, "wb")
+        self.records = 0
+        self.last_ckpt_ts = t
+        self._diff.reset()
+        self._diff.delta(ss)  # baseline for the next record
+
+    @property
+    def journal_bytes(self) -> int:
+        return self._journal.tell() if self._journal is not None else 0
+
+
+# =========================================================
+# State deltas (journal records, backend sync)
+# =========================================================
+class StateDiff:
+    """
+    Tracks the last seen values of the persistent fields and returns what
+    changed since the previous call. Gates compare as whole dicts, Gate
+    Houses per field, alarms per alarm id (only once the table's version
+    stamp moved); logs compare by length. The first call after ``reset`` only sets the baseline, unless
+``full`` asks for every field (logs still start from that point).
+    """
+
+    def __init__(self, fields: list[str] = SCALAR_FIELDS, trends: bool = False):
+        self.fields = fields
+        self.trends = trends    # include trend lists (live mirrors; the journal leaves them to checkpoints)
+        self._last: dict = {}
+
+    def reset(self):
+        self._last = {}
+
+    def gh_changes(self, gh_key: str, row: dict) -> dict:
+        # Fields of a whole Gate House row that differ from the last seen values
+        prev = self._last.get("gh", {}).get(gh_key, {})
+        return {f: v for f, v in row.items() if prev.get(f, _MISSING) != v}
+
+    def delta(self, ss, full: bool = False) -> dict:
+        last = self._last
+        first = not last
+        rec = {}
+
+        last_s = last.setdefault("scalars", {})
+        fields = self.fields + (["trend_gate", "trend_gate_t"] if self.trends else [])
+        scalars = {f: copy.deepcopy(ss.get(f)) for f in fields if last_s.get(f, _MISSING) != ss.get(f)}
+        if scalars:
+            last_s.update(scalars)
+            rec["set"] = scalars
+
+        last_g = last.setdefault("gates", {})
+        gates = {}
+        for k, gs in ss.gate_state.items():
+            if last_g.get(k) != gs:
+                last_g[k] = gates[k] = dict(gs)
+        if gates:
+            rec["gates"] = gates
+
+        last_gh = last.setdefault("gh", {})
+        ghs = {}
+        for k, gh in ss.gh_state.items():
+            prev = last_gh.setdefault(k, {})
+            ch = {
+                f: copy.copy(v)
+                for f, v in gh.items()
+                if (self.trends or not f.startswith("trend_")) and prev.get(f, _MISSING) != v
+            }
+            if ch:
+                prev.update(ch)
+                ghs[k] = ch
+        if ghs:
+            rec["gh"] = ghs
+
+        alarms = ss.alarms
+        if alarms.version != last.get("alarm_version"):
+            last_a = last.setdefault("alarms", {})
+            rows = {}
+            for a in alarms.active.keys() | alarms.shelved.keys() | alarms._inputs.keys() | last_a.keys():
+                row = alarms.row(a)
+                if last_a.get(a) != row:
+                    rows[a] = row
+                    if row is None:
+                        del last_a[a]
+                    else:
+                        last_a[a] = row
+            new_log = min(alarms.logged - last.get("alarm_logged", alarms.logged), len(alarms.history))
+            if rows or new_log:
+                rec["alarms"] = {"rows": rows, "log": list(alarms.history)[len(alarms.history) - new_log:]}
+            last["alarm_version"], last["alarm_logged"] = alarms.version, alarms.logged
+
+        for log in LOG_FIELDS:
+            n = len(ss[log])
+            if n > last.get(log, n):
+                rec[log] = ss[log][last[log]:]
+            last[log] = n
+        return rec if full or not first else {}
+
+
+def apply_delta(ss, rec: dict):
+    for k, v in rec.get("set", {}).items():
+        if k == "prot" and "interlock" in ss:
+            # Live state: the interlock engine holds the prot dict
+            for gh_key, flags in v.items():
+                for flag, on in flags.items():
+                    ss.interlock.set_protection(gh_key, flag, on)
+        else:
+            ss[k] = v
+    for k, gs in rec.get("gates", {}).items():
+        ss.gate_state[k] = gs
+    for k, ch in rec.get("gh", {}).items():
+        ss.gh_state[k].update(ch)
+    if "alarms" in rec:
+        alarms = ss.alarms
+        for a, row in rec["alarms"].get("rows", {}).items():
+            alarms.set_row(a, row)
+        for a, v in rec["alarms"].get("state", {}).items():
+            setattr(alarms, a, v)  # whole table (journals written before per-alarm rows)
+        alarms.history.extend(rec["alarms"]["log"])
+        alarms.logged += len(rec["alarms"]["log"])
+        alarms.version += 1
+    for log in LOG_FIELDS:
+        if log in rec:
+            ss[log].extend(rec[log])
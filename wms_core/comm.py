@@ -0,0 +1,279 @@
+"""
+Comm layer: main / backup failover with store-and-forward buffering.
+
+Telemetry reports (after the deadband filter) and command acknowledgements
+travel as messages over the active link. While no link is up, or when live
+traffic exceeds the link capacity, messages go to a bounded queue that is
+mirrored to disk. After reconnect the backlog is backfilled in bulk into
+the trend store. Backfill only uses capacity that live traffic leaves free,
+and it is capped per tick, so live values are never held back behind
+history.
+
+FaultInjector is the local stand-in for the field links. It combines the
+operator-set link states (sidebar), optional random link flaps and per-link
+latency. Its RNG is separate from the process simulation, so seeded runs
+stay reproducible.
+"""
+import heapq
+import json
+import os
+import random
+from datetime import datetime
+
+from .alarms import CONSOLE_WIDE
+from .domain import DATA_DIR
+from .rbe import append_trend, backfill_trend
+from .session import audit
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory lock
+    fcntl = None
+
+COMM_QUEUE_DIR = os.path.join(DATA_DIR, "comm")
+COMM_QUEUE_FILE = "plant.jsonl"               # one queue per plant: survives a console restart
+COMM_QUEUE_MAX = 5000                         # messages; oldest are dropped beyond this
+LINK_CAPACITY = {"MAIN": 50, "BACKUP": 6}     # messages per tick (backup is the narrow path)
+BACKFILL_MAX_PER_TICK = 20
+FLAP_PROB_PER_TICK = 0.02                     # random link loss (fault injection)
+FLAP_DOWN_SEC = (5.0, 30.0)
+
+
+# =========================================================
+# Bounded on-disk queue
+# =========================================================
+class DiskQueue:
+    """
+    Bounded FIFO of JSON messages, mirrored to an append-only file.
+
+    The file exists only while the queue holds messages. Consumed entries
+    (popped or dropped as oldest) are compacted out of the file once they
+    make up half of it. A queue attached to an existing file resumes from
+    it. Delivery is therefore at-least-once after a restart, and receivers
+    de-duplicate by timestamp. With ``path=None`` the queue is memory-only
+    (headless runs). One queue owns a file (advisory lock); ``attach``
+    returns False while another console holds it.
+    """
+
+    def __init__(self, path: str | None = None, maxlen: int = COMM_QUEUE_MAX):
+        self.path = None
+        self.maxlen = maxlen
+        self.items: list[dict] = []
+        self._head = 0              # consumed entries not yet compacted away
+        self.dropped = 0
+        self._lock_f = None
+        if path is not None:
+            self.attach(path)
+
+    def attach(self, path: str) -> bool:
+        if fcntl is not None:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            f = open(path + ".lock", "a")
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                f.close()
+                return False
+            self._lock_f = f
+        self.path = path
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.items = [json.loads(line) for line in f if line.strip()] + self.items[self._head:]
+            self._head = 0
+            self._rewrite()
+            self._drop_overflow()
+        return True
+
+    def __len__(self) -> int:
+        return len(self.items) - self._head
+
+    @property
+    def full(self) -> bool:
+        return len(self) >= self.maxlen
+
+    def push_many(self, msgs: list[dict]):
+        if not msgs:
+            return
+        self.items.extend(msgs)
+        if self.path is not None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(m, separators=(",", ":")) + "\n" for m in msgs)
+        self._drop_overflow()
+
+    def pop_many(self, n: int) -> list[dict]:
+        out = self.items[self._head:self._head + n]
+        self._consume(len(out))
+        return out
+
+    def _drop_overflow(self):
+        over = len(self) - self.maxlen
+        if over > 0:
+            self.dropped += over
+            self._consume(over)
+
+    def _consume(self, n: int):
+        self._head += n
+        if self._head >= len(self.items):
+            self.items, self._head = [], 0
+            self._rewrite()
+        elif self._head * 2 >= len(self.items):
+            self.items, self._head = self.items[self._head:], 0
+            self._rewrite()
+
+    def _rewrite(self):
+        if self.path is None:
+            return
+        if not self.items:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(m, separators=(",", ":")) + "\n" for m in self.items)
+        os.replace(tmp, self.path)
+
+
+# =========================================================
+# Fault injection (local link stand-in)
+# =========================================================
+class FaultInjector:
+    """
+    Link availability and latency from the operator-set link states, plus
+    optional random flaps (``ss.comm_fault_flaps``) and per-link latency
+    (``ss.comm_fault_latency_ms``).
+    """
+
+    def __init__(self, seed: int | None = None):
+        self.rng = random.Random(None if seed is None else f"comm-{seed}")
+        self.down_until = {"MAIN": 0.0, "BACKUP": 0.0}
+        self._rolled = {"MAIN": None, "BACKUP": None}   # one flap draw per link and timestamp
+
+    def link_up(self, ss, link: str, t: float) -> bool:
+        state = ss.comm_main if link == "MAIN" else ss.comm_backup
+        if state == "DOWN":
+            return False
+        if ss.comm_fault_flaps:
+            if t < self.down_until[link]:
+                return False
+            if self._rolled[link] != t and self.rng.random() < FLAP_PROB_PER_TICK:
+                self.down_until[link] = t + self.rng.uniform(*FLAP_DOWN_SEC)
+                return False
+            self._rolled[link] = t
+        return True
+
+    def latency_sec(self, ss, link: str) -> float:
+        return ss.comm_fault_latency_ms.get(link, 0) / 1000.0
+
+
+# =========================================================
+# Comm layer
+# =========================================================
+class CommLayer:
+    """
+    Routes telemetry / ack messages over the active link.
+
+    ``send`` collects messages during a tick. ``flush`` sends live traffic
+    first, then spends the leftover link capacity on backlog, and delivers
+    whatever has arrived after link latency.
+    """
+
+    def __init__(self, seed: int | None = None, queue_path: str | None = None):
+        self.queue = DiskQueue(queue_path)
+        self.faults = FaultInjector(seed)
+        self.active: str | None = "MAIN"
+        self.up = {"MAIN": True, "BACKUP": True}
+        self.failovers = 0
+        self.delivered = 0
+        self.backfilled = 0
+        self._outbox: list[dict] = []
+        self._in_flight: list[tuple[float, int, dict]] = []   # heap of (due ts, seq, msg)
+        self._seq = 0
+        self._last_ts: dict[str, float] = {}                  # point -> ts of value currently shown
+
+    # --- Links / failover
+    def update_links(self, ss, t: float):
+        self.up = {link: self.faults.link_up(ss, link, t) for link in ("MAIN", "BACKUP")}
+        active = "MAIN" if self.up["MAIN"] else ("BACKUP" if self.up["BACKUP"] else None)
+        if active != self.active:
+            if active is not None and self.active is not None:
+                self.failovers += 1
+            audit(ss, "COMM", f"Active link {self.active or 'NONE'} -> {active or 'NONE'} (buffered {len(self.queue)})")
+            self.active = active
+
+        ss.alarms.update("COMM_MAIN_DOWN", not self.up["MAIN"], CONSOLE_WIDE, "LOW", "Main communication link down", t)
+        ss.alarms.update("COMM_BACKUP_DOWN", not self.up["BACKUP"], CONSOLE_WIDE, "LOW", "Backup communication link down", t)
+        ss.alarms.update("COMM_ALL_DOWN", active is None, CONSOLE_WIDE, "HIGH", "No communication link: telemetry buffered locally", t)
+        ss.alarms.update("COMM_QUEUE_FULL", self.queue.full, CONSOLE_WIDE, "MEDIUM", "Comm buffer full: oldest telemetry dropped", t)
+
+    # --- Traffic
+    def send(self, msg: dict):
+        self._outbox.append(msg)
+
+    def flush(self, ss, t: float):
+        live, self._outbox = self._outbox, []
+        if self.active is None:
+            self.queue.push_many(live)
+        else:
+            cap = LINK_CAPACITY[self.active]
+            if len(self.queue):
+                budget = min(BACKFILL_MAX_PER_TICK, max(0, cap - len(live)))
+                backlog = [dict(m, backfill=True) for m in self.queue.pop_many(budget)]
+            else:
+                backlog = []
+            self.queue.push_many(live[cap:])  # over capacity: live overflow waits its turn
+            due = t + self.faults.latency_sec(ss, self.active)
+            for m in live[:cap] + backlog:
+                heapq.heappush(self._in_flight, (due, self._seq, m))
+                self._seq += 1
+
+        arrived = []
+        while self._in_flight and self._in_flight[0][0] <= t:
+            arrived.append(heapq.heappop(self._in_flight)[2])
+        if arrived:
+            self._deliver(ss, arrived)
+
+    def _deliver(self, ss, msgs: list[dict]):
+        late: dict[str, list] = {}   # gh_key -> [(ts, q)] for trend backfill
+        for m in msgs:
+            if m["kind"] == "telemetry":
+                ss.history.record_trend(m["gh_key"], m["signal"], m["value"], m["ts"])
+                point = f"{m['gh_key']}/{m['signal']}"
+                if m["ts"] >= self._last_ts.get(point, float("-inf")):
+                    self._last_ts[point] = m["ts"]
+                    gh = ss.gh_state[m["gh_key"]]
+                    gh[m["signal"]] = m["value"]
+                    if m["signal"] == "q_act":
+                        if m.get("backfill"):
+                            late.setdefault(m["gh_key"], []).append((m["ts"], m["value"]))
+                        else:
+                            append_trend(gh["trend_q"], gh["trend_q_t"], m["value"], m["ts"])
+                elif m["signal"] == "q_act":
+                    late.setdefault(m["gh_key"], []).append((m["ts"], m["value"]))
+            elif m["kind"] == "ack":
+                gs = ss.gate_state[m["gate_key"]]
+                if m["ts"] >= gs.get("last_ack_ts", float("-inf")):
+                    gs["last_ack"] = m["cmd"]
+                    gs["last_ack_ts"] = m["ts"]
+                    gs["last_ack_time"] = datetime.fromtimestamp(m["ts"]).strftime("%H:%M:%S")
+            if m.get("backfill"):
+                self.backfilled += 1
+            self.delivered += 1
+
+        for gh_key, points in late.items():
+            gh = ss.gh_state[gh_key]
+            backfill_trend(gh["trend_q"], gh["trend_q_t"], points)
+        ss.rbe.mark_ui_dirty()
+
+    @property
+    def backlog(self) -> int:
+        return len(self.queue) + len(self._outbox)
+
+
+def send_telemetry(ss, gh_key: str, signal: str, value: float, ts: float):
+    ss.comm.send({"kind": "telemetry", "gh_key": gh_key, "signal": signal, "value": value, "ts": ts})
+
+
+def send_ack(ss, gate_key: str, cmd: str, ts: float):
+    ss.comm.send({"kind": "ack", "gate_key": gate_key, "cmd": cmd, "ts": ts})
@@ -0,0 +1,344 @@
+"""Gate commands and the Remote Automatic / Program / Manual control logic."""
+from datetime import datetime
+
+from .alarms import set_auto_alarm
+from .comm import send_ack
+from .domain import (
+    AUTO_FAIL_TIMEOUT_SEC,
+    GATE_SPEED_M_PER_MIN,
+    K_PATTERNS,
+    K_TOL_PCT,
+    clamp,
+    gates_of,
+    opening_m_from_pct,
+    opening_pct_from_m,
+)
+from .interlock import blocked, interlock_reasons
+from .power import power_budget_kw
+from .scheduler import describe_entry
+from .session import (
+    all_gates_in_gatehouse,
+    audit,
+    current_gh_key,
+    get_gatehouse_type,
+    now,
+    touch_activity,
+)
+
+
+# =========================================================
+# Commands / gate motion
+# =========================================================
+def send_cmd_to_gate(ss, gate_key: str, cmd: str):
+    touch_activity(ss)
+    t = now(ss)
+    now_txt = datetime.fromtimestamp(t).strftime("%H:%M:%S")
+    ss.gate_state[gate_key]["last_cmd"] = cmd
+    ss.gate_state[gate_key]["last_cmd_time"] = now_txt
+    send_ack(ss, gate_key, cmd, t)
+    audit(ss, "COMMAND", f"{gate_key} :: {cmd}")
+
+
+def send_cmd_to_gatehouse(ss, cmd: str):
+    touch_activity(ss)
+    t = now(ss)
+    now_txt = datetime.fromtimestamp(t).strftime("%H:%M:%S")
+    for g in all_gates_in_gatehouse(ss):
+        key = f"{ss.station}/{ss.gatehouse}/{g}"
+        ss.gate_state[key]["last_cmd"] = cmd
+        ss.gate_state[key]["last_cmd_time"] = now_txt
+        send_ack(ss, key, cmd, t)
+    audit(ss, "COMMAND", f"{current_gh_key(ss)} :: {cmd}")
+
+
+GATE_STEP_PCT = 2.0  # per tick, Automatic / Program position moves
+
+
+def step_gate_toward(ss, gate_key: str, target_pct: float, move: bool = True) -> tuple[float, float]:
+    gg = ss.gate_state[gate_key]
+    max_m = gg["max_open_m"]
+    cur_m = gg["open_m"]
+    target_m = opening_m_from_pct(clamp(target_pct, 0.0, 100.0), max_m)
+    step_m = opening_m_from_pct(GATE_STEP_PCT, max_m)
+    if not move:
+        pass  # held by the motion sequencer (power budget)
+    elif cur_m < target_m:
+        cur_m = min(target_m, cur_m + step_m)
+    elif cur_m > target_m:
+        cur_m = max(target_m, cur_m - step_m)
+    gg["open_m"] = cur_m
+    return target_m, step_m
+
+
+def _move_priority(ss, gh_key: str, gate_key: str, target_m: float) -> tuple[float, float]:
+    # Sequencing order on a power budget: largest K error first, then the longest way to go
+    gh = ss.gh_state[gh_key]
+    return abs(gh["k_target"] - filtered_k_act(gh)), abs(target_m - ss.gate_state[gate_key]["open_m"])
+
+
+def step_all_gates_in_gatehouse(ss, target_pct: float, gh_key: str | None = None, source: str = "PROGRAM"):
+    gh_key = gh_key or current_gh_key(ss)
+    keys = [f"{gh_key}/{g}" for g in gates_of(gh_key)]
+    target_m = {k: opening_m_from_pct(clamp(target_pct, 0.0, 100.0), ss.gate_state[k]["max_open_m"]) for k in keys}
+    wants = {k: _move_priority(ss, gh_key, k, target_m[k]) for k in keys if ss.gate_state[k]["open_m"] != target_m[k]}
+    granted = ss.motion.grant(ss, gh_key, wants)
+    targets, steps = zip(*(step_gate_toward(ss, k, target_pct, k in granted or k not in wants) for k in keys))
+    ss.eta.set_moves(keys, targets, ss.eta.step_rate(steps), source, [k in wants and k not in granted for k in keys])
+
+
+# =========================================================
+# Remote Automatic logic (skeleton)
+# =========================================================
+def compute_k_act(gh: dict) -> float:
+    q_plan = gh["q_plan"]
+    if q_plan <= 0:
+        return 0.0
+    return gh["q_act"] / q_plan
+
+
+def filtered_k_act(gh: dict) -> float:
+    # Conditioned Kact (filters.py) once a tick has produced it, raw before that
+    k = gh.get("k_act")
+    return compute_k_act(gh) if k is None else k
+
+
+def auto_target_q(gh: dict) -> float:
+    return gh["k_target"] * gh["q_plan"]
+
+
+def dummy_gate_opening_from_qtarget(q_target: float) -> int:
+    return int(clamp(10 + q_target * 6.0, 0, 100))
+
+
+def apply_remote_automatic_if_running(ss, gh_keys=None):
+    # Every Gate House whose own control state runs Automatic, whichever console started it
+    for gh_key in gh_keys or ss.gh_state:
+        gh = ss.gh_state[gh_key]
+        if gh["mode"] == "REMOTE AUTOMATIC" and gh["auto_state"] == "RUNNING":
+            automatic_step(ss, gh_key)
+
+
+def automatic_step(ss, gh_key: str):
+    gh = ss.gh_state[gh_key]
+    if blocked(ss, gh_key):
+        gh["auto_state"] = "STOPPED"
+        return
+
+    # Hold on suspect Q/H data instead of chasing a bad meter; hold time does not count toward the 1-hour limit
+    t = now(ss)
+    if ss.anomaly.suspect(gh_key, t):
+        if gh["auto_hold_since"] is None:
+            gh["auto_hold_since"] = t
+            audit(ss, "AUTO", f"{gh_key} :: HOLD (suspect data: {', '.join(ss.anomaly.reasons.get(gh_key, []))})")
+        return
+    if gh["auto_hold_since"] is not None:
+        if gh["auto_first_exec_ts"] is not None:
+            gh["auto_first_exec_ts"] += t - gh["auto_hold_since"]
+        gh["auto_hold_since"] = None
+        audit(ss, "AUTO", f"{gh_key} :: RESUME (data plausible)")
+
+    k_act = filtered_k_act(gh)
+    k_target = gh["k_target"]
+
+    diff_pct = (k_target - k_act) * 100.0
+    out_of_band = abs(diff_pct) > K_TOL_PCT
+
+    if gh["auto_first_exec_ts"] is None:
+        gh["auto_first_exec_ts"] = t
+
+    if out_of_band and (t - gh["auto_first_exec_ts"]) >= AUTO_FAIL_TIMEOUT_SEC:
+        gh["auto_state"] = "STOPPED"
+        set_auto_alarm(
+            ss,
+            gh_key,
+            True,
+            "Automatic control stopped: Ktarget cannot be achieved within 1 hour. "
+            "Please check discharge at preceding/subsequent gates and canals.",
+        )
+        audit(ss, "ALARM", f"{gh_key} :: {gh['auto_alarm_msg']}")
+        return
+
+    q_target = auto_target_q(gh)
+    gp_target_pct = dummy_gate_opening_from_qtarget(q_target)
+    step_all_gates_in_gatehouse(ss, gp_target_pct, gh_key, source="AUTOMATIC")
+
+
+# =========================================================
+# Remote Program logic (kept)
+# =========================================================
+def current_program(ss, gh_key: str | None = None) -> dict:
+    # Program Mode Control selection of a Gate House, in timetable-entry form
+    gh = ss.gh_state[gh_key or current_gh_key(ss)]
+    return {
+        "program_mode": gh["program_mode"],
+        "k_pattern": gh["prog_k_pattern"],
+        "gate_pos_unit": gh["prog_gate_pos_unit"],
+        "gate_pos_value": float(gh["prog_gate_pos_value"]),
+        "drive_direction": gh["prog_drive_direction"],
+        "drive_minutes": float(gh["prog_drive_minutes"]),
+    }
+
+
+def apply_remote_program_if_running(ss, gh_keys=None):
+    for gh_key in gh_keys or ss.gh_state:
+        gh = ss.gh_state[gh_key]
+        if gh["mode"] != "REMOTE PROGRAM" or not gh["program_running"]:
+            continue
+        if blocked(ss, gh_key):
+            gh["program_running"] = False
+            continue
+        program_step(ss, gh_key, current_program(ss, gh_key))
+
+
+def program_step(ss, gh_key: str, prog: dict):
+    gh = ss.gh_state[gh_key]
+
+    if prog["program_mode"] == "K VALUE":
+        k_target = K_PATTERNS.get(prog["k_pattern"], 1.0)
+        gh["k_target"] = k_target
+        q_target = auto_target_q(gh)
+        gp_target_pct = dummy_gate_opening_from_qtarget(q_target)
+        step_all_gates_in_gatehouse(ss, gp_target_pct, gh_key)
+        return
+
+    if prog["program_mode"] == "GATE POSITION":
+        # Program mode may issue position instructions (not Remote Manual)
+        if prog["gate_pos_unit"] == "%":
+            target_pct = int(clamp(round(prog["gate_pos_value"]), 0, 100))
+        else:
+            rep_gate = ss.selected_gate if gh_key == current_gh_key(ss) else gates_of(gh_key)[0]
+            max_m = ss.gate_state[f"{gh_key}/{rep_gate}"]["max_open_m"]
+            target_m = clamp(prog["gate_pos_value"] / 100.0, 0.0, max_m)  # cm -> m
+            target_pct = opening_pct_from_m(target_m, max_m)
+        step_all_gates_in_gatehouse(ss, target_pct, gh_key)
+        return
+
+    if prog["program_mode"] == "DRIVE TIME":
+        minutes = clamp(prog["drive_minutes"], 0.0, 30.0)
+        delta_m = minutes * GATE_SPEED_M_PER_MIN
+        sequenced = power_budget_kw(ss, gh_key) is not None
+        for g in gates_of(gh_key):
+            gs = ss.gate_state[f"{gh_key}/{g}"]
+            max_m = gs["max_open_m"]
+            cur_m = gs["open_m"]
+            if prog["drive_direction"] == "RAISE":
+                new_m = clamp(cur_m + delta_m, 0.0, max_m)
+            else:
+                new_m = clamp(cur_m - delta_m, 0.0, max_m)
+            if sequenced:
+                ss.motion.drives[f"{gh_key}/{g}"] = new_m  # driven by tick_sequenced_drives
+            else:
+                gs["open_m"] = new_m
+        return
+
+
+def tick_sequenced_drives(ss):
+    # DRIVE TIME targets accepted on generator supply, moved under the power budget
+    drives = ss.motion.drives
+    by_gh: dict[str, list[str]] = {}
+    for k in list(drives):
+        if abs(ss.gate_state[k]["open_m"] - drives[k]) <= 1e-6:
+            del drives[k]
+        else:
+            by_gh.setdefault(k.rsplit("/", 1)[0], []).append(k)
+    for gh_key, keys in by_gh.items():
+        if blocked(ss, gh_key):
+            continue
+        granted = ss.motion.grant(ss, gh_key, {k: _move_priority(ss, gh_key, k, drives[k]) for k in keys})
+        for k in keys:
+            gs = ss.gate_state[k]
+            target_pct = opening_pct_from_m(drives[k], gs["max_open_m"])
+            target_m, step_m = step_gate_toward(ss, k, target_pct, k in granted)
+            ss.eta.set_moves([k], target_m, ss.eta.step_rate(step_m), "PROGRAM", k not in granted)
+    # Last grants of the tick: Gate Houses that stopped asking (arrived, stopped, blocked) free their motors
+    ss.motion.end_tick()
+
+
+def tick_program_schedules(ss):
+    ss.scheduler.refresh(now(ss))  # timetable edits from other consoles
+    for gh_key, entry in ss.scheduler.pop_due(now(ss)):
+        ss.program_active[gh_key] = entry
+        audit(ss, "PROGRAM", f"{gh_key} :: SCHEDULED {describe_entry(entry)}")
+
+    for gh_key, entry in list(ss.program_active.items()):
+        gh = ss.gh_state[gh_key]
+        if gh["mode"] != "REMOTE PROGRAM" or gh["program_running"]:
+            continue  # timetables drive Gate Houses in Remote Program; an operator RUN takes precedence
+        if blocked(ss, gh_key):
+            continue
+        program_step(ss, gh_key, entry)
+        if entry["program_mode"] == "DRIVE TIME":
+            del ss.program_active[gh_key]  # drive time is a one-shot transition
+
+
+# =========================================================
+# Remote Manual (SPEC-ALIGNED): continuous Raise/Down/Stop
+# =========================================================
+def manual_set_cmd(ss, gate_key: str, cmd: str):
+    # cmd: "RAISE" / "DOWN" / "STOP"
+    ss.manual_cmd[gate_key] = cmd
+    send_cmd_to_gate(ss, gate_key, f"REMOTE MANUAL {cmd}")
+
+
+def manual_force_stop(ss, gh_key: str, reason: str):
+    moving = [k for k, cmd in ss.manual_cmd.items() if cmd != "STOP" and k.rsplit("/", 1)[0] == gh_key]
+    for k in moving:
+        ss.manual_cmd[k] = "STOP"
+    if moving:
+        audit(ss, "INTERLOCK", f"{gh_key} :: Remote Manual forced STOP ({reason})")
+
+
+def tick_remote_manual_motion(ss, gh_keys=None):
+    # Every gate with a running command, in the Gate Houses whose own mode is Remote Manual
+    runnable = []
+    for gh_key in gh_keys or ss.gh_state:
+        if ss.gh_state[gh_key]["mode"] != "REMOTE MANUAL":
+            continue
+        # Spec: SPC does not support Remote Manual
+        if get_gatehouse_type(ss, gh_key) == "SPC":
+            manual_force_stop(ss, gh_key, "SPC does not support Remote Manual")
+            continue
+        # Interlocks / access
+        reasons = interlock_reasons(ss, gh_key)
+        if reasons:
+            manual_force_stop(ss, gh_key, f"Blocked by interlock/access: {', '.join(reasons)}")
+            continue
+        runnable.append(gh_key)
+    if not runnable:
+        return
+
+    t = now(ss)
+    dt = max(0.0, t - ss.manual_last_tick_ts)
+    dt = min(dt, 2.0)  # avoid jump after long pause
+    ss.manual_last_tick_ts = t
+
+    for gate_key, cmd in list(ss.manual_cmd.items()):
+        if cmd in ("RAISE", "DOWN") and gate_key.rsplit("/", 1)[0] in runnable:
+            manual_step(ss, gate_key, cmd, dt)
+
+
+def manual_step(ss, gate_key: str, cmd: str, dt: float):
+    gs = ss.gate_state[gate_key]
+    max_m = gs["max_open_m"]
+    cur_m = gs["open_m"]
+
+    delta_m = (GATE_SPEED_M_PER_MIN / 60.0) * dt  # m/min -> m/sec
+    if cmd == "RAISE":
+        new_m = clamp(cur_m + delta_m, 0.0, max_m)
+    else:
+        new_m = clamp(cur_m - delta_m, 0.0, max_m)
+
+    gs["open_m"] = new_m
+
+    # Auto-stop at bounds (practical safeguard)
+    if new_m <= 0.0 and cmd == "DOWN":
+        ss.manual_cmd[gate_key] = "STOP"
+        send_cmd_to_gate(ss, gate_key, "REMOTE MANUAL STOP (Lower limit)")
+        return
+    if new_m >= max_m and cmd == "RAISE":
+        ss.manual_cmd[gate_key] = "STOP"
+        send_cmd_to_gate(ss, gate_key, "REMOTE MANUAL STOP (Upper limit)")
+        return
+
+    # Continuous command runs to the travel limit unless stopped
+    ss.eta.set_moves([gate_key], max_m if cmd == "RAISE" else 0.0, GATE_SPEED_M_PER_MIN / 60.0, "MANUAL")
@@ -0,0 +1,84 @@
+"""Plant constants, unit conversions and the demo asset tree."""
+import os
+
+
+# =========================================================
+# Domain helpers (Gate Control)
+# =========================================================
+GATE_SPEED_M_PER_MIN = 0.3          # spec
+K_TOL_PCT = 5.0                     # spec
+AUTO_FAIL_TIMEOUT_SEC = 60 * 60     # spec: stop after 1 hour if cannot achieve Ktarget
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+
+def clamp(v, lo, hi):
+    return max(lo, min(hi, v))
+
+
+def opening_m_from_pct(open_pct: float, max_open_m: float) -> float:
+    # Full resolution; round only when displaying
+    return max_open_m * (open_pct / 100.0)
+
+
+def opening_pct_from_m(open_m: float, max_open_m: float) -> float:
+    if max_open_m <= 0:
+        return 0.0
+    return clamp(open_m / max_open_m * 100.0, 0.0, 100.0)
+
+
+def gate_open_pct(gs: dict) -> float:
+    return opening_pct_from_m(gs["open_m"], gs["max_open_m"])
+
+
+def compute_h_plan_from_qplan(q_plan: float) -> float:
+    # Dummy mapping (real system uses HQ/coeff tables)
+    return round(1.10 + 0.06 * (q_plan - 10.0), 2)
+
+
+# =========================================================
+# Remote Program: K patterns (A..I) (for PROGRAM mode only)
+# =========================================================
+K_PATTERNS = {
+    "A (100%)": 1.00,
+    "B (90%)": 0.90,
+    "C (80%)": 0.80,
+    "D (70%)": 0.70,
+    "E (60%)": 0.60,
+    "F (50%)": 0.50,
+    "G (40%)": 0.40,
+    "H (30%)": 0.30,
+    "I (0%) Full Close": 0.00,
+}
+
+PROGRAM_MODES = ["K VALUE", "GATE POSITION", "DRIVE TIME"]
+
+
+# =========================================================
+# Demo assets
+# =========================================================
+def build_demo_assets():
+    return {
+        "BBT15": {
+            "BaratMainGateHouse": ["Gate1", "Gate2", "Gate3", "Gate4"],
+            "WastewayGateHouse": ["Gate1", "Gate2", "Gate3"],
+            "CiberangMainGateHouse": ["Gate1", "Gate2"],
+        },
+        "BUT10": {
+            "UtaraMainGateHouse": ["Gate1", "Gate2", "Gate3", "Gate4"],
+            "WaruGateHouse": ["Gate1", "Gate2"],
+        },
+    }
+
+
+ASSETS = build_demo_assets()
+
+# Cross-station canal links: downstream Gate House <- upstream Gate House whose release feeds it
+CANAL_LINKS = {
+    "BUT10/UtaraMainGateHouse": "BBT15/WastewayGateHouse",
+}
+
+
+def gates_of(gh_key: str) -> list[str]:
+    stn, gh = gh_key.split("/", 1)
+    return ASSETS[stn][gh]
@@ -0,0 +1,142 @@
+"""
+Shape-preserving downsampling for the trend charts.
+
+A chart cannot show more points than it has pixel columns. Series are
+reduced to the chart width before they are handed to the browser. Samples
+are bucketed by time, one bucket per two pixel columns, and the minimum and
+maximum sample of each bucket are kept (plus the first and last sample).
+Peaks, dips and steps stay visible, which plain decimation or averaging
+would lose. The reduction is vectorized (one sort, no Python loop per
+sample).
+
+History windows (hours to a week, read from the history segments) are
+cached per (series, window, width). The window end is rounded up to
+TREND_CACHE_QUANTUM_SEC, so reruns within the same quantum reuse the
+reduced series instead of re-reading the segments. When the quantum moves
+on, only the open (current) day is read again. Closed days are kept
+pre-reduced, as the min / max of time buckets half a chart bucket wide,
+until their segment files change (late backfill, compaction).
+"""
+import os
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+
+import numpy as np
+
+from .export import iter_rows
+from .history import segment_day
+
+TREND_CHART_PX = 480           # chart width, normal view (half the page)
+TREND_CHART_LARGE_PX = 720     # chart width, Large view
+TREND_WINDOWS = {              # Large view windows; None = in-memory live trend
+    "Live": None,
+    "1 h": 3600.0,
+    "24 h": 86400.0,
+    "7 d": 7 * 86400.0,
+}
+TREND_CACHE_QUANTUM_SEC = 30.0
+TREND_CACHE_SIZE = 32
+TREND_DAY_CACHE_SIZE = 64      # pre-reduced closed days (series x day x chart resolution)
+
+
+def _bucket_extremes(b: np.ndarray, y: np.ndarray) -> np.ndarray:
+    # Indices of the min and max sample of each bucket (b: bucket number per sample)
+    order = np.lexsort((y, b))
+    sb = b[order]
+    starts = np.flatnonzero(np.r_[True, sb[1:] != sb[:-1]])
+    ends = np.r_[starts[1:], len(sb)] - 1
+    return np.r_[order[starts], order[ends]]
+
+
+def minmax_downsample(t, y, width: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Reduce (t, y) to at most ``width`` points, in time order. Series that
+    already fit are returned unchanged (sorted by time).
+    """
+    t = np.asarray(t, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(t)
+    if n and np.any(t[1:] < t[:-1]):
+        # Backfilled telemetry arrives late: history rows are not in time order
+        order = np.argsort(t, kind="stable")
+        t, y = t[order], y[order]
+    if n <= width or width < 4:
+        return t, y
+
+    buckets = (width - 2) // 2
+    span = t[-1] - t[0]
+    inner_t, inner_y = t[1:-1], y[1:-1]
+    if span > 0:
+        b = ((inner_t - t[0]) * (buckets / span)).astype(np.int64)
+    else:
+        b = np.arange(n - 2) * buckets // (n - 2)
+    np.minimum(b, buckets - 1, out=b)
+
+    # Sorted by bucket, then value: each bucket's run starts at its min and ends at its max
+    idx = np.unique(np.r_[0, _bucket_extremes(b, inner_y) + 1, n - 1])
+    return t[idx], y[idx]
+
+
+def history_series(root: str, key: str, signal: str, t_from: float, t_to: float) -> tuple[np.ndarray, np.ndarray]:
+    t, y = [], []
+    for ts, _, sig, value in iter_rows(root, "trend", t_from, t_to, {key}):
+        if sig == signal:
+            t.append(ts)
+            y.append(value)
+    return np.asarray(t, dtype=float), np.asarray(y, dtype=float)
+
+
+def _day_start(day: date) -> float:
+    return datetime.combine(day, time()).timestamp()
+
+
+def _day_stamp(root: str, day: str) -> tuple:
+    # Changes when a segment of the day is appended to, compacted or removed
+    stamp = []
+    for name in (f"{day}.csv", f"{day}.wmsa"):
+        try:
+            st = os.stat(os.path.join(root, "trend", name))
+        except OSError:
+            continue
+        stamp.append((name, st.st_mtime_ns, st.st_size))
+    return tuple(stamp)
+
+
+@lru_cache(maxsize=TREND_DAY_CACHE_SIZE)
+def _closed_day(root: str, key: str, signal: str, day: date, bucket_sec: float, stamp: tuple):
+    # One whole day reduced to the min / max of each bucket_sec bucket (grid aligned to the epoch)
+    t, y = history_series(root, key, signal, _day_start(day), _day_start(day + timedelta(days=1)))
+    if not len(t):
+        return t, y
+    idx = np.unique(_bucket_extremes((t // bucket_sec).astype(np.int64), y))
+    idx = idx[np.argsort(t[idx], kind="stable")]
+    return t[idx], y[idx]
+
+
+@lru_cache(maxsize=TREND_CACHE_SIZE)
+def _history_window(root: str, key: str, signal: str, t_to: float, window_sec: float, width: int):
+    t_from = t_to - window_sec
+    bucket_sec = window_sec / max((width - 2) // 2, 1) / 2
+    open_day = date.fromisoformat(segment_day(t_to))
+    ts, ys = [], []
+    day = date.fromisoformat(segment_day(t_from))
+    while day < open_day:
+        t, y = _closed_day(root, key, signal, day, bucket_sec, _day_stamp(root, day.isoformat()))
+        keep = t >= t_from
+        ts.append(t[keep])
+        ys.append(y[keep])
+        day += timedelta(days=1)
+    t, y = history_series(root, key, signal, max(t_from, _day_start(open_day)), t_to)
+    ts.append(t)
+    ys.append(y)
+    return minmax_downsample(np.concatenate(ts), np.concatenate(ys), width)
+
+
+def history_trend(root: str, key: str, signal: str, window_sec: float, width: int, now: float) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Downsampled ``signal`` of ``key`` over the last ``window_sec`` of the
+    history segments in ``root``. Cached; the arrays are shared, do not
+    modify them.
+    """
+    t_to = (now // TREND_CACHE_QUANTUM_SEC + 1) * TREND_CACHE_QUANTUM_SEC
+    return _history_window(root, key, signal, t_to, window_sec, width)
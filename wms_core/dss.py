@@ -0,0 +1,179 @@
+"""
+DSS plan ingestion: Qplan / Ktarget per Gate House per period.
+
+The DSS drops plan files into a directory (``<root>/*.csv``):
+
+    gh_key,from,to,q_plan,k_target
+    BBT15/BaratMainGateHouse,2025-01-06T06:00,2025-01-06T18:00,11.5,0.9
+
+``to`` may be empty (open-ended); an empty q_plan or k_target leaves that
+value as it is. A value that is not a finite number in range (q_plan >= 0,
+0 <= k_target <= DSS_K_TARGET_MAX) rejects the row like a parse failure. Files are read incrementally: a poll stats the directory
+and reads only the bytes appended since the last read (whole lines), so a
+DSS that appends to one file and a DSS that writes one file per run both
+work. A file that was replaced or shrank is read again from the start.
+
+Rows are staged until their period starts. For each Gate House the active
+row that arrived last wins. When a period boundary passes or new rows
+arrive, the active plan is diffed against ``gh_state`` and only the changed
+Gate Houses are updated, all in the same tick (one audit entry, one shared
+state transaction). A Gate House whose Ktarget is held by a K VALUE
+program (a timetable, or an operator RUN) keeps it; its Qplan still follows
+the DSS, and the audit entry names the Gate Houses whose Ktarget was kept.
+"""
+import csv
+import math
+import os
+from datetime import datetime
+
+from .domain import DATA_DIR
+from .session import audit
+
+DSS_PLAN_DIR = os.path.join(DATA_DIR, "dss")
+DSS_COLUMNS = ["gh_key", "from", "to", "q_plan", "k_target"]
+DSS_POLL_SEC = 5.0
+DSS_PLAN_FIELDS = ("q_plan", "k_target")
+DSS_K_TARGET_MAX = 1.0   # Ktarget is a share of Qplan (pattern A is 100%)
+
+
+def _ts(s: str, empty: float) -> float:
+    return datetime.fromisoformat(s).timestamp() if s else empty
+
+
+def _value(s: str, hi: float = math.inf) -> float | None:
+    if not s:
+        return None
+    v = float(s)
+    if not (math.isfinite(v) and 0.0 <= v <= hi):
+        raise ValueError(f"out of range: {s}")
+    return v
+
+
+def _k_held(ss, gh_key: str) -> bool:
+    # Ktarget set by a K VALUE program: the operator's RUN or the active timetable entry
+    gh = ss.gh_state[gh_key]
+    if gh["mode"] == "REMOTE PROGRAM" and gh["program_running"] and gh["program_mode"] == "K VALUE":
+        return True
+    return ss.program_active.get(gh_key, {}).get("program_mode") == "K VALUE"
+
+
+class DssIngest:
+    """
+    Staged DSS plan rows per Gate House. ``poll`` is called once per tick;
+    it reads new rows at most every DSS_POLL_SEC and applies the plan when
+    it changed.
+    """
+
+    def __init__(self, root: str = DSS_PLAN_DIR):
+        self.root = root
+        self.rows: dict[str, list[dict]] = {}        # gh_key -> staged rows, arrival order
+        self._files: dict[str, tuple[int, int]] = {}  # file name -> (inode, bytes read)
+        self._last_scan: float | None = None
+        self._next_ts = -math.inf                     # next period boundary; recompute the plan from then on
+        self.rejected = 0
+        self.applied = 0                              # batches applied
+        self.last_batch: dict | None = None
+
+    # --- Reading
+    def scan(self, gh_keys) -> int:
+        # New rows from the plan files; returns how many were staged
+        try:
+            names = sorted(e.name for e in os.scandir(self.root) if e.name.endswith(".csv") and e.is_file())
+        except OSError:
+            return 0
+        staged = 0
+        for name in names:
+            path = os.path.join(self.root, name)
+            st = os.stat(path)
+            ino, offset = self._files.get(name, (st.st_ino, 0))
+            if ino == st.st_ino and st.st_size == offset:
+                continue
+            if ino != st.st_ino or st.st_size < offset:
+                # Rewritten: its earlier rows are replaced by what it holds now
+                for rows in self.rows.values():
+                    rows[:] = [r for r in rows if r["file"] != name]
+                offset = 0
+            size = st.st_size
+            with open(path, "rb") as f:
+                f.seek(offset)
+                data = f.read(size - offset)
+            end = data.rfind(b"\n") + 1  # the DSS may be mid-append: whole lines only
+            if not end:
+                continue
+            self._files[name] = (st.st_ino, offset + end)
+            lines = data[:end].decode("utf-8").splitlines()
+            if offset == 0 and lines and lines[0].startswith("gh_key"):
+                lines = lines[1:]
+            for r in csv.reader(lines):
+                staged += self._stage(name, r, gh_keys)
+        if staged:
+            self._next_ts = -math.inf
+        return staged
+
+    def _stage(self, name: str, r: list[str], gh_keys) -> int:
+        try:
+            rec = dict(zip(DSS_COLUMNS, (x.strip() for x in r), strict=True))
+            row = {
+                "file": name,
+                "from": _ts(rec["from"], -math.inf),
+                "to": _ts(rec["to"], math.inf),
+                "q_plan": _value(rec["q_plan"]),
+                "k_target": _value(rec["k_target"], DSS_K_TARGET_MAX),
+            }
+        except ValueError:
+            self.rejected += 1
+            return 0
+        if rec["gh_key"] not in gh_keys:
+            self.rejected += 1
+            return 0
+        self.rows.setdefault(rec["gh_key"], []).append(row)
+        return 1
+
+    # --- Plan
+    def plan_at(self, t: float) -> dict[str, dict]:
+        # Active row per Gate House (last arrived wins); also finds the next period boundary
+        plan = {}
+        nxt = math.inf
+        for gh_key, rows in self.rows.items():
+            for row in rows:
+                if row["from"] <= t < row["to"]:
+                    plan[gh_key] = row
+                for b in (row["from"], row["to"]):
+                    if t < b < nxt:
+                        nxt = b
+        self._next_ts = nxt
+        return plan
+
+    def poll(self, ss, t: float) -> dict[str, dict]:
+        if self._last_scan is None or t - self._last_scan >= DSS_POLL_SEC:
+            self._last_scan = t
+            self.scan(ss.gh_state)
+        if t < self._next_ts:
+            return {}
+
+        changes = {}
+        kept = []
+        for gh_key, row in self.plan_at(t).items():
+            gh = ss.gh_state[gh_key]
+            held = _k_held(ss, gh_key)
+            ch = {
+                f: row[f]
+                for f in DSS_PLAN_FIELDS
+                if row[f] is not None and not (f == "k_target" and held) and abs(gh[f] - row[f]) > 1e-9
+            }
+            if ch:
+                changes[gh_key] = ch
+                if held and row["k_target"] is not None:
+                    kept.append(gh_key)
+        if not changes:
+            return {}
+        for gh_key, ch in changes.items():
+            ss.gh_state[gh_key].update(ch)
+        self.applied += 1
+        self.last_batch = {"t": t, "gatehouses": len(changes)}
+        shown = ", ".join(sorted(changes)[:3]) + (f" +{len(changes) - 3}" if len(changes) > 3 else "")
+        detail = f"Plan applied to {len(changes)} Gate House(s): {shown}"
+        if kept:
+            detail += f" (Ktarget kept by K VALUE program: {', '.join(sorted(kept))})"
+        audit(ss, "DSS", detail)
+        return changes
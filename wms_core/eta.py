@@ -0,0 +1,139 @@
+"""
+Gate travel ETA: time-to-target for every commanded move, in one numpy pass.
+
+Drivers (Automatic / Program position steps, Remote Manual Raise / Down)
+register the target and travel rate of each gate they move during a tick.
+``compute`` then evaluates all gates at once and reduces them to Gate House
+completion times. Targets are cleared at the start of every tick, so only
+moves that are actually being driven have an ETA.
+
+A move held back by the power budget is registered as queued. Its ETA adds
+the expected wait for a motor grant: queued moves of a Gate House start in
+the sequencer's order (longest way first) as its running motors arrive.
+"""
+import heapq
+from operator import itemgetter
+
+import numpy as np
+
+ETA_TICK_EWMA = 0.2      # smoothing of the observed tick period (position steps are per tick)
+ETA_TICK_MAX_SEC = 10.0  # ignore gaps (paused refresh, idle session) when learning the period
+ETA_EPS_M = 1e-6
+
+_OPEN_M = itemgetter("open_m")
+
+
+class EtaEngine:
+    """
+    Fixed arrays over all gates, grouped by Gate House (keys sort by
+    ``station/gatehouse/gate``, so each Gate House is one contiguous slice).
+    """
+
+    def __init__(self, gate_state: dict):
+        self.keys = sorted(gate_state)
+        self.index = {k: i for i, k in enumerate(self.keys)}
+        n = len(self.keys)
+        gh_of = [k.rsplit("/", 1)[0] for k in self.keys]
+        self.gh_keys = [gh for i, gh in enumerate(gh_of) if i == 0 or gh != gh_of[i - 1]]
+        self.gh_start = np.array([i for i, gh in enumerate(gh_of) if i == 0 or gh != gh_of[i - 1]], dtype=np.intp)
+        self.gh_index = {gh: i for i, gh in enumerate(self.gh_keys)}
+
+        self.max_m = np.array([gate_state[k]["max_open_m"] for k in self.keys], dtype=float)
+        self.target_m = np.full(n, np.nan)
+        self.rate_m_s = np.zeros(n)
+        self.source = np.full(n, "", dtype=object)
+        self.queued = np.zeros(n, dtype=bool)   # waiting for a motor grant (power budget)
+        self.eta_sec = np.full(n, np.nan)
+        self.gh_eta_sec = np.full(len(self.gh_keys), np.nan)
+        self.tick_sec = 1.0
+        self.ts = 0.0
+
+    # --- Per tick
+    def begin_tick(self, dt: float | None):
+        if dt is not None and 0.0 < dt <= ETA_TICK_MAX_SEC:
+            self.tick_sec += ETA_TICK_EWMA * (dt - self.tick_sec)
+        self.target_m.fill(np.nan)
+        self.rate_m_s.fill(0.0)
+        self.source.fill("")
+        self.queued.fill(False)
+
+    def set_moves(self, gate_keys: list[str], target_m, rate_m_s, source: str, queued=False):
+        idx = np.fromiter((self.index[k] for k in gate_keys), dtype=np.intp, count=len(gate_keys))
+        self.target_m[idx] = target_m
+        self.rate_m_s[idx] = rate_m_s
+        self.source[idx] = source
+        self.queued[idx] = queued
+
+    def clear_moves(self, gate_keys: list[str]):
+        idx = np.fromiter((self.index[k] for k in gate_keys), dtype=np.intp, count=len(gate_keys))
+        self.target_m[idx] = np.nan
+        self.rate_m_s[idx] = 0.0
+        self.source[idx] = ""
+        self.queued[idx] = False
+
+    def step_rate(self, step_m):
+        # Position steps move a fixed distance per tick
+        return np.asarray(step_m, dtype=float) / self.tick_sec
+
+    def compute(self, gate_state: dict, now: float):
+        # Only gates driven this tick have a target: read just their positions
+        idx = np.flatnonzero(self.rate_m_s > 0.0)
+        open_m = np.fromiter(map(_OPEN_M, map(gate_state.__getitem__, [self.keys[i] for i in idx])), dtype=float, count=len(idx))
+        remaining = np.abs(self.target_m[idx] - open_m)
+        moving = remaining > ETA_EPS_M  # NaN targets compare False
+        idx, remaining = idx[moving], remaining[moving]
+        self.eta_sec = np.full(len(self.keys), np.nan)
+        self.eta_sec[idx] = remaining / self.rate_m_s[idx]
+        held = self.queued[idx]
+        if held.any():
+            self._queue(idx[~held], idx[held], remaining[held])
+        # Gate House completion = slowest gate; all-NaN slices stay NaN
+        self.gh_eta_sec = np.fmax.reduceat(self.eta_sec, self.gh_start)
+        self.ts = now
+
+    def _queue(self, running: np.ndarray, held: np.ndarray, held_m: np.ndarray):
+        # Each held move starts when the first motor of its Gate House frees up (a lone motor always may start)
+        gh_run = np.searchsorted(self.gh_start, running, side="right") - 1
+        gh_held = np.searchsorted(self.gh_start, held, side="right") - 1
+        for g in np.unique(gh_held):
+            free = sorted(self.eta_sec[running[gh_run == g]].tolist()) or [0.0]
+            mine = gh_held == g
+            for j in held[mine][np.argsort(-held_m[mine], kind="stable")]:
+                self.eta_sec[j] += heapq.heappop(free)
+                heapq.heappush(free, self.eta_sec[j])
+
+    # --- Queries
+    def gatehouse_eta(self, gh_key: str) -> float | None:
+        v = self.gh_eta_sec[self.gh_index[gh_key]]
+        return None if np.isnan(v) else float(v)
+
+    def gate_eta(self, gate_key: str) -> float | None:
+        v = self.eta_sec[self.index[gate_key]]
+        return None if np.isnan(v) else float(v)
+
+    def gate_etas(self, gh_key: str) -> dict:
+        """{ gate name: ETA seconds or None } for one Gate House."""
+        i = self.gh_index[gh_key]
+        lo = self.gh_start[i]
+        hi = self.gh_start[i + 1] if i + 1 < len(self.gh_start) else len(self.keys)
+        return {
+            self.keys[j].rsplit("/", 1)[1]: (None if np.isnan(self.eta_sec[j]) else float(self.eta_sec[j]))
+            for j in range(lo, hi)
+        }
+
+    def moves(self) -> list[dict]:
+        """Moves in progress, soonest first."""
+        idx = np.flatnonzero(~np.isnan(self.eta_sec))
+        idx = idx[np.argsort(self.eta_sec[idx], kind="stable")]
+        return [
+            {
+                "gate_key": self.keys[j],
+                "source": self.source[j],
+                "target_m": float(self.target_m[j]),
+                "target_pct": float(self.target_m[j] / self.max_m[j] * 100.0) if self.max_m[j] > 0 else 0.0,
+                "eta_sec": float(self.eta_sec[j]),
+                "queued": bool(self.queued[j]),
+                "done_ts": self.ts + float(self.eta_sec[j]),
+            }
+            for j in idx
+        ]
@@ -0,0 +1,228 @@
+"""
+Streaming bulk export of the history segments (CSV or Parquet).
+
+Rows flow through generators from the day segments to the output file:
+only the current line (CSV) or one row group of EXPORT_CHUNK_ROWS (Parquet)
+is held in memory, whatever the range. ``ExportJob`` runs an export on a
+background thread, so the HMI tick loop and reruns keep going while a
+large extract is written to EXPORT_DIR. Parquet needs pyarrow (installed
+with Streamlit); CSV has no dependencies.
+
+CLI:
+    python -m wms_core.export trend 2025-01-01T00:00 2025-02-01T00:00 out.parquet
+"""
+import csv
+import math
+import os
+import threading
+import uuid
+from datetime import datetime
+from itertools import islice
+
+from .archive import ARCHIVE_EXT, iter_archive
+from .domain import DATA_DIR
+from .history import HISTORY_COLUMNS, HISTORY_DIR, segment_day
+
+EXPORT_DIR = os.path.join(DATA_DIR, "exports")
+EXPORT_FORMATS = ["CSV", "Parquet"]
+EXPORT_CHUNK_ROWS = 65536       # Parquet row group / progress granularity
+EXPORT_DOWNLOAD_MAX_MB = 200    # larger files are left on disk for pickup instead of a browser download
+
+
+# =========================================================
+# Reading
+# =========================================================
+def _whole_lines(f):
+    # The writer may be mid-append: an unterminated last line is not a row yet
+    for line in f:
+        if not line.endswith("\n"):
+            return
+        yield line
+
+
+def iter_rows(root: str, kind: str, t_from: float, t_to: float, keys: set[str] | None = None):
+    """
+    Rows of ``kind`` with t_from <= ts < t_to, as lists in HISTORY_COLUMNS
+    order (ts as float). Segments are read in day order; within a segment
+    rows are in arrival order (backfilled telemetry arrives late). An
+    archived trend day yields its archive (time order), then any CSV rows
+    that arrived after it was compacted. ``keys`` limits trend rows to
+    those Gate House / gate keys.
+    """
+    d = os.path.join(root, kind)
+    if not os.path.isdir(d):
+        return
+    first, last = segment_day(t_from), segment_day(math.nextafter(t_to, -math.inf))  # t_to is exclusive
+    for day, ext in sorted((os.path.splitext(n) for n in os.listdir(d)), key=lambda p: (p[0], p[1] != ARCHIVE_EXT)):
+        name = day + ext
+        if day < first or day > last:
+            continue
+        if ext == ARCHIVE_EXT:
+            yield from iter_archive(os.path.join(d, name), t_from, t_to, keys)
+            continue
+        if ext != ".csv":
+            continue
+        with open(os.path.join(d, name), "r", encoding="utf-8", newline="") as f:
+            reader = csv.reader(_whole_lines(f))
+            next(reader, None)  # header
+            for r in reader:
+                ts = float(r[0])
+                if ts < t_from or ts >= t_to:
+                    continue
+                if keys is not None and kind == "trend" and r[1] not in keys:
+                    continue
+                r[0] = ts
+                if kind == "trend":
+                    r[3] = float(r[3])
+                yield r
+
+
+def export_columns(kind: str) -> list[str]:
+    return ["time"] + HISTORY_COLUMNS[kind]
+
+
+def _with_time(rows):
+    for r in rows:
+        yield [datetime.fromtimestamp(r[0]).astimezone().isoformat(timespec="milliseconds")] + r
+
+
+# =========================================================
+# Writers
+# =========================================================
+def write_csv(rows, path: str, kind: str, progress=None) -> int:
+    n = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f, lineterminator="\n")
+        w.writerow(export_columns(kind))
+        for r in _with_time(rows):
+            w.writerow(r)
+            n += 1
+            if progress is not None and n % EXPORT_CHUNK_ROWS == 0:
+                progress(n)
+    return n
+
+
+def _parquet_schema(kind: str):
+    import pyarrow as pa
+
+    fields = [pa.field("time", pa.timestamp("ms", tz="UTC")), pa.field("ts", pa.float64())]
+    for c in HISTORY_COLUMNS[kind][1:]:
+        fields.append(pa.field(c, pa.float64() if c == "value" else pa.string()))
+    return pa.schema(fields)
+
+
+def write_parquet(rows, path: str, kind: str, progress=None) -> int:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("Parquet export needs pyarrow; export as CSV instead") from e
+
+    schema = _parquet_schema(kind)
+    cols = HISTORY_COLUMNS[kind]
+    n = 0
+    rows = iter(rows)
+    with pq.ParquetWriter(path, schema) as writer:
+        while True:
+            chunk = list(islice(rows, EXPORT_CHUNK_ROWS))
+            if not chunk:
+                break
+            data = {"time": [int(r[0] * 1000) for r in chunk]}
+            for i, c in enumerate(cols):
+                data[c] = [r[i] for r in chunk]
+            writer.write_table(pa.Table.from_pydict(data, schema=schema))
+            n += len(chunk)
+            if progress is not None:
+                progress(n)
+    return n
+
+
+def export_history(root: str, kind: str, fmt: str, t_from: float, t_to: float, path: str, keys=None, progress=None) -> int:
+    rows = iter_rows(root, kind, t_from, t_to, keys)
+    write = write_parquet if fmt == "Parquet" else write_csv
+    return write(rows, path, kind, progress)
+
+
+# =========================================================
+# Background job
+# =========================================================
+class ExportJob:
+    """
+    One export on a daemon thread. The job only touches the segment files
+    and its output file, never session state, so it is safe to poll from
+    reruns while it runs. The output is written to ``<path>.part`` and
+    renamed when complete.
+    """
+
+    def __init__(self, root: str, kind: str, fmt: str, t_from: float, t_to: float, keys=None, out_dir: str = EXPORT_DIR):
+        ext = "parquet" if fmt == "Parquet" else "csv"
+        stamp = f"{datetime.fromtimestamp(t_from):%Y%m%d-%H%M}_{datetime.fromtimestamp(t_to):%Y%m%d-%H%M}"
+        self.file_name = f"{kind}_{stamp}_{uuid.uuid4().hex[:6]}.{ext}"
+        self.path = os.path.join(out_dir, self.file_name)
+        self.kind, self.fmt = kind, fmt
+        self.rows = 0
+        self.done = False
+        self.error: str | None = None
+        self._args = (root, kind, fmt, t_from, t_to)
+        self._keys = keys
+        self._thread = threading.Thread(target=self._run, name=f"export-{kind}", daemon=True)
+
+    def start(self) -> "ExportJob":
+        self._thread.start()
+        return self
+
+    def _progress(self, n: int):
+        self.rows = n
+
+    def _run(self):
+        part = self.path + ".part"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.rows = export_history(*self._args, part, keys=self._keys, progress=self._progress)
+            os.replace(part, self.path)
+        except Exception as e:  # surfaced in the HMI, never raised into the tick loop
+            self.error = f"{type(e).__name__}: {e}"
+            if os.path.exists(part):
+                os.remove(part)
+        finally:
+            self.done = True
+
+    @property
+    def size_mb(self) -> float:
+        return os.path.getsize(self.path) / 1e6 if self.done and self.error is None else 0.0
+
+    @property
+    def downloadable(self) -> bool:
+        return self.done and self.error is None and self.size_mb <= EXPORT_DOWNLOAD_MAX_MB
+
+
+# =========================================================
+# CLI
+# =========================================================
+def main(argv=None):
+    import argparse
+
+    p = argparse.ArgumentParser(prog="python -m wms_core.export", description=__doc__.split("\n")[1])
+    p.add_argument("kind", choices=list(HISTORY_COLUMNS))
+    p.add_argument("start", help="ISO time, inclusive")
+    p.add_argument("end", help="ISO time, exclusive")
+    p.add_argument("out", help="output file (.csv or .parquet)")
+    p.add_argument("--root", default=HISTORY_DIR, help=f"plant history directory (default: {HISTORY_DIR})")
+    p.add_argument("--key", action="append", help="limit trend rows to this Gate House / gate key (repeatable)")
+    a = p.parse_args(argv)
+
+    fmt = "Parquet" if a.out.endswith(".parquet") else "CSV"
+    n = export_history(
+        a.root,
+        a.kind,
+        fmt,
+        datetime.fromisoformat(a.start).timestamp(),
+        datetime.fromisoformat(a.end).timestamp(),
+        a.out,
+        keys=set(a.key) if a.key else None,
+    )
+    print(f"{n} rows -> {a.out}")
+
+
+if __name__ == "__main__":
+    main()
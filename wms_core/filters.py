@@ -0,0 +1,101 @@
+"""
+Signal conditioning for Kact.
+
+The reported Qact carries process and meter noise, so the raw Kact
+(Qact / Qplan) jitters across the ±K_TOL_PCT band. Control and band checks
+use a filtered Kact instead, from a configurable chain of filters, applied
+in order:
+
+- HOLD: hold-last-good. A sample taken while the Q/H data is suspect (or
+  not finite) is replaced by the last good value, for at most
+  KACT_HOLD_MAX_SEC.
+- MEDIAN: windowed median of the last KACT_MEDIAN_WINDOW samples (drops
+  single spikes).
+- EWMA: exponentially weighted moving average with KACT_EWMA_ALPHA.
+
+Every filter is updated once per sample, with a constant amount of work
+(the median window is fixed and small). The raw Kact stays in
+``gh["k_act_raw"]`` and in the history, for audit.
+"""
+import bisect
+import math
+from collections import deque
+
+KACT_FILTERS = ("HOLD", "MEDIAN", "EWMA")
+KACT_FILTER_CHAIN = ("HOLD", "MEDIAN", "EWMA")   # () = raw Kact
+KACT_EWMA_ALPHA = 0.25
+KACT_MEDIAN_WINDOW = 5
+KACT_HOLD_MAX_SEC = 60.0
+
+
+class Ewma:
+    def __init__(self, alpha: float = KACT_EWMA_ALPHA):
+        self.alpha = alpha
+        self.value: float | None = None
+
+    def update(self, x: float, good: bool, t: float) -> float:
+        self.value = x if self.value is None else self.value + self.alpha * (x - self.value)
+        return self.value
+
+
+class RollingMedian:
+    def __init__(self, window: int = KACT_MEDIAN_WINDOW):
+        self.window = window
+        self._fifo: deque[float] = deque()
+        self._sorted: list[float] = []
+
+    def update(self, x: float, good: bool, t: float) -> float:
+        self._fifo.append(x)
+        bisect.insort(self._sorted, x)
+        if len(self._fifo) > self.window:
+            del self._sorted[bisect.bisect_left(self._sorted, self._fifo.popleft())]
+        n = len(self._sorted)
+        return self._sorted[n // 2] if n % 2 else (self._sorted[n // 2 - 1] + self._sorted[n // 2]) / 2.0
+
+
+class HoldLastGood:
+    def __init__(self, max_sec: float = KACT_HOLD_MAX_SEC):
+        self.max_sec = max_sec
+        self.value: float | None = None
+        self.ts: float | None = None
+
+    def update(self, x: float, good: bool, t: float) -> float:
+        if good and math.isfinite(x):
+            self.value, self.ts = x, t
+            return x
+        if self.value is not None and t - self.ts <= self.max_sec:
+            return self.value
+        return x  # nothing recent to hold: pass the sample through
+
+
+_FILTER_TYPES = {"HOLD": HoldLastGood, "MEDIAN": RollingMedian, "EWMA": Ewma}
+
+
+class KactConditioner:
+    """
+    One filter chain per Gate House. ``update`` takes the raw Kact of a
+    tick and whether the Q/H data behind it is plausible, and returns the
+    filtered Kact.
+    """
+
+    def __init__(self, chain=KACT_FILTER_CHAIN):
+        unknown = [f for f in chain if f not in _FILTER_TYPES]
+        if unknown:
+            raise ValueError(f"unknown Kact filter(s): {', '.join(unknown)} (choose from {', '.join(KACT_FILTERS)})")
+        self.chain = tuple(chain)
+        self._filters: dict[str, list] = {}
+
+    def update(self, gh_key: str, k_raw: float, good: bool, t: float) -> float:
+        filters = self._filters.get(gh_key)
+        if filters is None:
+            filters = self._filters[gh_key] = [_FILTER_TYPES[f]() for f in self.chain]
+        k = k_raw
+        for f in filters:
+            k = f.update(k, good, t)
+        return k
+
+    def reset(self, gh_key: str | None = None):
+        if gh_key is None:
+            self._filters.clear()
+        else:
+            self._filters.pop(gh_key, None)
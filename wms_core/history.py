@@ -0,0 +1,131 @@
+"""
+Append-only history of trends and logs for bulk export.
+
+The in-memory trends (TREND_LEN points) and the audit tail only cover
+what the HMI shows. Every reported sample and log entry is also appended
+to day-partitioned CSV segments (``<root>/<kind>/<YYYY-MM-DD>.csv``).
+Rows are buffered during a tick and written in one append per segment at
+the end of it. Segments are never rewritten, so exports can read them
+while the tick loop keeps appending. Closed trend days can be compacted
+into the cold-tier archive (archive.py). With ``root=None`` nothing is
+kept (headless runs, what-if forks).
+
+The history is the plant's, not a console's: every console reads the same
+root, and only the one that runs the plant writes it. A store writes while
+it holds the advisory lock of its root, taken on the first flush and
+retried on every later one, so a console that becomes the tick owner
+starts writing when the previous owner exits or hands over (``release``).
+"""
+import csv
+import os
+from datetime import datetime
+
+from .domain import DATA_DIR
+from .rbe import DeadbandFilter
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory lock, every console writes
+    fcntl = None
+
+HISTORY_DIR = os.path.join(DATA_DIR, "history")
+HISTORY_COLUMNS = {
+    "trend": ["ts", "key", "signal", "value"],
+    "audit": ["ts", "user", "role", "event", "detail"],
+    "login": ["ts", "user", "role", "event", "reason"],
+}
+# Sampled signals (q_act / h_act are recorded as reported through the comm layer)
+HISTORY_DEADBANDS = {
+    "open_pct": {"abs": 0.5, "pct": 0.0},   # % opening, every gate
+    "k_act": {"abs": 0.002, "pct": 0.0},    # every Gate House
+}
+
+
+def segment_day(ts: float) -> str:
+    return datetime.fromtimestamp(ts).date().isoformat()
+
+
+class HistoryStore:
+    """
+    Buffered writer for the history segments.
+
+    ``record`` only buffers; ``flush`` appends the buffered rows, one open
+    per segment touched.
+    """
+
+    def __init__(self, root: str | None = None):
+        self.root = root
+        self.rows_written = 0
+        self.filter = DeadbandFilter(HISTORY_DEADBANDS)
+        self._buf: dict[tuple[str, str], list[list]] = {}   # (kind, day) -> rows
+        self._lock_f = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.root is not None
+
+    def segment_path(self, kind: str, day: str) -> str:
+        return os.path.join(self.root, kind, f"{day}.csv")
+
+    def record(self, kind: str, ts: float, *values):
+        if self.root is None:
+            return
+        self._buf.setdefault((kind, segment_day(ts)), []).append([repr(float(ts)), *values])
+
+    def record_trend(self, key: str, signal: str, value: float, ts: float):
+        self.record("trend", ts, key, signal, value)
+
+    def sample(self, key: str, signal: str, value: float, ts: float):
+        # Deadband + integrity refresh, like the HMI telemetry path
+        if self.root is not None and self.filter.check(f"{key}/{signal}", signal, value, ts):
+            self.record_trend(key, signal, value, ts)
+
+    @property
+    def writer(self) -> bool:
+        return self._lock_f is not None or (fcntl is None and self.root is not None)
+
+    def _own(self) -> bool:
+        if self.writer:
+            return True
+        os.makedirs(self.root, exist_ok=True)
+        f = open(os.path.join(self.root, "LOCK"), "a")
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self._lock_f = f
+        return True
+
+    def release(self):
+        # Not the tick owner (any more): drop the buffer and let the owner take the lock
+        self._buf.clear()
+        if self._lock_f is not None:
+            self._lock_f.close()
+            self._lock_f = None
+
+    def flush(self):
+        if not self._buf:
+            return
+        buf, self._buf = self._buf, {}
+        if not self._own():
+            return  # another console writes this plant's history
+        for (kind, day), rows in buf.items():
+            path = self.segment_path(kind, day)
+            new = not os.path.exists(path)
+            if new:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "a", encoding="utf-8", newline="") as f:
+                w = csv.writer(f, lineterminator="\n")
+                if new:
+                    w.writerow(HISTORY_COLUMNS[kind])
+                w.writerows(rows)
+            self.rows_written += len(rows)
+
+    def days(self, kind: str) -> list[str]:
+        if self.root is None:
+            return []
+        d = os.path.join(self.root, kind)
+        if not os.path.isdir(d):
+            return []
+        return sorted(f[:-4] for f in os.listdir(d) if f.endswith(".csv"))
@@ -0,0 +1,81 @@
+"""Interlock engine: per-Gate House permission matrix with reason codes."""
+from .session import current_gh_key
+
+
+PROT_FLAGS = ["ELR", "Overload", "Over Torque Open", "Over Torque Close", "Control De-Energize"]
+
+
+def prot_reason_code(flag: str) -> str:
+    return "PROT_" + flag.upper().replace(" ", "_").replace("-", "_")
+
+
+class InterlockEngine:
+    """
+    Interlock matrix: gh_key -> tuple of machine-readable reason codes
+    (empty tuple = commands permitted).
+
+    Console-wide inputs (generator, remote enable, auth) are compared as one
+    small tuple; per-Gate House protection flags are pushed in through
+    set_protection(). Only what changed is re-evaluated, so lookups are O(1).
+    The Gate House's own control mode (Local) is checked per lookup.
+    """
+
+    def __init__(self, prot: dict[str, dict[str, bool]]):
+        self.prot = prot  # { gh_key: { flag: bool } }, owned by session state
+        self._global_inputs = None
+        self._global_reasons: tuple[str, ...] = ()
+        self._matrix: dict[str, tuple[str, ...]] = {}
+        self._dirty: set[str] = set(prot.keys())
+
+    def set_protection(self, gh_key: str, flag: str, value: bool) -> bool:
+        if self.prot[gh_key][flag] == value:
+            return False
+        self.prot[gh_key][flag] = value
+        self._dirty.add(gh_key)
+        return True
+
+    def refresh(self, global_inputs: tuple):
+        if global_inputs != self._global_inputs:
+            self._global_inputs = global_inputs
+            self._global_reasons = self._eval_global(*global_inputs)
+            self._dirty.update(self.prot.keys())
+        for gh_key in self._dirty:
+            flags = self.prot[gh_key]
+            self._matrix[gh_key] = self._global_reasons + tuple(prot_reason_code(f) for f, on in flags.items() if on)
+        self._dirty.clear()
+
+    @staticmethod
+    def _eval_global(gen_state: str, remote_enabled: bool, logged_in: bool, role: str) -> tuple[str, ...]:
+        reasons = []
+        if gen_state == "ERROR":
+            reasons.append("GEN_ERROR")
+        if not remote_enabled:
+            reasons.append("REMOTE_DISABLED")
+        if not logged_in:
+            reasons.append("NOT_LOGGED_IN")
+        elif role == "Viewer":
+            reasons.append("VIEWER_ROLE")
+        return tuple(reasons)
+
+    def reasons(self, gh_key: str) -> tuple[str, ...]:
+        return self._matrix.get(gh_key, ())
+
+    def any_protection(self, gh_key: str) -> bool:
+        return any(self.prot[gh_key].values())
+
+
+def interlock_reasons(ss, gh_key: str | None = None) -> tuple[str, ...]:
+    gh_key = gh_key or current_gh_key(ss)
+    ss.interlock.refresh((ss.gen_state, ss.remote_enabled, ss.auth["logged_in"], ss.auth["role"]))
+    reasons = ss.interlock.reasons(gh_key)
+    if ss.gh_state[gh_key]["mode"] == "LOCAL (LCP ACTIVE)":
+        return ("LOCAL_MODE",) + reasons
+    return reasons
+
+
+def blocked(ss, gh_key: str | None = None) -> bool:
+    return bool(interlock_reasons(ss, gh_key))
+
+
+def protection_active(ss, gh_key: str | None = None) -> bool:
+    return ss.interlock.any_protection(gh_key or current_gh_key(ss))
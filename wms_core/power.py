@@ -0,0 +1,104 @@
+"""
+Power-budget-aware gate motion sequencing.
+
+On commercial power every gate of a Gate House may move at once. On
+generator supply the Gate House has a power budget (GEN_BUDGET_KW, with
+per Gate House overrides in GATEHOUSE_GEN_BUDGET_KW). A starting motor
+draws GATE_MOTOR_START_FACTOR times its running power in the tick it
+starts, so the sequencer starts at most POWER_STARTS_PER_TICK motors per
+tick and only while the budget holds. A running motor keeps its grant until
+its gate arrives. Waiting moves start in order of priority: the K error of
+their Gate House first, then the position error of the gate.
+
+A change of power source drops every running grant (the transfer stops the
+motors) and re-plans under the new budget. On generator supply, DRIVE TIME
+steps become position targets that the sequencer drives over the next
+ticks, instead of one jump of every gate.
+"""
+from .session import audit
+
+GATE_MOTOR_KW = 5.5
+GATE_MOTOR_START_FACTOR = 2.5      # inrush during the start tick
+GEN_BUDGET_KW = 20.0               # default Gate House budget on generator supply
+GATEHOUSE_GEN_BUDGET_KW = {        # smaller generator sets
+    "BBT15/CiberangMainGateHouse": 15.0,
+    "BUT10/WaruGateHouse": 15.0,
+}
+POWER_STARTS_PER_TICK = 1
+
+
+def power_source(ss) -> str:
+    return "COMMERCIAL" if ss.commercial_power else "GENERATOR"
+
+
+def power_budget_kw(ss, gh_key: str) -> float | None:
+    # None = no limit
+    if power_source(ss) == "COMMERCIAL":
+        return None
+    return GATEHOUSE_GEN_BUDGET_KW.get(gh_key, GEN_BUDGET_KW)
+
+
+class MotionSequencer:
+    """
+    Per Gate House motor grants. ``grant`` is asked once per tick and Gate
+    House with the gates that want to move and their priority, and returns
+    the ones allowed to move this tick. ``end_tick`` drops the grants of
+    Gate Houses that did not ask in the tick (arrived, stopped or blocked).
+    ``drives`` holds the DRIVE TIME targets still to be reached on generator
+    supply.
+    """
+
+    def __init__(self):
+        self.running: dict[str, set[str]] = {}     # gh_key -> gate keys with a running motor
+        self.source: dict[str, str] = {}           # gh_key -> power source of the current plan
+        self.load_kw: dict[str, float] = {}        # gh_key -> load of the last granted tick
+        self.waiting: dict[str, int] = {}          # gh_key -> moves held back in the last granted tick
+        self.drives: dict[str, float] = {}         # gate_key -> DRIVE TIME target (m)
+        self.replans = 0
+        self._asked: set[str] = set()              # Gate Houses that asked for grants this tick
+
+    def grant(self, ss, gh_key: str, wants: dict[str, tuple]) -> set[str]:
+        self._asked.add(gh_key)
+        if not wants:
+            self.release(gh_key)
+            return set()
+        budget = power_budget_kw(ss, gh_key)
+        source = power_source(ss)
+        if self.source.get(gh_key, source) != source:
+            # Transfer: the motors stop, every move restarts under the new budget
+            if self.running.pop(gh_key, None):
+                self.replans += 1
+                audit(ss, "POWER", f"{gh_key} :: motion re-planned on {source.lower()} supply")
+        self.source[gh_key] = source
+        self.waiting[gh_key] = 0
+        if budget is None:
+            self.running[gh_key] = set(wants)
+            self.load_kw[gh_key] = len(wants) * GATE_MOTOR_KW
+            return set(wants)
+
+        running = self.running.get(gh_key, set()) & wants.keys()
+        load = len(running) * GATE_MOTOR_KW
+        starts = 0
+        for k in sorted(wants.keys() - running, key=lambda k: wants[k], reverse=True):
+            if starts >= POWER_STARTS_PER_TICK:
+                break
+            start_kw = GATE_MOTOR_KW * GATE_MOTOR_START_FACTOR
+            if load + start_kw > budget and (running or starts):
+                break  # the next start would trip the set; a lone motor always may start
+            running.add(k)
+            load += start_kw
+            starts += 1
+        self.running[gh_key] = running
+        self.load_kw[gh_key] = load
+        self.waiting[gh_key] = len(wants) - len(running)
+        return running
+
+    def release(self, gh_key: str):
+        # The Gate House has nothing to move: its motors stop
+        for d in (self.running, self.source, self.load_kw, self.waiting):
+            d.pop(gh_key, None)
+
+    def end_tick(self):
+        for gh_key in (self.running.keys() | self.waiting.keys()) - self._asked:
+            self.release(gh_key)
+        self._asked.clear()
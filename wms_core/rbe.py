@@ -0,0 +1,67 @@
+"""Report-by-exception: per-signal deadband change detection."""
+import heapq
+import time
+
+
+# Per-signal deadbands: a new value is forwarded when it moves by more than
+# max(abs, pct% of the last reported value) from the last reported value.
+DEADBANDS = {
+    "q_act": {"abs": 0.02, "pct": 0.5},     # m³/s
+    "h_act": {"abs": 0.01, "pct": 0.5},     # m
+    "open_pct": {"abs": 0.5, "pct": 0.0},   # % opening
+}
+INTEGRITY_REFRESH_SEC = 60.0   # forward unchanged values at least this often
+TREND_LEN = 120
+
+
+class DeadbandFilter:
+    """Change detection between telemetry and trend store / alarms / UI."""
+
+    def __init__(self, deadbands: dict | None = None, integrity_sec: float = INTEGRITY_REFRESH_SEC):
+        self.deadbands = dict(DEADBANDS if deadbands is None else deadbands)
+        self.integrity_sec = integrity_sec
+        self._last: dict[str, tuple[float, float]] = {}  # point -> (reported value, reported ts)
+        self.forwarded = 0
+        self.suppressed = 0
+        self._ui_dirty = False
+
+    def check(self, point: str, signal: str, value: float, now: float | None = None) -> bool:
+        now = time.time() if now is None else now
+        last = self._last.get(point)
+        if last is not None:
+            db = self.deadbands.get(signal, {"abs": 0.0, "pct": 0.0})
+            band = max(db["abs"], abs(last[0]) * db["pct"] / 100.0)
+            if abs(value - last[0]) <= band and now - last[1] < self.integrity_sec:
+                self.suppressed += 1
+                return False
+        self._last[point] = (value, now)
+        self.forwarded += 1
+        self._ui_dirty = True
+        return True
+
+    def mark_ui_dirty(self):
+        self._ui_dirty = True
+
+    def take_ui_dirty(self) -> bool:
+        dirty, self._ui_dirty = self._ui_dirty, False
+        return dirty
+
+
+def append_trend(values: list, times: list, value: float, ts: float):
+    values.append(value)
+    times.append(ts)
+    if len(values) > TREND_LEN:
+        del values[: len(values) - TREND_LEN]
+        del times[: len(times) - TREND_LEN]
+
+
+def backfill_trend(values: list, times: list, points: list[tuple[float, float]]):
+    # Merge late (ts, value) points in time order; a timestamp already present is kept once
+    merged = []
+    for ts, v in heapq.merge(zip(times, values), sorted(points)):
+        if merged and merged[-1][0] == ts:
+            continue
+        merged.append((ts, v))
+    merged = merged[-TREND_LEN:]
+    times[:] = [ts for ts, _ in merged]
+    values[:] = [v for _, v in merged]
@@ -0,0 +1,286 @@
+"""HTML/SVG rendering helpers (pure string builders)."""
+from functools import lru_cache
+
+from .domain import K_TOL_PCT, opening_pct_from_m
+
+
+def pct_delta(base: float, value: float) -> float:
+    if base == 0:
+        return 0.0
+    return (value - base) / base * 100.0
+
+
+def format_eta(sec: float | None) -> str:
+    if sec is None:
+        return "—"
+    sec = int(round(sec))
+    if sec < 60:
+        return f"{sec}s"
+    return f"{sec // 60}m {sec % 60:02d}s"
+
+
+def dev_badge(abs_pct: float) -> str:
+    if abs_pct <= 2.0:
+        return "hmi-ok"
+    if abs_pct <= 5.0:
+        return "hmi-warn"
+    return "hmi-bad"
+
+
+# =========================================================
+# Card HTML
+# =========================================================
+# Builders are memoized: a row / pill whose content did not change between
+# reruns returns the identical string instead of being formatted again.
+HTML_CACHE_SIZE = 1024
+
+
+@lru_cache(maxsize=HTML_CACHE_SIZE)
+def card_header_html(title: str, subtitle: str | None, icon: str) -> str:
+    sub = f"\n  <div class='hmi-sub'>{subtitle}</div>" if subtitle else ""
+    return f"""<div class="hmi-card">
+  <div class="hmi-title">{icon} {title}</div>{sub}
+</div>"""
+
+
+@lru_cache(maxsize=HTML_CACHE_SIZE)
+def pill_html(label: str, klass: str = "hmi-pill") -> str:
+    return f"<span class='{klass}'>{label}</span>"
+
+
+@lru_cache(maxsize=HTML_CACHE_SIZE)
+def row_html(key: str, val: str, badge_text: str | None = None, badge_class: str = "hmi-ok") -> str:
+    b = f"<span class='hmi-pill {badge_class}' style='margin-left:10px;'>{badge_text}</span>" if badge_text else ""
+    return f"""<div class="hmi-row">
+  <div class="k">{key}</div>
+  <div class="v">{val}{b}</div>
+</div>"""
+
+
+@lru_cache(maxsize=HTML_CACHE_SIZE)
+def bar_html(percent: int) -> str:
+    p = max(0, min(100, int(percent)))
+    return f"<div class='bar-wrap'><div class='bar-fill' style='width:{p}%;'></div></div>"
+
+
+def diverging_bar_html(dev_pct: float, scale_pct: float = 10.0) -> str:
+    d = max(-scale_pct, min(scale_pct, dev_pct))
+    # 0.1% of the half width is below one pixel; rounding lets the cache hit
+    return _diverging_bar_html(round(abs(d) / scale_pct * 50.0, 1), d >= 0, scale_pct)
+
+
+@lru_cache(maxsize=HTML_CACHE_SIZE)
+def _diverging_bar_html(half: float, positive: bool, scale_pct: float) -> str:
+    return f"""<div class="div-wrap">
+  <div class="div-center"></div>
+  <div class="div-fill-{'pos' if positive else 'neg'}" style='width:{half}%;'></div>
+</div>
+<div class="div-scale">
+  <div>-{scale_pct:.0f}%</div>
+  <div>0%</div>
+  <div>+{scale_pct:.0f}%</div>
+</div>"""
+
+
+@lru_cache(maxsize=HTML_CACHE_SIZE)
+def cctv_html(title: str) -> str:
+    return f"""<div style="height:220px;border-radius:14px;border:1px solid #223049;background:#050a14;
+display:flex;align-items:center;justify-content:center;">
+  <div style="text-align:center;color:#94a3b8;">
+    <div style="font-weight:900;margin-bottom:6px;">{title}</div>
+    <div style="font-size:12px;">(Video placeholder)</div>
+  </div>
+</div>"""
+
+
+def cctv_stream_html(title: str, url: str) -> str:
+    # Live MJPEG from the CCTV proxy; the browser holds one connection per open panel
+    return f"""<div style="border-radius:14px;border:1px solid #223049;background:#050a14;overflow:hidden;">
+  <img src="{url}" alt="{title}" style="width:100%;height:220px;object-fit:contain;display:block;">
+</div>"""
+
+
+# =========================================================
+# SVG
+# =========================================================
+def svg_document_html(svg: str) -> str:
+    # Standalone page for components.html: the SVG fills the iframe
+    return f"""
+<!doctype html>
+<html>
+<head>
+  <meta charset="utf-8" />
+  <style>
+    html, body {{
+      margin: 0;
+      padding: 0;
+      background: transparent;
+      overflow: hidden;
+      height: 100%;
+      width: 100%;
+    }}
+    svg {{
+      display: block;
+      width: 100%;
+      height: 100%;
+    }}
+  </style>
+</head>
+<body>
+  {svg}
+</body>
+</html>
+"""
+
+
+def overview_building_svg(
+    station: str,
+    gatehouse: str,
+    gates: list[str],
+    gate_states: dict,
+    selected_gate: str,
+    alarm_active: bool,
+    mode_text: str,
+    k_target: float,
+    k_act: float,
+    gate_etas: dict | None = None,
+    gh_eta: float | None = None,
+):
+    gate_etas = gate_etas or {}
+    n = max(1, len(gates))
+    W, H = 1100, 460
+    margin = 60
+    bay_gap = 14
+    bay_w = (W - 2 * margin - (n - 1) * bay_gap) / n
+    bay_h = 200
+    bay_y = 175
+
+    stroke = "#223049"
+    card = "#0b1220"
+    panel = "#0a1020"
+    water1 = "#0ea5e9"
+    water2 = "#2563eb"
+    txt = "#e5e7eb"
+    sub = "#94a3b8"
+    bad = "#fb7185"
+    ok = "#34d399"
+
+    alarm_color = bad if alarm_active else ok
+
+    dev_pct = (k_target - k_act) * 100.0
+    k_status = "OK" if abs(dev_pct) <= K_TOL_PCT else "OUT"
+    k_color = ok if k_status == "OK" else bad
+
+    svg_parts = []
+    svg_parts.append(
+        f"""
+<svg width="100%" height="100%" viewBox="0 0 {W} {H}" preserveAspectRatio="xMidYMid meet"
+     xmlns="http://www.w3.org/2000/svg">
+  <defs>
+    <linearGradient id="bggrad" x1="0" y1="0" x2="0" y2="1">
+      <stop offset="0" stop-color="#0b1220" stop-opacity="1"/>
+      <stop offset="1" stop-color="#070b14" stop-opacity="1"/>
+    </linearGradient>
+    <linearGradient id="water" x1="0" y1="0" x2="0" y2="1">
+      <stop offset="0" stop-color="{water1}" stop-opacity="0.95"/>
+      <stop offset="1" stop-color="{water2}" stop-opacity="0.75"/>
+    </linearGradient>
+    <filter id="shadow" x="-20%" y="-20%" width="140%" height="140%">
+      <feDropShadow dx="0" dy="8" stdDeviation="10" flood-color="#000" flood-opacity="0.35"/>
+    </filter>
+  </defs>
+
+  <rect x="0" y="0" width="{W}" height="{H}" rx="22" fill="url(#bggrad)" stroke="none"/>
+
+  <text x="{margin}" y="46" fill="{txt}" font-size="18" font-weight="900">{station}  —  {gatehouse}</text>
+  <text x="{margin}" y="70" fill="{sub}" font-size="12" font-weight="800">MODE (Gate House): {mode_text}</text>
+
+  <circle cx="{W-margin-18}" cy="40" r="7" fill="{alarm_color}" opacity="0.9"/>
+  <text x="{W-margin-30}" y="59" fill="{sub}" font-size="11" font-weight="800" text-anchor="end">
+    {'ALARM' if alarm_active else 'NORMAL'}
+  </text>
+
+  <rect x="{margin}" y="95" width="{W-2*margin}" height="58" rx="14" fill="#0f172a" stroke="{stroke}" opacity="0.95"/>
+  <text x="{margin+18}" y="122" fill="{sub}" font-size="12" font-weight="900">Ktarget</text>
+  <text x="{margin+18}" y="145" fill="{txt}" font-size="16" font-weight="900">{k_target:.2f}</text>
+
+  <text x="{margin+200}" y="122" fill="{sub}" font-size="12" font-weight="900">Kact</text>
+  <text x="{margin+200}" y="145" fill="{txt}" font-size="16" font-weight="900">{k_act:.2f}</text>
+
+  <text x="{margin+360}" y="122" fill="{sub}" font-size="12" font-weight="900">ΔK</text>
+  <text x="{margin+360}" y="145" fill="{txt}" font-size="16" font-weight="900">{dev_pct:+.1f}%</text>
+
+  <circle cx="{margin+520}" cy="136" r="8" fill="{k_color}" opacity="0.9"/>
+  <text x="{margin+535}" y="142" fill="{txt}" font-size="12" font-weight="900">{k_status} (±{K_TOL_PCT:.0f}%)</text>
+
+  <text x="{margin+720}" y="122" fill="{sub}" font-size="12" font-weight="900">Moves complete in</text>
+  <text x="{margin+720}" y="145" fill="{txt if gh_eta is not None else sub}" font-size="16" font-weight="900">{format_eta(gh_eta)}</text>
+"""
+    )
+
+    for i, gname in enumerate(gates):
+        key = f"{station}/{gatehouse}/{gname}"
+        gs = gate_states.get(key, None)
+        open_m = gs["open_m"] if gs else 0.0
+        max_m = gs["max_open_m"] if gs else 2.0
+        open_pct = opening_pct_from_m(open_m, max_m)
+
+        x = margin + i * (bay_w + bay_gap)
+        sel = (gname == selected_gate)
+
+        outline = "#60a5fa" if sel else stroke
+        glow = 'filter="url(#shadow)"' if sel else ""
+        eta = gate_etas.get(gname)
+        eta_txt = f"ETA {format_eta(eta)}" if eta is not None else "at rest"
+
+        svg_parts.append(
+            f"""
+  <g {glow}>
+    <rect x="{x}" y="{bay_y}" width="{bay_w}" height="{bay_h}" rx="18" fill="{card}" stroke="{outline}" stroke-width="{2 if sel else 1}"/>
+    <rect x="{x+18}" y="{bay_y+128}" width="{bay_w-36}" height="46" rx="14" fill="{panel}" stroke="{stroke}"/>
+    <rect x="{x+26}" y="{bay_y+138}" width="{bay_w-52}" height="28" rx="12" fill="url(#water)" opacity="0.95"/>
+
+    <rect x="{x+bay_w*0.36}" y="{bay_y+26}" width="{bay_w*0.28}" height="130" rx="12" fill="{panel}" stroke="{stroke}"/>
+    <rect x="{x+bay_w*0.36+6}" y="{bay_y+40}" width="{bay_w*0.28-12}" height="70" rx="12" fill="#1f6feb" stroke="#60a5fa" opacity="0.92"/>
+
+    <text x="{x+24}" y="{bay_y+30}" fill="{txt}" font-size="13" font-weight="900">{gname}</text>
+    <text x="{x+bay_w/2}" y="{bay_y+bay_h+28}" fill="{txt}" font-size="13" font-weight="900" text-anchor="middle">{open_pct:.0f}%</text>
+    <text x="{x+bay_w/2}" y="{bay_y+bay_h+48}" fill="{sub}" font-size="12" font-weight="800" text-anchor="middle">{open_m:.2f} m</text>
+    <text x="{x+bay_w/2}" y="{bay_y+bay_h+68}" fill="{water1 if eta is not None else sub}" font-size="11" font-weight="800" text-anchor="middle">{eta_txt}</text>
+  </g>
+"""
+        )
+
+    svg_parts.append("</svg>")
+    return "\n".join(svg_parts)
+
+
+def gate_svg(open_pct: float):
+    y = 120 - int(open_pct * 0.8)
+    y = max(40, min(120, y))
+    return f"""
+<svg width="100%" height="100%" viewBox="0 0 520 260" xmlns="http://www.w3.org/2000/svg">
+  <defs>
+    <linearGradient id="water_d" x1="0" x2="0" y1="0" y2="1">
+      <stop offset="0" stop-color="#0ea5e9" stop-opacity="0.92"/>
+      <stop offset="1" stop-color="#2563eb" stop-opacity="0.72"/>
+    </linearGradient>
+    <filter id="sh_d" x="-20%" y="-20%" width="140%" height="140%">
+      <feDropShadow dx="0" dy="6" stdDeviation="8" flood-color="#000" flood-opacity="0.35"/>
+    </filter>
+  </defs>
+
+  <rect x="22" y="20" width="476" height="220" rx="18" fill="#0b1220" stroke="#223049"/>
+  <rect x="150" y="40" width="46" height="170" rx="10" fill="#111c2e" stroke="#223049"/>
+  <rect x="324" y="40" width="46" height="170" rx="10" fill="#111c2e" stroke="#223049"/>
+
+  <rect x="80" y="170" width="360" height="44" rx="12" fill="#0a1020" stroke="#223049"/>
+  <rect x="92" y="182" width="336" height="30" rx="10" fill="url(#water_d)" opacity="0.95"/>
+
+  <rect x="220" y="62" width="80" height="140" rx="10" fill="#0a1020" stroke="#223049"/>
+
+  <g filter="url(#sh_d)">
+    <rect x="226" y="{y}" width="68" height="90" rx="10" fill="#1f6feb" opacity="0.92" stroke="#60a5fa"/>
+  </g>
+</svg>
+"""
@@ -0,0 +1,294 @@
+"""
+Deterministic runs: input recording, replay and golden-run regression.
+
+A run file (JSON lines) starts with a header holding the seed, start time,
+initial operator inputs and Program timetables. It then has one line per
+tick with the tick timestamp, the operator inputs changed since the previous
+tick and the telemetry the tick used. Replaying it re-executes the tick
+pipeline on a fresh plant built from the same seed, with a simulated clock.
+Identical code therefore gives identical gate trajectories and Kact series.
+Control state is an input per Gate House (``control``); version 1 files,
+which recorded it as console fields, apply it to the selected Gate House.
+
+    python -m wms_core.replay synth --seed 7 --ticks 900 run.jsonl
+    python -m wms_core.replay golden run.jsonl golden.json
+    python -m wms_core.replay check run.jsonl golden.json
+"""
+import argparse
+import json
+import sys
+
+from .alarms import set_protection, update_console_alarms
+from .control import compute_k_act
+from .domain import K_PATTERNS
+from .scheduler import ProgramScheduler
+from .session import SimClock, current_gh_key, get_gh, now
+from .sim import run_ticks
+from .state import GH_CONTROL_DEFAULTS, PlantState, init_state
+
+RUN_VERSION = 2
+
+# Operator-facing state captured as inputs (everything else is derived by the tick pipeline)
+INPUT_FIELDS = [
+    "station",
+    "gatehouse",
+    "selected_gate",
+    "remote_enabled",
+    "comm_main",
+    "comm_backup",
+    "comm_fault_flaps",
+    "comm_fault_latency_ms",
+    "commercial_power",
+    "gen_state",
+    "manual_last_tick_ts",  # set at init from the clock; the first Remote Manual dt depends on it
+]
+# Per Gate House control inputs (the tick pipeline derives auto_hold_since)
+CONTROL_INPUT_FIELDS = [f for f in GH_CONTROL_DEFAULTS if f != "auto_hold_since"]
+CONSOLE_ALARM_FIELDS = ("comm_main", "comm_backup", "comm_fault_flaps", "gen_state")
+
+
+# =========================================================
+# Input snapshots
+# =========================================================
+def snapshot_inputs(ss) -> dict:
+    snap = {f: dict(ss[f]) if isinstance(ss[f], dict) else ss[f] for f in INPUT_FIELDS}
+    snap["auth"] = {k: ss.auth[k] for k in ("logged_in", "user", "role")}
+    snap["manual_cmd"] = dict(ss.manual_cmd)
+    snap["prot"] = {k: dict(v) for k, v in ss.prot.items()}
+    snap["control"] = {k: {f: gh[f] for f in CONTROL_INPUT_FIELDS} for k, gh in ss.gh_state.items()}
+    snap["q_plan"] = {k: gh["q_plan"] for k, gh in ss.gh_state.items()}
+    return snap
+
+
+def diff_inputs(old: dict, new: dict) -> dict:
+    d = {}
+    for k, v in new.items():
+        if k in ("auth", "manual_cmd", "q_plan"):
+            sub = {kk: vv for kk, vv in v.items() if old[k].get(kk) != vv}
+            if sub:
+                d[k] = sub
+        elif k in ("prot", "control"):
+            sub = {}
+            for gh_key, flags in v.items():
+                ch = {f: on for f, on in flags.items() if old[k][gh_key][f] != on}
+                if ch:
+                    sub[gh_key] = ch
+            if sub:
+                d[k] = sub
+        elif old.get(k) != v:  # a version 1 header carries control fields the snapshot no longer has
+            d[k] = v
+    return d
+
+
+def apply_inputs(ss, d: dict):
+    for k, v in d.items():
+        if k == "auth":
+            ss.auth.update(v)
+        elif k == "manual_cmd":
+            ss.manual_cmd.update(v)
+        elif k == "q_plan":
+            for gh_key, q in v.items():
+                ss.gh_state[gh_key]["q_plan"] = q
+        elif k == "prot":
+            for gh_key, flags in v.items():
+                for flag, on in flags.items():
+                    set_protection(ss, gh_key, flag, on)
+        elif k == "control":
+            for gh_key, ch in v.items():
+                ss.gh_state[gh_key].update(ch)
+        elif k in GH_CONTROL_DEFAULTS:
+            get_gh(ss)[k] = v  # version 1: console-wide control of the selected Gate House
+        else:
+            ss[k] = v
+    if any(k in d for k in CONSOLE_ALARM_FIELDS):
+        update_console_alarms(ss)
+
+
+# =========================================================
+# Recording
+# =========================================================
+class Recorder:
+    """
+    Writes a run file while a session ticks (attach as ``ss.recorder``).
+
+    Inputs are the operator-facing fields that changed between ticks. The
+    snapshot is retaken after every tick, so changes made by the tick
+    pipeline itself are not recorded as inputs.
+    """
+
+    def __init__(self, path: str, ss):
+        self.path = path
+        self._f = open(path, "w", encoding="utf-8")
+        self._snap = snapshot_inputs(ss)
+        self._line: dict = {}
+        self.ticks = 0
+        self._write(
+            {
+                "type": "header",
+                "version": RUN_VERSION,
+                "seed": ss.sim_seed,
+                "t0": now(ss),
+                "inputs": self._snap,
+                "timetables": ss.scheduler.timetables,
+                "program_active": ss.program_active,
+            }
+        )
+
+    def _write(self, obj: dict):
+        self._f.write(json.dumps(obj, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._f.flush()
+
+    def capture_inputs(self, ss):
+        snap = snapshot_inputs(ss)
+        self._line = {"type": "tick", "i": self.ticks, "ts": now(ss)}
+        d = diff_inputs(self._snap, snap)
+        if d:
+            self._line["set"] = d
+
+    def capture_telemetry(self, ss, gh_keys):
+        self._line["telemetry"] = {k: [ss.gh_state[k]["q_meas"], ss.gh_state[k]["h_meas"]] for k in gh_keys}
+
+    def end_tick(self, ss):
+        self._write(self._line)
+        self.ticks += 1
+        self._snap = snapshot_inputs(ss)
+
+    def close(self):
+        self._f.close()
+
+
+def read_run(path: str) -> tuple[dict, list[dict]]:
+    header, ticks = None, []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            obj = json.loads(line)
+            if obj["type"] == "header":
+                header = obj
+            else:
+                ticks.append(obj)
+    if header is None:
+        raise ValueError(f"{path}: missing run header")
+    return header, ticks
+
+
+# =========================================================
+# Replay
+# =========================================================
+def replay(path: str) -> dict:
+    header, ticks = read_run(path)
+    clock = SimClock(header["t0"])
+    ss = PlantState()
+    ss.clock = clock
+    ss.scheduler = ProgramScheduler.from_timetables(header.get("timetables", {}), None, clock())
+    ss.program_active = dict(header.get("program_active", {}))
+    init_state(ss, header["seed"])
+    apply_inputs(ss, diff_inputs(snapshot_inputs(ss), header["inputs"]))
+
+    traj = {
+        "gates": {k: [] for k in ss.gate_state},
+        "k_act": {k: [] for k in ss.gh_state},
+    }
+    for tick in ticks:
+        clock.t = tick["ts"]
+        if "set" in tick:
+            apply_inputs(ss, tick["set"])
+        for gh_key, (q, h) in tick.get("telemetry", {}).items():
+            ss.telemetry_feed[gh_key] = (q, h)
+        run_ticks(ss)
+        for k, gs in ss.gate_state.items():
+            traj["gates"][k].append(gs["open_m"])
+        for k, gh in ss.gh_state.items():
+            traj["k_act"][k].append(compute_k_act(gh))
+    return {"version": RUN_VERSION, "seed": header["seed"], "ticks": len(ticks), **traj}
+
+
+def compare(result: dict, golden: dict, tol: float = 1e-9) -> dict:
+    """Per-series max abs difference and first diverging tick (None = within tol)."""
+    report = {"ok": result["ticks"] == golden["ticks"], "ticks": (result["ticks"], golden["ticks"]), "series": {}}
+    for group in ("gates", "k_act"):
+        for key, ref in golden[group].items():
+            got = result[group].get(key)
+            if got is None or len(got) != len(ref):
+                report["series"][f"{group}:{key}"] = {"max_abs": float("inf"), "first_tick": 0}
+                report["ok"] = False
+                continue
+            max_abs, first = 0.0, None
+            for i, (a, b) in enumerate(zip(got, ref)):
+                diff = abs(a - b)
+                if diff > tol and first is None:
+                    first = i
+                max_abs = max(max_abs, diff)
+            report["series"][f"{group}:{key}"] = {"max_abs": max_abs, "first_tick": first}
+            if first is not None:
+                report["ok"] = False
+    return report
+
+
+# =========================================================
+# Scripted scenario (headless)
+# =========================================================
+def synth(path: str, seed: int, ticks: int, dt: float = 1.0, t0: float = 1_700_000_000.0):
+    """Record a scripted Automatic -> Manual -> Program scenario."""
+    clock = SimClock(t0)
+    ss = PlantState()
+    ss.clock = clock
+    ss.scheduler = ProgramScheduler(None)
+    init_state(ss, seed)
+    rec = Recorder(path, ss)
+    ss.recorder = rec
+
+    ss.auth.update({"logged_in": True, "user": "operator", "role": "Operator"})
+    gh = get_gh(ss)
+    gh["auto_state"] = "RUNNING"
+    for i in range(ticks):
+        if i == ticks // 3:
+            gh.update({"auto_state": "STOPPED", "mode": "REMOTE MANUAL"})
+            ss.manual_cmd[f"{current_gh_key(ss)}/{ss.selected_gate}"] = "RAISE"
+        if i == 2 * ticks // 3:
+            ss.manual_cmd[f"{current_gh_key(ss)}/{ss.selected_gate}"] = "STOP"
+            gh.update({"mode": "REMOTE PROGRAM", "program_mode": "K VALUE", "prog_k_pattern": list(K_PATTERNS)[2], "program_running": True})
+        run_ticks(ss)
+        clock.advance(dt)
+    rec.close()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m wms_core.replay", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("synth", help="record a scripted scenario")
+    p.add_argument("run")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--ticks", type=int, default=900)
+    p.add_argument("--dt", type=float, default=1.0)
+    p = sub.add_parser("golden", help="replay a run and store the result as golden")
+    p.add_argument("run")
+    p.add_argument("golden")
+    p = sub.add_parser("check", help="replay a run and diff against a golden")
+    p.add_argument("run")
+    p.add_argument("golden")
+    p.add_argument("--tol", type=float, default=1e-9)
+    args = ap.parse_args(argv)
+
+    if args.cmd == "synth":
+        synth(args.run, args.seed, args.ticks, args.dt)
+        return 0
+    result = replay(args.run)
+    if args.cmd == "golden":
+        with open(args.golden, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        print(f"golden: {result['ticks']} ticks, {len(result['gates'])} gates, {len(result['k_act'])} gate houses")
+        return 0
+    with open(args.golden, "r", encoding="utf-8") as f:
+        golden = json.load(f)
+    report = compare(result, golden, args.tol)
+    bad = {k: v for k, v in report["series"].items() if v["first_tick"] is not None}
+    for k, v in sorted(bad.items(), key=lambda kv: kv[1]["first_tick"]):
+        print(f"DIFF {k}: first tick {v['first_tick']}, max |Δ| {v['max_abs']:.6g}")
+    print(("PASS" if report["ok"] else "FAIL") + f" ({report['ticks'][0]}/{report['ticks'][1]} ticks, {len(bad)} diverging series)")
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
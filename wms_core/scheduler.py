@@ -0,0 +1,255 @@
+"""Remote Program timetables per Gate House, fired from a timer heap."""
+import heapq
+import json
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from .domain import DATA_DIR
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory lock, last writer wins
+    fcntl = None
+
+SCHEDULE_PATH = os.path.join(DATA_DIR, "program_schedules.json")
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+
+def _entry_at(entry: dict, day) -> datetime | None:
+    # Occurrence of a timetable entry on a given date (None if it does not run that day)
+    if entry.get("date"):
+        if day.isoformat() != entry["date"]:
+            return None
+    elif entry.get("days") and day.weekday() not in entry["days"]:
+        return None
+    hh, mm = (int(x) for x in entry["time"].split(":"))
+    return datetime(day.year, day.month, day.day, hh, mm)
+
+
+def next_occurrence(entry: dict, after: datetime) -> datetime | None:
+    if entry.get("date"):
+        d = datetime.strptime(entry["date"], "%Y-%m-%d").date()
+        at = _entry_at(entry, d)
+        return at if at > after else None
+    for i in range(8):
+        at = _entry_at(entry, after.date() + timedelta(days=i))
+        if at is not None and at > after:
+            return at
+    return None
+
+
+def prev_occurrence(entry: dict, at_or_before: datetime) -> datetime | None:
+    if entry.get("date"):
+        d = datetime.strptime(entry["date"], "%Y-%m-%d").date()
+        at = _entry_at(entry, d)
+        return at if at <= at_or_before else None
+    for i in range(8):
+        at = _entry_at(entry, at_or_before.date() - timedelta(days=i))
+        if at is not None and at <= at_or_before:
+            return at
+    return None
+
+
+def describe_entry(entry: dict) -> str:
+    if entry.get("date"):
+        when = f"{entry['date']} {entry['time']}"
+    elif entry.get("days"):
+        when = f"{','.join(WEEKDAYS[d] for d in entry['days'])} {entry['time']}"
+    else:
+        when = f"Daily {entry['time']}"
+    mode = entry["program_mode"]
+    if mode == "K VALUE":
+        what = f"K {entry['k_pattern']}"
+    elif mode == "GATE POSITION":
+        what = f"POS {entry['gate_pos_value']:.0f}{entry['gate_pos_unit']}"
+    else:
+        what = f"DRIVE {entry['drive_direction']} {entry['drive_minutes']:.1f} min"
+    return f"{when} → {what}"
+
+
+class ProgramScheduler:
+    """
+    Per-Gate House Remote Program timetables.
+
+    Every entry has exactly one pending timer in a heap keyed by its next fire
+    time, so a tick only looks at the heap head (O(1)) and each fired
+    transition costs O(log n). Removed/edited entries are dropped lazily.
+
+    The schedule file is shared by every console. An edit reloads the file
+    under its lock, applies the one added/removed entry to what is on disk
+    and writes it back, so concurrent edits from other consoles are kept;
+    ``refresh`` picks up their edits when the file changed.
+    """
+
+    def __init__(self, path: str | None = None):
+        self.path = path
+        self.timetables: dict[str, list[dict]] = {}  # { gh_key: [entry, ...] }
+        self._heap: list[tuple[float, int, str, str]] = []  # (fire_ts, seq, gh_key, entry_id)
+        self._pending: dict[str, float] = {}  # entry_id -> fire_ts currently valid in heap
+        self._seq = 0
+        self._mtime: int | None = None  # st_mtime_ns of the file as last read/written
+
+    @classmethod
+    def load(cls, path: str, now: float | None = None) -> "ProgramScheduler":
+        sched = cls(path)
+        sched._adopt(sched._read(), now)
+        return sched
+
+    @classmethod
+    def from_timetables(cls, timetables: dict, path: str | None = None, now: float | None = None) -> "ProgramScheduler":
+        sched = cls(path)
+        for gh_key, entries in timetables.items():
+            for e in entries:
+                e = dict(e)
+                sched.timetables.setdefault(gh_key, []).append(e)
+                sched._arm(gh_key, e, now)
+        return sched
+
+    # --- Shared file
+    def _read(self) -> dict:
+        try:
+            self._mtime = os.stat(self.path).st_mtime_ns
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f).get("timetables", {})
+        except FileNotFoundError:
+            self._mtime = None
+            return {}
+
+    def _adopt(self, timetables: dict, now: float | None = None):
+        # Take over the timetables as read from the file: arm new entries, drop removed ones
+        ids = set()
+        for gh_key, entries in timetables.items():
+            for e in entries:
+                ids.add(e["id"])
+                if e["id"] not in self._pending:
+                    self._arm(gh_key, e, now)
+        for entry_id in [i for i in self._pending if i not in ids]:
+            del self._pending[entry_id]  # heap item becomes stale
+        self.timetables = timetables
+
+    def _edit(self, edit, now: float | None = None):
+        if not self.path:
+            edit(self.timetables)
+            self._adopt(self.timetables, now)
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path + ".lock", "a") as lock_f:
+            if fcntl is not None:
+                fcntl.flock(lock_f.fileno(), fcntl.LOCK_EX)  # released on close
+            timetables = self._read()
+            edit(timetables)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"version": 1, "timetables": timetables}, f, ensure_ascii=False, indent=1)
+            os.replace(tmp, self.path)
+            self._mtime = os.stat(self.path).st_mtime_ns
+        self._adopt(timetables, now)
+
+    def refresh(self, now: float | None = None) -> bool:
+        # Reload when another console changed the file; one stat per call otherwise
+        if not self.path:
+            return False
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._mtime:
+            return False
+        self._adopt(self._read(), now)
+        return True
+
+    def _arm(self, gh_key: str, entry: dict, now: float | None = None):
+        after = datetime.fromtimestamp(time.time() if now is None else now)
+        at = next_occurrence(entry, after)
+        if at is None:
+            self._pending.pop(entry["id"], None)
+            return
+        ts = at.timestamp()
+        self._seq += 1
+        self._pending[entry["id"]] = ts
+        heapq.heappush(self._heap, (ts, self._seq, gh_key, entry["id"]))
+
+    def _find(self, gh_key: str, entry_id: str) -> dict | None:
+        for e in self.timetables.get(gh_key, []):
+            if e["id"] == entry_id:
+                return e
+        return None
+
+    def entries(self, gh_key: str) -> list[dict]:
+        return sorted(self.timetables.get(gh_key, []), key=lambda e: (e.get("date") or "", e["time"]))
+
+    def add_entry(self, gh_key: str, entry: dict, now: float | None = None) -> dict:
+        e = dict(entry)
+        e["id"] = uuid.uuid4().hex[:12]
+        e.setdefault("days", [])
+        e.setdefault("date", "")
+
+        def edit(timetables):
+            timetables.setdefault(gh_key, []).append(e)
+
+        self._edit(edit, now)
+        return e
+
+    def remove_entry(self, gh_key: str, entry_id: str, now: float | None = None):
+        def edit(timetables):
+            entries = [x for x in timetables.get(gh_key, []) if x["id"] != entry_id]
+            if entries:
+                timetables[gh_key] = entries
+            else:
+                timetables.pop(gh_key, None)
+
+        self._edit(edit, now)
+
+    def _prune(self):
+        while self._heap:
+            ts, _, _, entry_id = self._heap[0]
+            if self._pending.get(entry_id) == ts:
+                return
+            heapq.heappop(self._heap)
+
+    def next_fire(self, gh_key: str | None = None) -> tuple[float, str, dict] | None:
+        if gh_key is None:
+            self._prune()
+            if not self._heap:
+                return None
+            ts, _, k, entry_id = self._heap[0]
+            return ts, k, self._find(k, entry_id)
+        # Per Gate House lookup (UI only): O(entries of that Gate House)
+        best = None
+        for e in self.timetables.get(gh_key, []):
+            ts = self._pending.get(e["id"])
+            if ts is not None and (best is None or ts < best[0]):
+                best = (ts, gh_key, e)
+        return best
+
+    def pop_due(self, now: float | None = None) -> list[tuple[str, dict]]:
+        now = time.time() if now is None else now
+        fired = []
+        while True:
+            self._prune()
+            if not self._heap or self._heap[0][0] > now:
+                break
+            ts, _, gh_key, entry_id = heapq.heappop(self._heap)
+            entry = self._find(gh_key, entry_id)
+            self._pending.pop(entry_id, None)
+            if entry is None:
+                continue
+            fired.append((gh_key, entry))
+            self._arm(gh_key, entry, ts)
+        return fired
+
+    def current_entries(self, now: float | None = None) -> dict[str, dict]:
+        # Most recent past transition per Gate House (used to resume after restart)
+        at = datetime.fromtimestamp(time.time() if now is None else now)
+        cur = {}
+        for gh_key, entries in self.timetables.items():
+            best = None
+            for e in entries:
+                prev = prev_occurrence(e, at)
+                if prev is not None and (best is None or prev > best[0]):
+                    best = (prev, e)
+            if best is not None and best[1]["program_mode"] != "DRIVE TIME":
+                cur[gh_key] = best[1]
+        return cur
@@ -0,0 +1,127 @@
+"""Session-scoped helpers: selection keys, auth timeout and audit trail.
+
+Every function takes the state object ``ss`` first (``st.session_state`` in
+the HMI, a ``PlantState`` in headless code).
+"""
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from .domain import ASSETS
+
+
+# =========================================================
+# Clock
+# =========================================================
+def now(ss) -> float:
+    # Wall clock, or the simulated clock of a deterministic run (ss.clock)
+    clock = ss.get("clock")
+    return clock() if clock is not None else time.time()
+
+
+class SimClock:
+    """Settable clock for ``ss.clock``."""
+
+    def __init__(self, t0: float):
+        self.t = t0
+
+    def __call__(self) -> float:
+        return self.t
+
+    def advance(self, dt: float):
+        self.t += dt
+
+
+@contextmanager
+def frozen_clock(ss):
+    # One timestamp for everything evaluated inside (e.g. a whole tick)
+    clock = ss.get("clock")
+    t = now(ss)
+    ss.clock = lambda: t
+    try:
+        yield t
+    finally:
+        if clock is None:
+            del ss["clock"]
+        else:
+            ss.clock = clock
+
+
+# =========================================================
+# Auth / timeout / logging
+# =========================================================
+def touch_activity(ss):
+    ss.auth["last_activity_ts"] = now(ss)
+
+
+def is_idle_timeout(ss) -> bool:
+    auth = ss.auth
+    if not auth["logged_in"]:
+        return False
+    return (now(ss) - auth["last_activity_ts"]) > auth["idle_timeout_sec"]
+
+
+def log_login(ss, user: str, role: str, event: str, reason: str):
+    t = now(ss)
+    ss.login_log.append(
+        {
+            "user": user,
+            "role": role,
+            "event": event,
+            "reason": reason,
+            "time": datetime.fromtimestamp(t).strftime("%Y-%m-%d %H:%M:%S"),
+        }
+    )
+    history = ss.get("history")
+    if history is not None:
+        history.record("login", t, user, role, event, reason)
+
+
+def do_logout(ss, reason="AUTO-LOGOUT"):
+    auth = ss.auth
+    if auth["logged_in"]:
+        log_login(ss, auth["user"], auth["role"], "LOGOUT", reason)
+    auth["logged_in"] = False
+
+
+def audit(ss, event: str, detail: str):
+    t = now(ss)
+    entry = {
+        "time": datetime.fromtimestamp(t).strftime("%H:%M:%S"),
+        "user": ss.auth["user"] if ss.auth["logged_in"] else "—",
+        "role": ss.auth["role"] if ss.auth["logged_in"] else "—",
+        "event": event,
+        "detail": detail,
+    }
+    ss.audit_log.append(entry)
+    history = ss.get("history")
+    if history is not None:
+        history.record("audit", t, entry["user"], entry["role"], event, detail)
+
+
+
+# =========================================================
+# Key helpers
+# =========================================================
+def current_gh_key(ss):
+    return f"{ss.station}/{ss.gatehouse}"
+
+
+def current_gate_key(ss):
+    return f"{ss.station}/{ss.gatehouse}/{ss.selected_gate}"
+
+
+def get_gatehouse_type(ss, gh_key: str | None = None) -> str:
+    return ss.gatehouse_type.get(gh_key or current_gh_key(ss), "TC")
+
+
+def get_gate(ss):
+    return ss.gate_state[current_gate_key(ss)]
+
+
+def get_gh(ss):
+    return ss.gh_state[current_gh_key(ss)]
+
+
+def all_gates_in_gatehouse(ss) -> list[str]:
+    return ASSETS[ss.station][ss.gatehouse]
@@ -0,0 +1,323 @@
+"""
+Station-sharded plant runner: one worker process per station, one coordinator.
+
+Each shard owns a headless plant and ticks every Gate House of its station:
+the process simulation, Q/H plausibility and sensor alarms, the Automatic,
+Program and Remote Manual control each Gate House's own control state asks
+for (consoles set it in the Gate House rows), timetable Program steps and
+the interlocks that gate them. The coordinator sends
+each shard the tick time and the operator inputs that changed. It then
+collects the station results and merges them into one plant snapshot
+(``ss``). Optionally it publishes that snapshot through a StateBackend,
+where it holds the plant lease, so HMI consoles mirror it as followers.
+
+Canal links between stations (CANAL_LINKS) are exchanged at the shard
+boundary. The upstream release of cycle n caps the downstream inflow of
+cycle n+1, so shards never wait on each other within a cycle.
+
+    python -m wms_core.shard --cycles 300 --seed 7
+    python -m wms_core.shard --cycles 300 --inline          # same plant, one process
+    python -m wms_core.shard --forever --db data/state.db   # plant for the HMI consoles
+"""
+import argparse
+import copy
+import random
+import sys
+import time
+from multiprocessing import get_context
+
+from .checkpoint import ALARM_STATE_FIELDS, apply_delta
+from .control import (
+    apply_remote_automatic_if_running,
+    apply_remote_program_if_running,
+    tick_program_schedules,
+    tick_remote_manual_motion,
+    tick_sequenced_drives,
+)
+from .domain import ASSETS, CANAL_LINKS, gates_of
+from .scheduler import SCHEDULE_PATH, ProgramScheduler
+from .session import SimClock, frozen_clock
+from .sim import tick_gatehouse_signals, tick_kact
+from .state import PlantState, init_state
+
+SHARD_DT_SEC = 1.0
+# Operator inputs forwarded to the shards (selection stays per console; control state travels in the gh rows)
+SHARD_INPUT_FIELDS = ("remote_enabled", "commercial_power", "gen_state", "prot", "manual_cmd")
+SHARD_USER = "coordinator"
+
+
+# =========================================================
+# One station
+# =========================================================
+def tick_station(ss, station: str, t: float):
+    gh_keys = [f"{station}/{gh}" for gh in ASSETS[station]]
+    # Same order as the console tick: readings reach q_act / h_act through the comm layer
+    ss.comm.update_links(ss, t)
+    for gh_key in gh_keys:
+        tick_gatehouse_signals(ss, gh_key)
+    ss.comm.flush(ss, t)
+    tick_kact(ss, gh_keys)
+    apply_remote_automatic_if_running(ss, gh_keys)
+    apply_remote_program_if_running(ss, gh_keys)
+    tick_program_schedules(ss)  # the shard's timetables only hold this station
+    tick_sequenced_drives(ss)
+    tick_remote_manual_motion(ss, gh_keys)
+    ss.alarms.tick(t)
+
+
+class Shard:
+    """
+    Headless plant for one station. ``step`` applies the inputs, ticks the
+    station and returns its gates, Gate Houses, new log entries and (when
+    it changed) the alarm table, as an apply_delta record.
+    """
+
+    def __init__(self, station: str, seed: int | None, t0: float, timetables: dict):
+        self.station = station
+        self.gh_keys = [f"{station}/{gh}" for gh in ASSETS[station]]
+        self.gate_keys = [f"{k}/{g}" for k in self.gh_keys for g in gates_of(k)]
+        ss = PlantState()
+        ss.clock = SimClock(t0)
+        ss.scheduler = ProgramScheduler.from_timetables(timetables, None, t0)
+        init_state(ss, seed)
+        # Same initial plant in every shard (one seed); independent process noise per station
+        ss.rng = random.Random(None if seed is None else f"{seed}-{station}")
+        ss.auth.update({"logged_in": True, "user": SHARD_USER, "role": "Operator"})
+        ss.station, ss.gatehouse = station, next(iter(ASSETS[station]))
+        self.ss = ss
+        self._audit = len(ss.audit_log)
+        self._alarm_version = ss.alarms.version
+        self._alarm_logged = ss.alarms.logged
+
+    def step(self, t: float, inputs: dict) -> dict:
+        ss = self.ss
+        ss.clock.t = t
+        if "alarms" in inputs:
+            # Console acks / shelves: only this station's alarms (ids start with the Gate House key)
+            rows = {a: row for a, row in inputs["alarms"]["rows"].items() if a.startswith(f"{self.station}/")}
+            inputs = {**inputs, "alarms": {"rows": rows, "log": []}}
+        apply_delta(ss, inputs)
+        with frozen_clock(ss):
+            tick_station(ss, self.station, t)
+
+        rec = {
+            "gates": {k: dict(ss.gate_state[k]) for k in self.gate_keys},
+            "gh": {k: {f: list(v) if isinstance(v, list) else v for f, v in ss.gh_state[k].items()} for k in self.gh_keys},
+            # Remote Manual commands of this station (stops at the travel limits)
+            "manual_cmd": {k: v for k, v in ss.manual_cmd.items() if k in self.gate_keys},
+        }
+        if len(ss.audit_log) > self._audit:
+            rec["audit_log"] = ss.audit_log[self._audit:]
+            self._audit = len(ss.audit_log)
+        alarms = ss.alarms
+        if alarms.version != self._alarm_version:
+            new_log = min(alarms.logged - self._alarm_logged, len(alarms.history))
+            rec["alarms"] = {
+                "state": {a: copy.deepcopy(getattr(alarms, a)) for a in ALARM_STATE_FIELDS},
+                "log": list(alarms.history)[len(alarms.history) - new_log:],
+            }
+            self._alarm_version, self._alarm_logged = alarms.version, alarms.logged
+        return rec
+
+
+def _shard_main(conn, station: str, seed: int | None, t0: float, timetables: dict):
+    shard = Shard(station, seed, t0, timetables)
+    conn.send(None)  # ready
+    while True:
+        msg = conn.recv()
+        if msg is None:
+            return
+        conn.send(shard.step(*msg))
+
+
+# =========================================================
+# Coordinator
+# =========================================================
+class ShardCoordinator:
+    """
+    Runs the station shards in lock step. ``ss`` is the merged plant: set
+    operator inputs on it (or let ``sync`` pull them from the consoles),
+    then call ``cycle(t)``. With ``inline=True`` the shards run in this
+    process, one after the other (reference and benchmark baseline).
+    """
+
+    def __init__(
+        self,
+        seed: int | None = None,
+        t0: float | None = None,
+        stations: list[str] | None = None,
+        inline: bool = False,
+        sync=None,
+        schedule_path: str | None = SCHEDULE_PATH,
+    ):
+        t0 = time.time() if t0 is None else t0
+        self.stations = list(stations or ASSETS)
+        sched = ProgramScheduler.load(schedule_path, t0) if schedule_path else ProgramScheduler(None)
+        ss = PlantState()
+        ss.clock = SimClock(t0)
+        ss.scheduler = ProgramScheduler(None)  # timetables fire in the shards
+        init_state(ss, seed)
+        ss.auth.update({"logged_in": True, "user": SHARD_USER, "role": "Operator"})
+        self.ss = ss
+        self.sync = sync
+        if sync is not None:
+            sync.attach(ss)
+
+        self.inline = inline
+        self._shards: dict[str, Shard] = {}
+        self._procs: dict = {}
+        for stn in self.stations:
+            timetables = {k: v for k, v in sched.timetables.items() if k.startswith(f"{stn}/")}
+            if inline:
+                self._shards[stn] = Shard(stn, seed, t0, timetables)
+            else:
+                # spawn: never fork a process that runs the Streamlit server threads
+                ctx = get_context("spawn")
+                conn, child = ctx.Pipe()
+                p = ctx.Process(target=_shard_main, args=(child, stn, seed, t0, timetables), name=f"shard-{stn}", daemon=True)
+                p.start()
+                self._procs[stn] = (p, conn)
+        for _, conn in self._procs.values():
+            conn.recv()
+
+        self._sent: dict = {}
+        self._resync = True  # the shards start from the merged plant (it may have been pulled from the consoles)
+        self._pulled_gates: set[str] = set()          # rows the consoles changed since the last cycle
+        self._pulled_gh: dict[str, set[str]] = {}     # gh_key -> fields
+        self._pulled_alarms: set[str] = set()         # alarm ids
+        self._alarm_ids: dict[str, set[str]] = {}  # station -> alarm ids its shard reported last
+        self.cycles = 0
+        self.cycle_ms = 0.0
+        self.leader = True
+
+    def _inputs(self) -> dict:
+        # Operator inputs changed since the last cycle, plus the canal link inflows
+        ss = self.ss
+        changed = {f: ss[f] for f in SHARD_INPUT_FIELDS if self._sent.get(f) != ss[f]}
+        self._sent.update({f: copy.deepcopy(v) for f, v in changed.items()})
+        inputs = {"set": changed} if changed else {}
+        gh = {}
+        if self._resync:
+            inputs["gates"] = copy.deepcopy(ss.gate_state)
+            gh = copy.deepcopy(ss.gh_state)
+            self._resync = False
+        else:
+            if self._pulled_gates:
+                inputs["gates"] = {k: copy.deepcopy(ss.gate_state[k]) for k in self._pulled_gates}
+            gh = {k: {f: copy.deepcopy(ss.gh_state[k][f]) for f in fields} for k, fields in self._pulled_gh.items()}
+            if self._pulled_alarms:
+                inputs["alarms"] = {"rows": {a: ss.alarms.row(a) for a in self._pulled_alarms}, "log": []}
+        self._pulled_gates.clear()
+        self._pulled_gh.clear()
+        self._pulled_alarms.clear()
+        for down, up in CANAL_LINKS.items():
+            gh.setdefault(down, {})["q_inflow"] = ss.gh_state[up]["q_act"]
+        if gh:
+            inputs["gh"] = gh
+        return inputs
+
+    def cycle(self, t: float) -> dict:
+        t0 = time.perf_counter()
+        ss = self.ss
+        if self.sync is not None:
+            pulled = self.sync.pull(ss)
+            if pulled:
+                # Console commands: the shards get only the gate and Gate House rows they touched
+                self._pulled_gates.update(pulled.get("gates", ()))
+                for k, ch in pulled.get("gh", {}).items():
+                    self._pulled_gh.setdefault(k, set()).update(ch)
+                self._pulled_alarms.update(pulled.get("alarms", {}).get("rows", ()))
+            self.leader = self.sync.leader(time.time())
+            if not self.leader:
+                return {}  # another plant runner holds the lease
+
+        inputs = self._inputs()
+        if self.inline:
+            results = [self._shards[stn].step(t, inputs) for stn in self.stations]
+        else:
+            for _, conn in self._procs.values():
+                conn.send((t, inputs))
+            results = [conn.recv() for _, conn in self._procs.values()]
+
+        rec: dict = {"gates": {}, "gh": {}, "audit_log": []}
+        manual = dict(ss.manual_cmd)
+        for stn, r in zip(self.stations, results):
+            rec["gates"].update(r["gates"])
+            rec["gh"].update(r["gh"])
+            rec["audit_log"] += r.get("audit_log", [])
+            manual.update(r["manual_cmd"])
+            if "alarms" in r:
+                # Alarm ids carry their Gate House key: a shard's table only replaces its own alarms
+                table = r["alarms"]["state"]
+                ss.alarms.merge_table(table, self._alarm_ids.get(stn, set()), r["alarms"]["log"])
+                self._alarm_ids[stn] = set(table["active"])
+        if manual != ss.manual_cmd:
+            rec["set"] = {"manual_cmd": manual}
+            self._sent["manual_cmd"] = copy.deepcopy(manual)  # the shards already hold it
+        ss.clock.t = t
+        apply_delta(ss, rec)
+        ss.last_tick_ts = t
+
+        if self.sync is not None:
+            self.sync.push(ss)
+        self.cycles += 1
+        self.cycle_ms = (time.perf_counter() - t0) * 1000.0
+        return rec
+
+    def close(self):
+        for p, conn in self._procs.values():
+            try:
+                conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            p.join(timeout=5)
+        self._procs.clear()
+
+
+# =========================================================
+# CLI
+# =========================================================
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m wms_core.shard", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--seed", type=int)
+    ap.add_argument("--cycles", type=int, default=300)
+    ap.add_argument("--dt", type=float, default=SHARD_DT_SEC)
+    ap.add_argument("--inline", action="store_true", help="run all shards in this process")
+    ap.add_argument("--forever", action="store_true", help="run in real time until interrupted")
+    ap.add_argument("--db", help="publish the merged plant to this shared state database (WMS_STATE_DB of the consoles)")
+    args = ap.parse_args(argv)
+
+    sync = None
+    if args.db:
+        from .backend import SqliteBackend, StateSync
+
+        sync = StateSync(SqliteBackend(args.db))
+    t = time.time()
+    coord = ShardCoordinator(args.seed, t, inline=args.inline, sync=sync)
+    total = 0.0
+    try:
+        i = 0
+        while args.forever or i < args.cycles:
+            if args.forever:
+                t = time.time()
+            coord.cycle(t)
+            total += coord.cycle_ms
+            i += 1
+            if args.forever:
+                time.sleep(max(0.0, args.dt - coord.cycle_ms / 1000.0))
+            else:
+                t += args.dt
+    except KeyboardInterrupt:
+        pass
+    finally:
+        coord.close()
+    n = max(coord.cycles, 1)
+    print(
+        f"{coord.cycles} cycles, {len(coord.stations)} shard(s) {'inline' if args.inline else 'in worker processes'}: "
+        f"{total / n:.2f} ms/cycle"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
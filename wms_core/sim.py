@@ -0,0 +1,155 @@
+"""Dummy process simulation and the tick pipeline."""
+import time
+
+from .control import (
+    apply_remote_automatic_if_running,
+    apply_remote_program_if_running,
+    compute_k_act,
+    tick_program_schedules,
+    tick_remote_manual_motion,
+    tick_sequenced_drives,
+)
+from .anomaly import update_sensor_alarm
+from .comm import send_telemetry
+from .domain import compute_h_plan_from_qplan, gate_open_pct
+from .rbe import append_trend
+from .session import current_gate_key, current_gh_key, frozen_clock, get_gate, now
+
+
+# =========================================================
+# Signal updates (dummy process simulation)
+# =========================================================
+def tick_gatehouse_signals(ss, gh_key: str | None = None):
+    gh_key = gh_key or current_gh_key(ss)
+    gh = ss.gh_state[gh_key]
+
+    gh["h_plan"] = compute_h_plan_from_qplan(gh["q_plan"])
+
+    k_target = gh.get("k_target", 1.0)
+    q_target = k_target * gh["q_plan"]
+
+    feed = ss.telemetry_feed.pop(gh_key, None)
+    if feed is not None:
+        # Externally supplied telemetry (replay / field link) replaces the dummy process
+        gh["q_meas"], gh["h_meas"] = feed
+    else:
+        rng = ss.rng
+        nudge = 0.015 if (gh["auto_state"] == "RUNNING" or gh["program_running"]) else 0.0
+        gh["q_true"] = max(0.0, gh["q_true"] + rng.uniform(-0.08, 0.08) - (gh["q_true"] - q_target) * nudge)
+        if gh.get("q_inflow") is not None:
+            gh["q_true"] = min(gh["q_true"], gh["q_inflow"])  # cannot release more than the canal link delivers
+        h_true = compute_h_plan_from_qplan(gh["q_true"]) + rng.uniform(-0.05, 0.05)  # level follows the rating table
+        gh["q_meas"], gh["h_meas"] = ss.sensor_faults.apply(gh_key, gh["q_true"], h_true)
+
+    # Sensor plausibility on every field sample (Automatic holds on suspect Q)
+    t = now(ss)
+    ss.anomaly.check(gh_key, gh["q_meas"], gh["h_meas"], t)
+    update_sensor_alarm(ss, gh_key, t)
+
+    # Report by exception: only changes beyond the deadband reach state / trend / UI,
+    # through the comm layer
+    if ss.rbe.check(f"{gh_key}/q_act", "q_act", gh["q_meas"], t):
+        send_telemetry(ss, gh_key, "q_act", round(gh["q_meas"], 2), t)
+    if ss.rbe.check(f"{gh_key}/h_act", "h_act", gh["h_meas"], t):
+        send_telemetry(ss, gh_key, "h_act", round(gh["h_meas"], 2), t)
+
+
+def controlled_gh_keys(ss) -> list[str]:
+    # Gate Houses the console ticks: the selected one, and every one whose control is running
+    # (a command from any console sharing the plant)
+    sel = current_gh_key(ss)
+    keys = [sel]
+    for k, gh in ss.gh_state.items():
+        if k == sel:
+            continue
+        if gh["mode"] == "REMOTE AUTOMATIC" and gh["auto_state"] == "RUNNING":
+            keys.append(k)
+        elif gh["mode"] == "REMOTE PROGRAM" and (gh["program_running"] or k in ss.program_active):
+            keys.append(k)
+    return keys
+
+
+def tick_kact(ss, gh_keys=None):
+    # Raw Kact of the reported Qact, and the conditioned Kact for control and band checks
+    t = now(ss)
+    for gh_key in gh_keys or ss.gh_state:
+        gh = ss.gh_state[gh_key]
+        k = compute_k_act(gh)
+        gh["k_act_raw"] = k
+        gh["k_act"] = ss.kact.update(gh_key, k, not ss.anomaly.suspect(gh_key, t), t)
+
+
+def tick_gate_trend(ss):
+    pct = gate_open_pct(get_gate(ss))
+    t = now(ss)
+    if ss.rbe.check(f"{current_gate_key(ss)}/open_pct", "open_pct", pct, t):
+        append_trend(ss.trend_gate, ss.trend_gate_t, pct, t)
+
+
+def tick_history(ss, t: float):
+    # Sampled export history: every gate position and every Gate House Kact, by exception
+    history = ss.history
+    if history.enabled:
+        for gate_key, gs in ss.gate_state.items():
+            history.sample(gate_key, "open_pct", gate_open_pct(gs), t)
+        for gh_key, gh in ss.gh_state.items():
+            history.sample(gh_key, "k_act", compute_k_act(gh), t)
+    history.flush()
+
+
+def run_ticks(ss):
+    sync = ss.get("sync")
+    if sync is not None:
+        sync.pull(ss)
+        if not sync.leader(time.time()):  # wall clock: the lease is shared between processes
+            # Follower console: the lease holder runs the plant (and writes its history), this one mirrors it
+            ss.last_tick_ts = ss.manual_last_tick_ts = now(ss)
+            ss.history.release()
+            return
+    with frozen_clock(ss):
+        _run_ticks(ss)
+    if sync is not None:
+        sync.push(ss)
+
+
+def _run_ticks(ss):
+    n_audit, n_alarm = len(ss.audit_log), len(ss.alarms.history)
+    recorder = ss.get("recorder")
+    if recorder is not None:
+        recorder.capture_inputs(ss)
+
+    t = now(ss)
+    ss.eta.begin_tick(t - ss.last_tick_ts if ss.last_tick_ts else None)
+
+    # Tick order
+    ss.comm.update_links(ss, t)
+    gh_keys = controlled_gh_keys(ss)
+    for gh_key in gh_keys:
+        tick_gatehouse_signals(ss, gh_key)
+    ss.comm.flush(ss, t)
+    if recorder is not None:
+        recorder.capture_telemetry(ss, gh_keys)
+    dss = ss.get("dss")
+    if dss is not None:
+        dss.poll(ss, t)
+    tick_kact(ss)
+    apply_remote_automatic_if_running(ss)
+    apply_remote_program_if_running(ss)
+    tick_program_schedules(ss)
+    tick_sequenced_drives(ss)
+    tick_remote_manual_motion(ss)
+    tick_gate_trend(ss)
+    ss.alarms.tick(t)
+    ss.eta.compute(ss.gate_state, t)
+    ss.stats.update(ss.gh_state, t)
+    tick_history(ss, t)
+    checkpoint = ss.get("checkpoint")
+    if checkpoint is not None:
+        checkpoint.commit(ss, t)
+
+    # Commands, interlock stops and alarms are always exceptions for the UI
+    if len(ss.audit_log) != n_audit or len(ss.alarms.history) != n_alarm:
+        ss.rbe.mark_ui_dirty()
+    if recorder is not None:
+        recorder.end_tick(ss)
+    ss.last_tick_ts = t
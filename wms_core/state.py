@@ -0,0 +1,225 @@
+"""Plant / control state initialisation (Streamlit-free)."""
+import math
+import random
+
+from .alarms import AlarmEngine
+from .anomaly import AnomalyDetector, SensorFaultInjector
+from .comm import CommLayer
+from .domain import ASSETS, K_PATTERNS, compute_h_plan_from_qplan, opening_m_from_pct
+from .filters import KactConditioner
+from .history import HistoryStore
+from .interlock import PROT_FLAGS, InterlockEngine
+from .power import MotionSequencer
+from .rbe import TREND_LEN, DeadbandFilter
+from .scheduler import SCHEDULE_PATH, ProgramScheduler
+from .stats import DischargeStats
+from .session import now
+
+# Control state per Gate House (held in its gh_state row, so it syncs and checkpoints with it)
+GH_CONTROL_DEFAULTS = {
+    "mode": "REMOTE AUTOMATIC",
+    "auto_state": "STOPPED",          # RUNNING / PAUSED / STOPPED
+    "auto_first_exec_ts": None,
+    "auto_hold_since": None,          # Automatic on hold (suspect Q/H data) since this ts
+    "program_running": False,
+    "program_mode": "K VALUE",        # K VALUE / GATE POSITION / DRIVE TIME
+    "prog_k_pattern": list(K_PATTERNS.keys())[0],
+    "prog_gate_pos_unit": "%",
+    "prog_gate_pos_value": 50.0,
+    "prog_drive_direction": "RAISE",
+    "prog_drive_minutes": 1.0,
+}
+
+class PlantState(dict):
+    """
+    Attribute-access dict with the same interface the code uses on
+    ``st.session_state`` (``"x" in ss``, ``ss.x``, ``ss.x = ...``), for headless use.
+    """
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name, value):
+        self[name] = value
+
+    def __delattr__(self, name):
+        try:
+            del self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+
+def init_state(ss, seed: int | None = None):
+    # --- Simulation: per-run RNG (seeded => reproducible plant) and telemetry input
+    if "rng" not in ss:
+        ss.sim_seed = seed
+        ss.rng = random.Random(seed)
+    if "telemetry_feed" not in ss:
+        ss.telemetry_feed = {}  # { gh_key: (q_meas, h_meas) } consumed by the next tick
+    rng = ss.rng
+
+    # --- Auth (demo)
+    if "auth" not in ss:
+        ss.auth = {
+            "logged_in": False,
+            "user": "operator",
+            "role": "Operator",  # Administrator / Operator / Viewer
+            "last_activity_ts": now(ss),
+            "idle_timeout_sec": 5 * 60,
+        }
+    if "login_log" not in ss:
+        ss.login_log = []
+    if "audit_log" not in ss:
+        ss.audit_log = []
+
+    # --- Selection
+    if "station" not in ss:
+        ss.station = "BBT15"
+    if "gatehouse" not in ss:
+        ss.gatehouse = "BaratMainGateHouse"
+    if "selected_gate" not in ss:
+        ss.selected_gate = "Gate1"
+
+    # --- Comms / power / protection
+    if "remote_enabled" not in ss:
+        ss.remote_enabled = True
+    if "comm_main" not in ss:
+        ss.comm_main = "NORMAL"
+    if "comm_backup" not in ss:
+        ss.comm_backup = "STANDBY"
+
+    if "commercial_power" not in ss:
+        ss.commercial_power = True
+    if "gen_state" not in ss:
+        ss.gen_state = "OFF"
+
+    if "comm_fault_flaps" not in ss:
+        ss.comm_fault_flaps = False                          # fault injection: random link loss
+    if "comm_fault_latency_ms" not in ss:
+        ss.comm_fault_latency_ms = {"MAIN": 0, "BACKUP": 0}  # fault injection: link latency
+    if "comm" not in ss:
+        ss.comm = CommLayer(ss.sim_seed)
+    if "history" not in ss:
+        ss.history = HistoryStore()  # export history; memory-free unless given a directory
+    if "kact" not in ss:
+        ss.kact = KactConditioner()
+
+    if "prot" not in ss:
+        ss.prot = {
+            f"{stn}/{gh}": {f: False for f in PROT_FLAGS}
+            for stn, ghs in ASSETS.items()
+            for gh in ghs.keys()
+        }
+    if "interlock" not in ss:
+        ss.interlock = InterlockEngine(ss.prot)
+    if "alarms" not in ss:
+        ss.alarms = AlarmEngine()
+    if "motion" not in ss:
+        ss.motion = MotionSequencer()  # gate motor grants under the generator power budget
+
+    # --- Gate house type: TC / SPC (demo)
+    if "gatehouse_type" not in ss:
+        ss.gatehouse_type = {}
+        for stn, ghs in ASSETS.items():
+            for gh in ghs.keys():
+                ss.gatehouse_type[f"{stn}/{gh}"] = "SPC" if ("Ciberang" in gh or "Waru" in gh) else "TC"
+
+    # --- Gate states
+    if "gate_state" not in ss:
+        gs = {}
+        for stn, ghs in ASSETS.items():
+            for gh, gates in ghs.items():
+                for g in gates:
+                    key = f"{stn}/{gh}/{g}"
+                    open_pct = rng.choice([0, 10, 25, 40, 55, 70, 85])
+                    max_open_m = rng.choice([2.00, 1.80, 1.60])
+                    gs[key] = {
+                        "open_m": opening_m_from_pct(open_pct, max_open_m),  # authoritative position (float m)
+                        "max_open_m": max_open_m,
+                        "last_cmd": "—",
+                        "last_cmd_time": "—",
+                    }
+        ss.gate_state = gs
+
+    # --- Gate House process values: Qplan, Qact, Hplan, Hact, Ktarget, Kact
+    if "gh_state" not in ss:
+        t0 = now(ss)
+        ds = {}
+        for stn, ghs in ASSETS.items():
+            for gh in ghs.keys():
+                k = f"{stn}/{gh}"
+                q_plan = round(rng.uniform(9.0, 14.0), 2)
+                h_plan = compute_h_plan_from_qplan(q_plan)
+                q_act = round(q_plan + rng.uniform(-0.6, 0.6), 2)
+                h_act = round(h_plan + rng.uniform(-0.08, 0.08), 2)
+                k_target = rng.choice([1.0, 0.9, 0.8, 0.7, 0.6])
+                ds[k] = {
+                    "q_plan": q_plan,
+                    "h_plan": h_plan,
+                    "q_act": q_act,                 # last reported (exception) values
+                    "h_act": h_act,
+                    "q_true": q_act,                # dummy process value
+                    "q_meas": q_act,                # field measurement, every tick
+                    "h_meas": h_act,
+                    "k_target": k_target,
+                    "k_act": None,                  # filtered (control, band checks)
+                    "k_act_raw": None,              # q_act / q_plan (audit)
+                    "trend_q": [
+                        round(q_act + 0.12 * math.sin(i / 12) + rng.uniform(-0.10, 0.10), 2) for i in range(TREND_LEN)
+                    ],
+                    "trend_q_t": [t0 - (TREND_LEN - i) for i in range(TREND_LEN)],
+                    "auto_alarm": False,
+                    "auto_alarm_msg": "",
+                    **GH_CONTROL_DEFAULTS,
+                }
+        ss.gh_state = ds
+
+    # --- Sensor plausibility
+    if "anomaly" not in ss:
+        ss.anomaly = AnomalyDetector()
+    if "sensor_faults" not in ss:
+        ss.sensor_faults = SensorFaultInjector(ss.sim_seed)
+
+    # --- Program timetables (persisted; shared file across restarts)
+    if "scheduler" not in ss:
+        ss.scheduler = ProgramScheduler.load(SCHEDULE_PATH, now(ss))
+    if "program_active" not in ss:
+        ss.program_active = ss.scheduler.current_entries(now(ss))  # { gh_key: timetable entry }
+
+    # --- Remote Manual: per gate continuous command (RAISE/DOWN/STOP), run by the tick owner
+    if "manual_cmd" not in ss:
+        ss.manual_cmd = {}  # { gate_key: "STOP"/"RAISE"/"DOWN" }
+    if "manual_last_tick_ts" not in ss:
+        ss.manual_last_tick_ts = now(ss)
+
+    # --- Trends
+    if "trend_gate" not in ss:
+        ss.trend_gate = [rng.randint(0, 100) for _ in range(TREND_LEN)]
+        ss.trend_gate_t = [now(ss) - (TREND_LEN - i) for i in range(TREND_LEN)]
+    if "eta" not in ss:
+        from .eta import EtaEngine  # numpy: loaded with the first plant, not on import
+
+        ss.eta = EtaEngine(ss.gate_state)
+    if "stats" not in ss:
+        ss.stats = DischargeStats()
+    if "rbe" not in ss:
+        ss.rbe = DeadbandFilter()
+    if "last_tick_ts" not in ss:
+        ss.last_tick_ts = 0.0
+    if "trend_large" not in ss:
+        ss.trend_large = False
+    if "trend_window" not in ss:
+        ss.trend_window = "Live"
+    if "cctv_camera" not in ss:
+        ss.cctv_camera = "CCTV — Gate Area"
+
+
+def new_plant_state(seed: int | None = None, clock=None) -> PlantState:
+    ss = PlantState()
+    if clock is not None:
+        ss.clock = clock
+    init_state(ss, seed)
+    return ss
@@ -0,0 +1,134 @@
+"""
+Streaming discharge statistics and daily water-delivery accounting.
+
+Per Gate House accumulators are updated once per tick in O(1) from the
+reported ``q_act`` and the filtered Kact / Ktarget (what control acts on).
+Each interval is weighted by its true dt and the sample at its start
+(zero-order hold, the same values the HMI showed during that interval). An interval that crosses the day
+boundary is split at the boundary. At that point the day is closed into an
+immutable daily record, so reports read stored totals instead of
+recomputing from history.
+"""
+from datetime import datetime, timedelta
+
+from .control import filtered_k_act
+from .domain import K_TOL_PCT
+
+STATS_DAY_START_HOUR = 0       # operational day boundary (local time), e.g. 6 for an 06:00 irrigation day
+STATS_MAX_GAP_SEC = 5 * 60     # longer gaps without ticks are not integrated (counted as no data)
+
+
+def _new_day(day: str) -> dict:
+    return {
+        "day": day,
+        "volume_m3": 0.0,
+        "in_band_sec": 0.0,
+        "out_band_sec": 0.0,
+        "k_sec": 0.0,          # integral of Kact dt
+        "no_data_sec": 0.0,
+        "q_min": None,
+        "q_max": None,
+    }
+
+
+def day_summary(acc: dict) -> dict:
+    covered = acc["in_band_sec"] + acc["out_band_sec"]
+    return {
+        "day": acc["day"],
+        "volume_m3": acc["volume_m3"],
+        "in_band_sec": acc["in_band_sec"],
+        "out_band_sec": acc["out_band_sec"],
+        "in_band_pct": acc["in_band_sec"] / covered * 100.0 if covered > 0 else None,
+        "mean_k_act": acc["k_sec"] / covered if covered > 0 else None,
+        "no_data_sec": acc["no_data_sec"],
+        "q_min": acc["q_min"],
+        "q_max": acc["q_max"],
+    }
+
+
+class DischargeStats:
+    """
+    Running accumulators per Gate House plus closed daily records.
+
+    ``update`` is O(1) per Gate House: an accumulation step for the interval
+    since the previous tick, and at most one day roll-over per boundary
+    crossed.
+    """
+
+    def __init__(self, day_start_hour: int = STATS_DAY_START_HOUR, max_gap_sec: float = STATS_MAX_GAP_SEC):
+        self.day_start = timedelta(hours=day_start_hour)
+        self.max_gap_sec = max_gap_sec
+        self.today: dict[str, dict] = {}           # gh_key -> running accumulator
+        self.days: dict[str, list[dict]] = {}      # gh_key -> closed daily summaries (oldest first)
+        self._prev: dict[str, tuple] = {}          # gh_key -> (ts, q_act, k_act, in_band)
+        self._boundary: float | None = None        # ts of the next day boundary
+
+    # --- Day boundaries
+    def day_of(self, ts: float) -> str:
+        return (datetime.fromtimestamp(ts) - self.day_start).date().isoformat()
+
+    def _next_boundary(self, ts: float) -> float:
+        start = datetime.combine((datetime.fromtimestamp(ts) - self.day_start).date(), datetime.min.time()) + self.day_start
+        return (start + timedelta(days=1)).timestamp()
+
+    def _roll(self, ts: float):
+        # Close every running day and open the day that starts at ts
+        for gh_key, acc in self.today.items():
+            self.days.setdefault(gh_key, []).append(day_summary(acc))
+            self.today[gh_key] = _new_day(self.day_of(ts))
+
+    # --- Accumulation
+    def _accumulate(self, gh_key: str, dt: float, q: float, k: float, in_band: bool):
+        acc = self.today[gh_key]
+        acc["volume_m3"] += q * dt
+        acc["k_sec"] += k * dt
+        if in_band:
+            acc["in_band_sec"] += dt
+        else:
+            acc["out_band_sec"] += dt
+
+    def update(self, gh_state: dict, ts: float):
+        if self._boundary is None:
+            self._boundary = self._next_boundary(ts)
+
+        # Split the interval at each boundary it crosses (normally none)
+        while ts >= self._boundary:
+            for gh_key, prev in self._prev.items():
+                self._step(gh_key, prev, self._boundary)
+            self._roll(self._boundary)
+            self._boundary = self._next_boundary(self._boundary)
+
+        for gh_key, gh in gh_state.items():
+            prev = self._prev.get(gh_key)
+            if gh_key not in self.today:
+                self.today[gh_key] = _new_day(self.day_of(ts))
+            if prev is not None:
+                self._step(gh_key, prev, ts)
+
+            q = gh["q_act"]
+            k = filtered_k_act(gh)
+            in_band = abs(gh["k_target"] - k) * 100.0 <= K_TOL_PCT
+            self._prev[gh_key] = (ts, q, k, in_band)
+            acc = self.today[gh_key]
+            acc["q_min"] = q if acc["q_min"] is None else min(acc["q_min"], q)
+            acc["q_max"] = q if acc["q_max"] is None else max(acc["q_max"], q)
+
+    def _step(self, gh_key: str, prev: tuple, ts: float):
+        t0, q, k, in_band = prev
+        dt = ts - t0
+        if dt <= 0:
+            return
+        if dt > self.max_gap_sec:
+            self.today[gh_key]["no_data_sec"] += dt
+        else:
+            self._accumulate(gh_key, dt, q, k, in_band)
+        self._prev[gh_key] = (ts, q, k, in_band)
+
+    # --- Reports
+    def today_summary(self, gh_key: str) -> dict | None:
+        acc = self.today.get(gh_key)
+        return day_summary(acc) if acc else None
+
+    def daily_report(self, gh_key: str) -> list[dict]:
+        """Closed days, newest first (the running day is today_summary)."""
+        return list(reversed(self.days.get(gh_key, [])))
@@ -0,0 +1,129 @@
+"""
+Shared read-only snapshots for Viewer-role consoles.
+
+A Viewer cannot issue commands, so it does not need its own control panels
+or its own SVG builds on every rerun. Once per VIEWER_REFRESH_SEC and Gate
+House, one session builds a snapshot: the overview page, the status rows,
+the alarm list and the downsampled Qact trend, all rendered to strings and
+lists. Every Viewer of the same plant is then served that snapshot, so a
+wall display or a management screen costs one dictionary lookup per rerun.
+
+Snapshots are keyed by plant and Gate House. Consoles on a shared state
+database (WMS_STATE_DB) show one plant, so all of their viewers share the
+snapshots. A console with its own plant keys them by session.
+"""
+import threading
+from datetime import datetime
+
+from .alarms import ALARM_PANEL_MAX
+from .control import filtered_k_act
+from .domain import ASSETS, K_TOL_PCT, gate_open_pct
+from .downsample import TREND_CHART_PX, minmax_downsample
+from .interlock import protection_active
+from .render import bar_html, dev_badge, overview_building_svg, pill_html, row_html, svg_document_html
+
+VIEWER_REFRESH_SEC = 2.0
+VIEWER_SNAPSHOT_TTL_SEC = 60.0   # snapshots nobody asked for since are dropped (closed sessions, other Gate Houses)
+
+
+def build_viewer_snapshot(ss, gh_key: str, t: float, width: int = TREND_CHART_PX) -> dict:
+    station, gatehouse = gh_key.split("/", 1)
+    gates = ASSETS[station][gatehouse]
+    gh = ss.gh_state[gh_key]
+    k_act = filtered_k_act(gh)
+    alarms = ss.alarms
+    mode = gh["mode"]
+
+    svg = overview_building_svg(
+        station=station,
+        gatehouse=gatehouse,
+        gates=gates,
+        gate_states=ss.gate_state,
+        selected_gate="",
+        alarm_active=alarms.has_active(gh_key),
+        mode_text=mode,
+        k_target=gh["k_target"],
+        k_act=k_act,
+        gate_etas=ss.eta.gate_etas(gh_key),
+        gh_eta=ss.eta.gatehouse_eta(gh_key),
+    )
+
+    dev_pct = (gh["k_target"] - k_act) * 100.0  # same deviation and band as the main Kact card
+    status = [
+        pill_html(f"MODE: {mode}", "hmi-pill hmi-ok" if mode != "LOCAL (LCP ACTIVE)" else "hmi-pill hmi-bad"),
+        pill_html(f"COMM: {ss.comm.active or 'NONE'}", "hmi-pill hmi-ok" if ss.comm.active == "MAIN" else "hmi-pill hmi-warn"),
+        pill_html(f"GEN: {ss.gen_state}", "hmi-pill hmi-ok" if ss.gen_state != "ERROR" else "hmi-pill hmi-bad"),
+        row_html("Ktarget / Kact", f"{gh['k_target']:.3f} / {k_act:.3f}", f"Δ {dev_pct:+.1f}% (±{K_TOL_PCT:.0f}%)", dev_badge(abs(dev_pct))),
+        row_html("Qact / Qplan", f"{gh['q_act']:.2f} / {gh['q_plan']:.2f} m³/s"),
+        row_html("Hact", f"{gh['h_act']:.2f} m"),
+        row_html("Protection", "ACTIVE" if protection_active(ss, gh_key) else "NONE"),
+    ]
+    for g in gates:
+        pct = gate_open_pct(ss.gate_state[f"{gh_key}/{g}"])
+        status += [row_html(g, f"{pct:.0f}%"), bar_html(int(pct))]
+
+    visible = alarms.alarms_for(gh_key)
+    rows = [
+        row_html(
+            a["message"],
+            "",
+            f"{a['severity']} · {a['state']}" + ("" if a["acked"] else " · UNACK"),
+            "hmi-bad" if a["state"] == "ACTIVE" and a["severity"] == "HIGH" else "hmi-warn" if a["state"] == "ACTIVE" else "hmi-ok",
+        )
+        for a in visible[:ALARM_PANEL_MAX]
+    ]
+    if len(visible) > ALARM_PANEL_MAX:
+        rows.append(row_html(f"+{len(visible) - ALARM_PANEL_MAX} more", ""))
+
+    trend_t, trend_q = minmax_downsample(gh["trend_q_t"], gh["trend_q"], width)
+    return {
+        "t": t,
+        "gh_key": gh_key,
+        "overview_html": svg_document_html(svg),
+        "status_html": "\n".join(status),
+        "alarms_html": "\n".join(rows) or row_html("No active alarms", ""),
+        "trend": {"time": [datetime.fromtimestamp(x) for x in trend_t], "Qact": trend_q.tolist()},
+    }
+
+
+class ViewerSnapshots:
+    """
+    Snapshot cache shared by every session of the server process (the
+    Streamlit script threads). ``get`` returns the current snapshot for
+    ``key`` or calls ``build`` when it is older than ``refresh_sec``. Only
+    one thread builds a given key; the others wait for its result.
+    """
+
+    def __init__(self, refresh_sec: float = VIEWER_REFRESH_SEC):
+        self.refresh_sec = refresh_sec
+        self._snaps: dict[tuple, dict] = {}
+        self._building: dict[tuple, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.hits = 0
+
+    def _fresh(self, key: tuple, t: float) -> dict | None:
+        snap = self._snaps.get(key)
+        return snap if snap is not None and t - snap["t"] < self.refresh_sec else None
+
+    def get(self, key: tuple, t: float, build) -> dict:
+        with self._lock:
+            snap = self._fresh(key, t)
+            if snap is not None:
+                self.hits += 1
+                return snap
+            building = self._building.setdefault(key, threading.Lock())
+        with building:
+            with self._lock:
+                snap = self._fresh(key, t)  # built by the thread this one waited for
+                if snap is not None:
+                    self.hits += 1
+                    return snap
+            snap = build()
+            with self._lock:
+                self._snaps[key] = snap
+                self.builds += 1
+                for k in [k for k, s in self._snaps.items() if t - s["t"] > VIEWER_SNAPSHOT_TTL_SEC]:
+                    del self._snaps[k]
+                    self._building.pop(k, None)
+        return snap
@@ -0,0 +1,182 @@
+"""
+What-if evaluation of K patterns before a Remote Program run.
+
+The selected Gate House is forked from the live state into a picklable
+snapshot. Each candidate pattern is then run forward on a fresh headless
+plant with a simulated clock, using the same tick pipeline as the HMI. All
+patterns share one noise seed, so they are compared on the same disturbances.
+Patterns are evaluated in parallel on a process pool and ranked by time to
+reach the Ktarget band, then by gate travel.
+"""
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from .control import compute_k_act
+from .domain import AUTO_FAIL_TIMEOUT_SEC, K_PATTERNS, K_TOL_PCT, gates_of
+from .eta import EtaEngine
+from .scheduler import ProgramScheduler
+from .session import SimClock, current_gh_key, now
+from .sim import run_ticks
+from .state import PlantState, init_state
+
+WHATIF_HORIZON_SEC = AUTO_FAIL_TIMEOUT_SEC  # same limit Automatic uses before giving up
+WHATIF_DT_SEC = 1.0
+WHATIF_BAND_HOLD_SEC = 60.0                 # Kact must stay in band this long to count
+WHATIF_SEED = 0                             # noise seed when the live plant is unseeded
+WHATIF_MAX_WORKERS = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+
+# Operator-facing fields carried into the fork (interlocks apply as in the live plant;
+# comm links are not forked: the what-if predicts the plant, not the telemetry path)
+FORK_FIELDS = ("remote_enabled", "commercial_power", "gen_state")
+
+_pool: ProcessPoolExecutor | None = None
+
+
+# =========================================================
+# Fork
+# =========================================================
+def fork_gatehouse(ss, gh_key: str | None = None) -> dict:
+    gh_key = gh_key or current_gh_key(ss)
+    gh = ss.gh_state[gh_key]
+    return {
+        "gh_key": gh_key,
+        "seed": WHATIF_SEED if ss.sim_seed is None else ss.sim_seed,
+        "t0": now(ss),
+        "inputs": {f: ss[f] for f in FORK_FIELDS},
+        "prot": dict(ss.prot[gh_key]),
+        "gates": {g: dict(ss.gate_state[f"{gh_key}/{g}"]) for g in gates_of(gh_key)},
+        "gh": {k: v for k, v in gh.items() if not k.startswith("trend_")},
+    }
+
+
+def _plant_from_fork(fork: dict, k_pattern: str) -> PlantState:
+    stn, gh_name = fork["gh_key"].split("/")
+    ss = PlantState()
+    ss.clock = SimClock(fork["t0"])
+    ss.scheduler = ProgramScheduler(None)   # no timetables, no schedule file
+    ss.program_active = {}
+    init_state(ss, fork["seed"])
+
+    ss.update(fork["inputs"])
+    ss.station, ss.gatehouse, ss.selected_gate = stn, gh_name, next(iter(fork["gates"]))
+    ss.auth.update({"logged_in": True, "role": "Operator"})
+    ss.prot[fork["gh_key"]].update(fork["prot"])
+    for g, gs in fork["gates"].items():
+        ss.gate_state[f"{fork['gh_key']}/{g}"].update(gs)
+    ss.gh_state[fork["gh_key"]].update(fork["gh"])
+    ss.eta = EtaEngine(ss.gate_state)  # gate limits may differ from the seeded plant
+
+    ss.gh_state[fork["gh_key"]].update(
+        {"mode": "REMOTE PROGRAM", "program_mode": "K VALUE", "prog_k_pattern": k_pattern, "program_running": True}
+    )
+    return ss
+
+
+# =========================================================
+# Single pattern (runs in a worker)
+# =========================================================
+def simulate_pattern(fork: dict, k_pattern: str, horizon_sec: float = WHATIF_HORIZON_SEC, dt: float = WHATIF_DT_SEC) -> dict:
+    ss = _plant_from_fork(fork, k_pattern)
+    gh_key = fork["gh_key"]
+    gh = ss.gh_state[gh_key]
+    gate_keys = [f"{gh_key}/{g}" for g in fork["gates"]]
+    k_target = K_PATTERNS[k_pattern]
+
+    q0 = gh["q_act"]
+    last_m = {k: ss.gate_state[k]["open_m"] for k in gate_keys}
+    travel_m = 0.0
+    settle_sec = 0.0
+    band_sec = None
+    volume_m3 = 0.0
+    blocked_run = False
+
+    steps = int(horizon_sec / dt)
+    for i in range(steps):
+        run_ticks(ss)
+        ss.clock.advance(dt)
+        t = (i + 1) * dt
+        if not gh["program_running"]:
+            blocked_run = True  # an interlock stopped the run
+            break
+
+        moved = 0.0
+        for k in gate_keys:
+            m = ss.gate_state[k]["open_m"]
+            moved += abs(m - last_m[k])
+            last_m[k] = m
+        if moved > 0.0:
+            travel_m += moved
+            settle_sec = t
+        volume_m3 += gh["q_act"] * dt
+
+        in_band = abs(k_target - compute_k_act(gh)) * 100.0 <= K_TOL_PCT
+        if in_band and band_sec is None:
+            band_sec = t
+        elif not in_band and band_sec is not None and t - band_sec < WHATIF_BAND_HOLD_SEC:
+            band_sec = None
+
+        # Settled in band with gates at rest: the rest of the horizon is steady state
+        if band_sec is not None and t - band_sec >= WHATIF_BAND_HOLD_SEC and t - settle_sec >= WHATIF_BAND_HOLD_SEC:
+            volume_m3 += gh["q_act"] * (horizon_sec - t)
+            break
+
+    return {
+        "k_pattern": k_pattern,
+        "k_target": k_target,
+        "band_sec": band_sec,
+        "settle_sec": settle_sec,
+        "travel_m": travel_m,
+        "q_start": q0,
+        "q_end": gh["q_act"],
+        "k_end": compute_k_act(gh),
+        "volume_m3": volume_m3,
+        "blocked": blocked_run,
+    }
+
+
+def _simulate_args(args):
+    return simulate_pattern(*args)
+
+
+# =========================================================
+# Pool / ranking
+# =========================================================
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: never fork a process that runs the Streamlit server threads
+        _pool = ProcessPoolExecutor(max_workers=WHATIF_MAX_WORKERS, mp_context=get_context("spawn"))
+    return _pool
+
+
+def rank_key(r: dict):
+    band = math.inf if r["band_sec"] is None else r["band_sec"]
+    return (r["blocked"], band, r["travel_m"])
+
+
+def evaluate_patterns(
+    ss,
+    patterns: list[str] | None = None,
+    gh_key: str | None = None,
+    horizon_sec: float = WHATIF_HORIZON_SEC,
+    dt: float = WHATIF_DT_SEC,
+    workers: int | None = None,
+) -> dict:
+    fork = fork_gatehouse(ss, gh_key)
+    patterns = list(patterns or K_PATTERNS)
+    jobs = [(fork, p, horizon_sec, dt) for p in patterns]
+    workers = WHATIF_MAX_WORKERS if workers is None else workers
+    if workers <= 1 or len(jobs) <= 1:
+        results = [_simulate_args(j) for j in jobs]
+    else:
+        results = list(_get_pool().map(_simulate_args, jobs))
+    results.sort(key=rank_key)
+    return {
+        "gh_key": fork["gh_key"],
+        "t0": fork["t0"],
+        "horizon_sec": horizon_sec,
+        "q_plan": fork["gh"]["q_plan"],
+        "results": results,
+    }